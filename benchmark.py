@@ -0,0 +1,273 @@
+"""
+Скрипт для замера производительности горячих участков бота
+
+Запуск:
+    python benchmark.py kufar [--payload ответ_kufar.json ...] [--repeat 200]
+    python benchmark.py listings [--count 10000]
+    python benchmark.py render [--count 200] [--recipients 5] [--repeat 20]
+"""
+import argparse
+import gc
+import json
+import pickle
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from parsers.base_parser import EXCHANGE_RATE
+from parsers.kufar_parser import KufarParser, RESPONSE_DECODER
+from parsers.listing import FOUND_CAR_FIELDS, LISTING_FIELDS, Listing
+from utils.rendering import render_notification
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """Среднее время одного вызова в секундах"""
+    func()  # Прогрев кешей
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def make_kufar_payload(ads_count: int = 50) -> bytes:
+    """Синтетический ответ rendered-paginated с типичным набором лишних полей"""
+    rnd = random.Random(42)
+    labels = [
+        ('brn', 'Марка', 'BMW'), ('crl', 'Модель', 'X5'), ('rgd', 'Год', '2018'),
+        ('mlg', 'Пробег', '120 000 км'), ('cre', 'Объем, л', '3.0'),
+        ('crg', 'Коробка передач', 'Автомат'), ('cfu', 'Тип двигателя', 'Дизель'),
+        ('cbd', 'Тип кузова', 'Внедорожник'), ('clr', 'Цвет', 'Черный'),
+        ('cdt', 'Привод', 'Полный'), ('ccn', 'Состояние', 'С пробегом'),
+        ('cvn', 'VIN', 'WBA0000000000000'), ('cot', 'Обмен', 'Не интересует'),
+    ]
+    ads = []
+    for i in range(ads_count):
+        ads.append({
+            'ad_id': 200000000 + i,
+            'subject': f"BMW X5 {2010 + i % 14}",
+            'ad_link': f"https://auto.kufar.by/vi/{200000000 + i}",
+            'list_time': '2024-05-01T10:00:00Z',
+            'price_byn': str(rnd.randint(3000000, 9000000)),
+            'price_usd': str(rnd.randint(1000000, 3000000)),
+            'ad_parameters': [
+                {'p': code, 'pl': label, 'v': rnd.randint(1, 100), 'vl': value, 'pu': code, 'g': []}
+                for code, label, value in labels
+            ],
+            'account_parameters': [
+                {'p': 'name', 'pl': 'Имя', 'v': 'Продавец', 'vl': 'Продавец'},
+                {'p': 'address', 'pl': 'Адрес', 'v': 'Минск', 'vl': 'Минск'},
+            ],
+            'images': [
+                {'id': f"{i}{n}", 'media_storage': 'rms', 'path': f"adim1/{i}/{n}.jpg", 'yams_storage': True}
+                for n in range(12)
+            ],
+            'category': 2010,
+            'company_ad': False,
+            'currency': 'BYR',
+            'message_id': f"msg{i}",
+            'paid_services': {'halva': False, 'highlight': False, 'polepos': False, 'ribbons': None},
+            'phone_hidden': True,
+            'remuneration_type': '0',
+            'show_parameters': {'show_call': True, 'show_chat': True, 'show_import_link': False},
+            'type': 'sell',
+        })
+    payload = {
+        'ads': ads,
+        'pagination': {'pages': [{'label': 'next', 'num': 2, 'token': 'eyJ0IjoiYWJzIn0='}]},
+        'total': 12345,
+    }
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def legacy_extract_params(ad: Dict) -> Dict:
+    """Исходный вариант извлечения параметров (перебор всех кодов для каждого параметра)"""
+    params = {}
+    params_list = ad.get('ad_parameters', []) or ad.get('params', [])
+    param_mapping = {
+        'brand': ['brand', 'brn'],
+        'model': ['cars_level_1', 'crl', 'model'],
+        'year': ['regdate', 'rgd', 'year'],
+        'mileage': ['mileage', 'odometer', 'пробег'],
+        'engine_volume': ['engine_volume', 'объем', 'engine'],
+        'city': ['city', 'город', 'location'],
+        'transmission': ['transmission', 'коробка', 'gearbox'],
+        'engine_type': ['fuel_type', 'топливо', 'fuel'],
+        'body_type': ['body_type', 'кузов', 'body'],
+    }
+    for p in params_list:
+        if not isinstance(p, dict):
+            continue
+        param_code = p.get('p') or p.get('pu')
+        param_text = p.get('vl')
+        param_value = p.get('v')
+        param_label = p.get('pl', '').lower()
+        param_type = None
+        for key, codes in param_mapping.items():
+            if param_code in codes or any(code in param_label for code in codes):
+                param_type = key
+                break
+        if param_type:
+            if param_type == 'mileage' and param_value is not None:
+                params[param_type] = param_value
+            else:
+                value = param_text if param_text and str(param_text).strip() else param_value
+                if value is not None:
+                    params[param_type] = value
+    return params
+
+
+def bench_kufar(payloads: List[bytes], repeat: int) -> None:
+    """Стоимость декодирования и разбора одного объявления kufar.by до и после"""
+    parser = KufarParser()
+    for index, content in enumerate(payloads, 1):
+        ads = json.loads(content).get('ads', [])
+        if not ads:
+            print(f"Ответ #{index}: объявлений нет, пропускаю")
+            continue
+        count = len(ads)
+
+        decode_json = measure(lambda: json.loads(content), repeat) / count
+        decode_typed = measure(lambda: parser._decode_response(content), repeat) / count
+
+        legacy_params = measure(lambda: [legacy_extract_params(ad) for ad in ads], repeat) / count
+        dispatch_params = measure(lambda: [parser._extract_params(ad) for ad in ads], repeat) / count
+
+        typed_ads = parser._decode_response(content).get('ads', [])
+        parse_ads = measure(lambda: [parser._parse_ad(ad) for ad in typed_ads], repeat) / count
+
+        print(f"Ответ #{index}: {count} объявлений, {len(content)} байт"
+              f" (msgspec: {'да' if RESPONSE_DECODER is not None else 'нет'})")
+        print(f"  Декодирование json.loads:        {decode_json * 1e6:8.1f} мкс/объявление")
+        print(f"  Декодирование по схеме:          {decode_typed * 1e6:8.1f} мкс/объявление")
+        print(f"  Параметры: перебор маппинга     {legacy_params * 1e6:8.1f} мкс/объявление")
+        print(f"  Параметры: таблица диспетчера   {dispatch_params * 1e6:8.1f} мкс/объявление")
+        print(f"  Полный _parse_ad:                {parse_ads * 1e6:8.1f} мкс/объявление")
+
+
+def make_listing_rows(count: int) -> bytes:
+    """Синтетическая пачка объявлений в том виде, в котором она приходит из пула разбора"""
+    rnd = random.Random(42)
+    sources = ['av.by', 'kufar.by', 'ab.onliner.by', 'abw.by']
+    cars = [('BMW', 'X5'), ('Volkswagen', 'Passat'), ('Toyota', 'Camry'), ('Renault', 'Logan'), ('Geely', 'Coolray')]
+    cities = ['Минск', 'Гомель', 'Брест', 'Гродно', 'Витебск', 'Могилев']
+    def fresh(value: str) -> str:
+        # Парсер создает новую строку для каждого объявления
+        return value.encode('utf-8').decode('utf-8')
+
+    rows = []
+    for i in range(count):
+        source = rnd.choice(sources)
+        brand, model = rnd.choice(cars)
+        year = rnd.randint(2005, 2024)
+        price_usd = float(rnd.randint(3000, 60000))
+        rows.append((
+            fresh(source), str(100000000 + i), f"{brand} {model} {year}", fresh(brand), fresh(model),
+            price_usd, round(price_usd * EXCHANGE_RATE),
+            year, rnd.randint(1000, 400000), rnd.choice([1.6, 2.0, 3.0]), fresh(rnd.choice(cities)),
+            f"https://{source}/car/{100000000 + i}", f"https://img.{source}/{i}.jpg",
+            fresh(rnd.choice(['Автомат', 'Механика'])), fresh(rnd.choice(['Бензин', 'Дизель'])),
+            fresh(rnd.choice(['Седан', 'Универсал', 'Внедорожник'])),
+            datetime(2024, 5, 1) - timedelta(minutes=i),
+        ))
+    return pickle.dumps(rows)
+
+
+def legacy_listing(row: Tuple) -> Tuple[Dict, Dict]:
+    """Исходный вариант: словарь на объявление и его копия с полями FoundCar"""
+    car = dict(zip(LISTING_FIELDS, row))
+    car_data = {k: v for k, v in car.items() if k in FOUND_CAR_FIELDS}
+    return car, car_data
+
+
+def measure_memory(build: Callable[[List[Tuple]], list], blob: bytes) -> Tuple[int, int, int]:
+    """Память, занятая пачкой после разбора: (текущая, пиковая, число блоков)"""
+    gc.collect()
+    tracemalloc.start()
+    rows = pickle.loads(blob)
+    batch = build(rows)
+    del rows
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    del batch
+    return current, peak, blocks
+
+
+def bench_listings(count: int) -> None:
+    """Память на пачку объявлений: словари против Listing"""
+    blob = make_listing_rows(count)
+    variants = [
+        ('Словарь + копия для FoundCar', lambda rows: [legacy_listing(row) for row in rows]),
+        ('Словарь', lambda rows: [dict(zip(LISTING_FIELDS, row)) for row in rows]),
+        ('Listing', lambda rows: [Listing.from_row(row) for row in rows]),
+    ]
+    print(f"Пачка из {count} объявлений")
+    for name, build in variants:
+        current, peak, blocks = measure_memory(build, blob)
+        print(f"  {name:30} удерживается {current / 1024:9.1f} КБ, пик {peak / 1024:9.1f} КБ, блоков {blocks}")
+
+
+def bench_render(count: int, recipients: int, repeat: int) -> None:
+    """Подготовка уведомлений: для каждого получателя заново против одного раза на объявление"""
+    cars = [Listing.from_row(row) for row in pickle.loads(make_listing_rows(count))]
+
+    def per_recipient():
+        for car in cars:
+            for _ in range(recipients):
+                render_notification(car)
+
+    def render_once():
+        rendered = {}
+        for car in cars:
+            for _ in range(recipients):
+                key = (car.source, car.ad_id)
+                if key not in rendered:
+                    rendered[key] = render_notification(car)
+
+    sends = count * recipients
+    legacy = measure(per_recipient, repeat) / sends
+    cached = measure(render_once, repeat) / sends
+    print(f"{count} объявлений, по {recipients} получателей на объявление")
+    print(f"  Подготовка для каждого получателя: {legacy * 1e6:8.1f} мкс/уведомление")
+    print(f"  Подготовка один раз за цикл:       {cached * 1e6:8.1f} мкс/уведомление")
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Замеры производительности")
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    kufar = subparsers.add_parser('kufar', help="Разбор ответов API kufar.by")
+    kufar.add_argument('--payload', action='append', default=[],
+                       help="Файл с записанным ответом rendered-paginated (можно указать несколько)")
+    kufar.add_argument('--repeat', type=int, default=200)
+
+    listings = subparsers.add_parser('listings', help="Память на пачку объявлений (tracemalloc)")
+    listings.add_argument('--count', type=int, default=10000)
+
+    render = subparsers.add_parser('render', help="Подготовка текста уведомлений")
+    render.add_argument('--count', type=int, default=200)
+    render.add_argument('--recipients', type=int, default=5, help="Получателей на объявление")
+    render.add_argument('--repeat', type=int, default=20)
+
+    args = arg_parser.parse_args()
+
+    if args.command == 'kufar':
+        payloads = []
+        for path in args.payload:
+            with open(path, 'rb') as f:
+                payloads.append(f.read())
+        if not payloads:
+            payloads.append(make_kufar_payload())
+        bench_kufar(payloads, args.repeat)
+    elif args.command == 'listings':
+        bench_listings(args.count)
+    elif args.command == 'render':
+        bench_render(args.count, args.recipients, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
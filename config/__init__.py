@@ -20,6 +20,135 @@ if not BOT_TOKEN:
         "Создайте файл .env с BOT_TOKEN=your_token"
     )
 
+# Количество процессов для разбора страниц источников (0 - разбор в основном процессе)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Конвейер проверки объявлений: число обработчиков на каждой стадии
+PIPELINE_WORKERS: Dict[str, int] = {
+    'fetch': int(os.getenv("PIPELINE_FETCH_WORKERS", "4")),
+    'match': int(os.getenv("PIPELINE_MATCH_WORKERS", "1")),
+    'dedupe': int(os.getenv("PIPELINE_DEDUPE_WORKERS", "2")),
+    'image': int(os.getenv("PIPELINE_IMAGE_WORKERS", "4")),
+    'persist': int(os.getenv("PIPELINE_PERSIST_WORKERS", "1")),
+    'photo': int(os.getenv("PIPELINE_PHOTO_WORKERS", "4")),
+    'notify': int(os.getenv("PIPELINE_NOTIFY_WORKERS", "1")),
+}
+# Размер очереди между стадиями (заполненная очередь притормаживает предыдущую стадию)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+# Одновременных запросов к одному источнику
+SOURCE_CONCURRENCY = int(os.getenv("SOURCE_CONCURRENCY", "1"))
+# Задержка между уведомлениями (секунды)
+NOTIFY_DELAY_SECONDS = float(os.getenv("NOTIFY_DELAY_SECONDS", "10"))
+
+# Интервал проверки объявлений (минуты)
+CHECK_INTERVAL_MINUTES = int(os.getenv("CHECK_INTERVAL_MINUTES", "15"))
+# Бюджет времени на цикл проверки (секунды): задания, не начатые к этому сроку, переносятся на следующий цикл
+CYCLE_BUDGET_SECONDS = float(os.getenv("CYCLE_BUDGET_SECONDS", str(CHECK_INTERVAL_MINUTES * 60 * 0.8)))
+
+# Сколько объявлений (с начала выдачи) проверяет обычный цикл
+LIVE_CHECK_LIMIT = int(os.getenv("LIVE_CHECK_LIMIT", "50"))
+# Догрузка истории для новых фильтров: глубина в страницах, периодичность и заданий за запуск
+BACKFILL_MAX_PAGES = int(os.getenv("BACKFILL_MAX_PAGES", "4"))
+BACKFILL_INTERVAL_MINUTES = int(os.getenv("BACKFILL_INTERVAL_MINUTES", "2"))
+BACKFILL_JOBS_PER_RUN = int(os.getenv("BACKFILL_JOBS_PER_RUN", "2"))
+# Фильтры моложе этого срока без записи о догрузке считаются требующими догрузки
+BACKFILL_FILTER_MAX_AGE_DAYS = int(os.getenv("BACKFILL_FILTER_MAX_AGE_DAYS", "7"))
+
+# Сколько последних объявлений каждого источника держать в памяти для мгновенной проверки новых фильтров
+RECENT_LISTINGS_PER_SOURCE = int(os.getenv("RECENT_LISTINGS_PER_SOURCE", "1000"))
+
+# Отключение источников без совпадений: после стольких проверок подряд без подходящих объявлений
+# пара (фильтр, источник) пропускается и проверяется повторно раз в SOURCE_REPROBE_HOURS часов
+SOURCE_PRUNE_ZERO_STREAK = int(os.getenv("SOURCE_PRUNE_ZERO_STREAK", "30"))
+SOURCE_REPROBE_HOURS = float(os.getenv("SOURCE_REPROBE_HOURS", "12"))
+
+# Поиск одного автомобиля на разных сайтах: размер корзин отпечатка, допустимое расхождение
+# пробега и цены (доля) и за сколько дней сравнивать с уже найденными объявлениями
+DUPLICATE_MILEAGE_BUCKET_KM = int(os.getenv("DUPLICATE_MILEAGE_BUCKET_KM", "10000"))
+DUPLICATE_PRICE_BUCKET_USD = int(os.getenv("DUPLICATE_PRICE_BUCKET_USD", "1000"))
+DUPLICATE_MILEAGE_TOLERANCE = float(os.getenv("DUPLICATE_MILEAGE_TOLERANCE", "0.03"))
+DUPLICATE_PRICE_TOLERANCE = float(os.getenv("DUPLICATE_PRICE_TOLERANCE", "0.07"))
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", "30"))
+
+# Поиск перевыложенных объявлений по фото (загружает миниатюру каждого нового объявления)
+IMAGE_HASH_ENABLED = os.getenv("IMAGE_HASH_ENABLED", "0").lower() in ("1", "true", "yes")
+# Наибольшее расстояние Хэмминга между хешами одинаковых фото (из 64 бит)
+IMAGE_HASH_MAX_DISTANCE = int(os.getenv("IMAGE_HASH_MAX_DISTANCE", "4"))
+# Сколько хешей хранить в индексе, сколько кандидатов проверять за поиск и размер кэша хешей по URL
+IMAGE_HASH_INDEX_SIZE = int(os.getenv("IMAGE_HASH_INDEX_SIZE", "20000"))
+IMAGE_HASH_MAX_CANDIDATES = int(os.getenv("IMAGE_HASH_MAX_CANDIDATES", "64"))
+IMAGE_HASH_CACHE_SIZE = int(os.getenv("IMAGE_HASH_CACHE_SIZE", "5000"))
+IMAGE_HASH_TIMEOUT = float(os.getenv("IMAGE_HASH_TIMEOUT", "10"))
+IMAGE_HASH_MAX_BYTES = int(os.getenv("IMAGE_HASH_MAX_BYTES", str(2 * 1024 * 1024)))
+
+# Локальный кэш фото для отправки в Telegram (нужен Pillow): каталог, общий размер,
+# наибольшая сторона и качество JPEG подготовленного фото, наибольший размер загружаемого фото
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "200"))
+IMAGE_CACHE_MAX_SIDE = int(os.getenv("IMAGE_CACHE_MAX_SIDE", "1280"))
+IMAGE_CACHE_QUALITY = int(os.getenv("IMAGE_CACHE_QUALITY", "85"))
+IMAGE_CACHE_MAX_SOURCE_BYTES = int(os.getenv("IMAGE_CACHE_MAX_SOURCE_BYTES", str(15 * 1024 * 1024)))
+IMAGE_CACHE_TIMEOUT = float(os.getenv("IMAGE_CACHE_TIMEOUT", "15"))
+
+# Отслеживание цены: минимальное изменение (%), как часто обновлять отметку о просмотре
+# неизменившегося объявления и сколько дней хранить состояния не встречающихся объявлений
+PRICE_CHANGE_MIN_PERCENT = float(os.getenv("PRICE_CHANGE_MIN_PERCENT", "1"))
+PRICE_NOTIFY_INCREASES = os.getenv("PRICE_NOTIFY_INCREASES", "0").lower() in ("1", "true", "yes")
+SNAPSHOT_TOUCH_HOURS = float(os.getenv("SNAPSHOT_TOUCH_HOURS", "6"))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "30"))
+
+# Статистика рыночных цен: ширина корзины годов, сколько цен нужно для оценки,
+# сколько групп (марка, модель, годы) держать в памяти и точность скетча
+MARKET_YEAR_BUCKET = int(os.getenv("MARKET_YEAR_BUCKET", "2"))
+MARKET_MIN_SAMPLES = int(os.getenv("MARKET_MIN_SAMPLES", "10"))
+MARKET_MAX_GROUPS = int(os.getenv("MARKET_MAX_GROUPS", "5000"))
+MARKET_SKETCH_K = int(os.getenv("MARKET_SKETCH_K", "200"))
+
+# Список наблюдения: как часто проверять страницу каждого объявления, интервал запуска проверки,
+# сколько объявлений одного источника проверять за запуск, пауза между запросами (с) и лимит на пользователя
+WATCHLIST_INTERVAL_MINUTES = int(os.getenv("WATCHLIST_INTERVAL_MINUTES", "10"))
+WATCHLIST_POLL_MINUTES = int(os.getenv("WATCHLIST_POLL_MINUTES", "60"))
+WATCHLIST_BATCH_SIZE = int(os.getenv("WATCHLIST_BATCH_SIZE", "20"))
+WATCHLIST_REQUEST_DELAY = float(os.getenv("WATCHLIST_REQUEST_DELAY", "2"))
+WATCHLIST_MAX_PER_USER = int(os.getenv("WATCHLIST_MAX_PER_USER", "50"))
+
+# Ограничения на пользователя: активных фильтров, уведомлений в час и уведомлений по одному фильтру
+# за цикл проверки (0 - без ограничения). Сверх лимита объявления приходят одной сводкой в конце цикла
+MAX_ACTIVE_FILTERS_PER_USER = int(os.getenv("MAX_ACTIVE_FILTERS_PER_USER", "0"))
+MAX_NOTIFICATIONS_PER_HOUR = int(os.getenv("MAX_NOTIFICATIONS_PER_HOUR", "30"))
+MAX_MATCHES_PER_FILTER_CYCLE = int(os.getenv("MAX_MATCHES_PER_FILTER_CYCLE", "5"))
+# Сколько объявлений перечислять в сводке
+OVERFLOW_SUMMARY_LINKS = int(os.getenv("OVERFLOW_SUMMARY_LINKS", "10"))
+
+# Кэш file_id отправленных фото: сколько держать в памяти и сколько дней хранить в базе
+TELEGRAM_FILE_CACHE_SIZE = int(os.getenv("TELEGRAM_FILE_CACHE_SIZE", "5000"))
+TELEGRAM_FILE_RETENTION_DAYS = int(os.getenv("TELEGRAM_FILE_RETENTION_DAYS", "30"))
+
+# Режим подборки: объявлений в одном альбоме (не больше 10 - ограничение Telegram)
+DIGEST_ALBUM_SIZE = min(int(os.getenv("DIGEST_ALBUM_SIZE", "10")), 10)
+
+# Очередь уведомлений: как часто повторять неотправленные, сколько за раз, сколько попыток и дней хранения
+OUTBOX_RETRY_MINUTES = int(os.getenv("OUTBOX_RETRY_MINUTES", "5"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "30"))
+# Через сколько минут неотправленное уведомление считается брошенным и отправляется из очереди
+# (больше длительности цикла проверки: конвейер отправляет подборки и сводки в конце цикла)
+OUTBOX_LEASE_MINUTES = int(os.getenv("OUTBOX_LEASE_MINUTES", "30"))
+
+# Изменение отправленных уведомлений (цена, снятие с продажи): пауза между изменениями
+# и сколько последних строк об изменениях показывать
+NOTIFY_EDIT_DELAY_SECONDS = float(os.getenv("NOTIFY_EDIT_DELAY_SECONDS", "0.5"))
+NOTIFY_EDIT_MAX_LINES = int(os.getenv("NOTIFY_EDIT_MAX_LINES", "3"))
+
+# Администраторы бота (Telegram ID через запятую)
+ADMIN_IDS: List[int] = [int(x) for x in os.getenv("ADMIN_IDS", "").replace(' ', '').split(',') if x]
+
+# Канал событий между ботом и процессами мониторинга (таблица monitor_events)
+MONITOR_EVENT_POLL_SECONDS = float(os.getenv("MONITOR_EVENT_POLL_SECONDS", "5"))
+MONITOR_EVENT_TTL_HOURS = int(os.getenv("MONITOR_EVENT_TTL_HOURS", "24"))
+
 # Справочники марок и моделей для выбора по кнопкам
 # Популярные марки на белорусском рынке (av.by, kufar.by, onliner.by, abw.by)
 BRANDS: List[Tuple[str, str]] = [
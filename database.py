@@ -7,7 +7,7 @@ from datetime import datetime
 # Сторонние библиотеки
 from sqlalchemy import (
     Column, Integer, String, Float, BigInteger, Boolean, DateTime,
-    ForeignKey, Text
+    ForeignKey, Text, UniqueConstraint, Index
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -31,10 +31,16 @@ class UserFilter(Base):
     engine_type = Column(String(20), nullable=True)  # Бензин/Дизель/Электро
     body_type = Column(String(50), nullable=True)  # Тип кузова (седан, хэтчбек, универсал, внедорожник и т.д.)
     is_active = Column(Boolean, default=True)  # Активен ли фильтр
+    below_market_only = Column(Boolean, nullable=True, default=False)  # Только объявления дешевле рыночной медианы
+    max_age_days = Column(Integer, nullable=True)  # Не старше стольких дней с публикации (None или 0 - без ограничения)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Связь с найденными автомобилями
     found_cars = relationship("FoundCar", back_populates="filter", cascade="all, delete-orphan")
+    # Догрузка истории источников для фильтра
+    backfills = relationship("FilterBackfill", back_populates="filter", cascade="all, delete-orphan")
+    # Статистика отдачи источников по фильтру
+    source_stats = relationship("FilterSourceStats", back_populates="filter", cascade="all, delete-orphan")
 
 
 class FoundCar(Base):
@@ -59,11 +65,200 @@ class FoundCar(Base):
     body_type = Column(String(50), nullable=True)  # Тип кузова
     notified = Column(Boolean, default=False)  # Отправлено ли уведомление
     found_at = Column(DateTime, default=datetime.utcnow)
+    # Объявление о том же автомобиле на другом сайте, о котором пользователь уже уведомлен
+    duplicate_of_id = Column(Integer, ForeignKey('found_cars.id'), nullable=True)
+    image_hash = Column(BigInteger, nullable=True)  # Перцептивный хеш фото (для поиска перевыложенных объявлений)
     
     # Связь с фильтром
     filter = relationship("UserFilter", back_populates="found_cars")
+    # Ключи отпечатка для поиска дубликатов
+    fingerprints = relationship("CarFingerprint", back_populates="found_car", cascade="all, delete-orphan")
+    # Уведомления об объявлении в очереди отправки
+    outbox = relationship("NotificationOutbox", back_populates="found_car", cascade="all, delete-orphan")
     
     # Уникальность по источнику и ID объявления
     __table_args__ = (
         {'sqlite_autoincrement': True},
     )
+
+
+class MonitorEvent(Base):
+    """События для процессов мониторинга (канал связи между ботом и мониторами)"""
+    __tablename__ = 'monitor_events'
+    
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String(50), nullable=False)  # filter_saved и т.п.
+    filter_id = Column(Integer, nullable=True)  # Фильтр, к которому относится событие
+    user_id = Column(BigInteger, nullable=True)  # Пользователь
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        {'sqlite_autoincrement': True},
+    )
+
+
+class FilterBackfill(Base):
+    """Догрузка истории источника для нового фильтра (выполняется один раз)"""
+    __tablename__ = 'filter_backfills'
+    
+    id = Column(Integer, primary_key=True)
+    filter_id = Column(Integer, ForeignKey('users_filters.id'), nullable=False, index=True)
+    source = Column(String(50), nullable=False)  # av.by, kufar.by, onliner.by, abw.by
+    checked_count = Column(Integer, default=0)  # Сколько объявлений проверено
+    found_count = Column(Integer, default=0)  # Сколько новых объявлений найдено
+    requested_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)  # None - догрузка еще не выполнена
+    
+    # Связь с фильтром
+    filter = relationship("UserFilter", back_populates="backfills")
+    
+    __table_args__ = (
+        UniqueConstraint('filter_id', 'source', name='uq_filter_backfill_source'),
+    )
+
+
+class FilterSourceStats(Base):
+    """Стоимость проверки и отдача источника по фильтру (для отключения бесполезных источников)"""
+    __tablename__ = 'filter_source_stats'
+    
+    id = Column(Integer, primary_key=True)
+    filter_id = Column(Integer, ForeignKey('users_filters.id'), nullable=False, index=True)
+    source = Column(String(50), nullable=False)  # av.by, kufar.by, onliner.by, abw.by
+    checks_count = Column(Integer, default=0)  # Сколько раз источник проверялся
+    total_fetch_seconds = Column(Float, default=0.0)  # Суммарное время загрузки и разбора
+    received_total = Column(Integer, default=0)  # Получено объявлений
+    matched_total = Column(Integer, default=0)  # Подошло под фильтр
+    new_total = Column(Integer, default=0)  # Новых (отправлено уведомлений)
+    zero_streak = Column(Integer, default=0)  # Проверок подряд без подходящих объявлений
+    last_checked_at = Column(DateTime, nullable=True)
+    last_match_at = Column(DateTime, nullable=True)
+    
+    # Связь с фильтром
+    filter = relationship("UserFilter", back_populates="source_stats")
+    
+    __table_args__ = (
+        UniqueConstraint('filter_id', 'source', name='uq_filter_source_stats'),
+    )
+
+
+class CarFingerprint(Base):
+    """Индекс отпечатков найденных объявлений для поиска одного автомобиля на разных сайтах"""
+    __tablename__ = 'car_fingerprints'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    key = Column(String(16), nullable=False)  # Хеш одной полосы отпечатка
+    found_car_id = Column(Integer, ForeignKey('found_cars.id'), nullable=False, index=True)
+    
+    # Связь с объявлением
+    found_car = relationship("FoundCar", back_populates="fingerprints")
+    
+    __table_args__ = (
+        Index('ix_car_fingerprints_user_key', 'user_id', 'key'),
+    )
+
+
+class AdSnapshot(Base):
+    """Последнее известное состояние объявления (для отслеживания изменений цены)"""
+    __tablename__ = 'ad_snapshots'
+    
+    id = Column(Integer, primary_key=True)
+    source = Column(String(50), nullable=False)
+    ad_id = Column(String(200), nullable=False)
+    price_usd = Column(Float, nullable=True)
+    price_byn = Column(Float, nullable=True)
+    state_hash = Column(String(16), nullable=False)  # Хеш ключевых полей
+    last_seen_at = Column(DateTime, default=datetime.utcnow, index=True)
+    removed_at = Column(DateTime, nullable=True)  # Когда объявление пропало из выдачи (снято с продажи)
+    
+    __table_args__ = (
+        UniqueConstraint('source', 'ad_id', name='uq_ad_snapshot_source_ad'),
+    )
+
+
+class MarketStat(Base):
+    """Скетч распределения цен группы похожих автомобилей (марка, модель, годы)"""
+    __tablename__ = 'market_stats'
+    
+    id = Column(Integer, primary_key=True)
+    key = Column(String(250), nullable=False, unique=True)  # марка|модель|корзина годов
+    count = Column(Integer, default=0)  # Сколько цен учтено
+    data = Column(Text, nullable=False)  # Уровни скетча KLL в JSON
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class WatchedAd(Base):
+    """Объявление, за которым следит пользователь (цена и снятие с продажи)"""
+    __tablename__ = 'watched_ads'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False, index=True)
+    source = Column(String(50), nullable=False)
+    ad_id = Column(String(200), nullable=False)
+    title = Column(String(500), nullable=False)
+    url = Column(Text, nullable=False)
+    price_usd = Column(Float, nullable=True)  # Цена, о которой пользователь знает
+    price_byn = Column(Float, nullable=True)
+    removed_at = Column(DateTime, nullable=True)  # Когда объявление оказалось снятым с продажи
+    checked_at = Column(DateTime, nullable=True)  # Последняя проверка страницы объявления
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'source', 'ad_id', name='uq_watched_ad_user_source_ad'),
+        Index('ix_watched_ads_source_ad', 'source', 'ad_id'),
+    )
+
+
+class TelegramFile(Base):
+    """Фото, уже загруженное в Telegram: повторная отправка по file_id без загрузки с сайта"""
+    __tablename__ = 'telegram_files'
+    
+    id = Column(Integer, primary_key=True)
+    url = Column(Text, nullable=False, unique=True)  # Ссылка на фото на сайте
+    file_id = Column(String(255), nullable=False)  # file_id фото в Telegram
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class UserSettings(Base):
+    """Настройки пользователя"""
+    __tablename__ = 'user_settings'
+    
+    user_id = Column(BigInteger, primary_key=True)
+    digest_mode = Column(Boolean, nullable=True, default=False)  # Новые объявления цикла одной подборкой
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class NotificationOutbox(Base):
+    """
+    Очередь уведомлений о найденных объявлениях
+    
+    Запись создается в одной транзакции с найденным объявлением, поэтому объявление
+    не может оказаться сохраненным без уведомления. Статусы: pending - ожидает отправки,
+    sending - отправляется, sent - отправлено, failed - отправить не удалось.
+    """
+    __tablename__ = 'notification_outbox'
+    
+    id = Column(Integer, primary_key=True)
+    found_car_id = Column(Integer, ForeignKey('found_cars.id'), nullable=False, index=True)
+    user_id = Column(BigInteger, nullable=False)
+    source = Column(String(50), nullable=False)  # Источник объявления (записи отправляет процесс этого источника)
+    status = Column(String(10), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)  # Неудачных попыток отправки
+    text = Column(Text, nullable=False)  # Подготовленный текст уведомления (HTML)
+    photo = Column(Text, nullable=True)  # Ссылка на фото
+    title = Column(String(500), nullable=False)
+    summary = Column(Text, nullable=False)  # Краткое описание для подборки
+    message_id = Column(BigInteger, nullable=True)  # ID отправленного сообщения в Telegram
+    # Как отправлено: single - отдельным сообщением (его можно изменить), group - в подборке или сводке
+    delivery = Column(String(10), nullable=True)
+    status_text = Column(Text, nullable=True)  # Строки об изменениях, добавленные к сообщению
+    created_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)  # Начало отправки
+    sent_at = Column(DateTime, nullable=True)
+    edited_at = Column(DateTime, nullable=True)
+    
+    found_car = relationship("FoundCar", back_populates="outbox")
+    
+    __table_args__ = (
+        Index('ix_notification_outbox_status', 'status', 'source'),
+    )
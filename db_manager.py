@@ -2,16 +2,21 @@
 Менеджер базы данных для работы с SQLAlchemy
 """
 # Стандартная библиотека
-from typing import Optional, List
+from datetime import datetime
+from typing import Dict, Iterable, Optional, List, Set, Tuple
 
 # Сторонние библиотеки
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, or_, case, delete, update, event, func, inspect, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import (
     create_async_engine, AsyncSession, async_sessionmaker
 )
 
 # Локальные импорты
-from database import Base, UserFilter, FoundCar
+from database import (
+    Base, UserFilter, FoundCar, MonitorEvent, FilterBackfill, FilterSourceStats, CarFingerprint, AdSnapshot,
+    MarketStat, WatchedAd, TelegramFile, UserSettings, NotificationOutbox
+)
 
 DATABASE_URL = "sqlite+aiosqlite:///./auto_monitor.db"
 
@@ -19,10 +24,40 @@ engine = create_async_engine(DATABASE_URL, echo=False)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    """WAL и ожидание блокировки: с базой одновременно работают бот и процессы мониторинга"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def _add_missing_columns(connection) -> None:
+    """
+    Добавить в существующие таблицы новые столбцы моделей
+    
+    create_all создает только отсутствующие таблицы, поэтому новые необязательные
+    столбцы добавляются в базу, созданную предыдущей версией бота, через ALTER TABLE.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
 async def init_db():
     """Инициализация базы данных"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
 
 
 async def get_session():
@@ -114,15 +149,70 @@ class DBManager:
             return result.scalar_one_or_none() is not None
     
     @staticmethod
-    async def add_found_car(filter_id: int, **kwargs) -> FoundCar:
-        """Добавить найденное объявление"""
+    async def add_found_car(filter_id: int, user_id: Optional[int] = None,
+                            fingerprints: Iterable[str] = (), notification: Optional[Dict] = None,
+                            **kwargs) -> FoundCar:
+        """
+        Добавить найденное объявление
+        
+        Args:
+            user_id: Владелец фильтра (нужен для записи отпечатка и уведомления)
+            fingerprints: Ключи отпечатка объявления для поиска дубликатов
+            notification: Уведомление для очереди отправки (text, photo, title, summary),
+                записывается в той же транзакции
+        """
         async with async_session() as session:
             car = FoundCar(filter_id=filter_id, **kwargs)
             session.add(car)
+            if user_id is not None:
+                for key in fingerprints:
+                    car.fingerprints.append(CarFingerprint(user_id=user_id, key=key))
+                if notification is not None:
+                    car.outbox.append(NotificationOutbox(user_id=user_id, source=car.source, **notification))
             await session.commit()
             await session.refresh(car)
+            if notification is not None:
+                # Запись очереди нужна конвейеру для отметки об отправке
+                await session.refresh(car, ['outbox'])
             return car
     
+    @staticmethod
+    async def get_cars_by_fingerprint(user_id: int, keys: List[str], found_after: datetime) -> List[FoundCar]:
+        """Найденные для пользователя объявления, у которых есть хотя бы один общий ключ отпечатка"""
+        if not keys:
+            return []
+        async with async_session() as session:
+            result = await session.execute(
+                select(FoundCar).join(CarFingerprint).where(
+                    and_(
+                        CarFingerprint.user_id == user_id,
+                        CarFingerprint.key.in_(keys),
+                        FoundCar.found_at >= found_after
+                    )
+                ).distinct()
+            )
+            return list(result.scalars().all())
+    
+    @staticmethod
+    async def get_recent_image_hashes(found_after: datetime, limit: int) -> List[Tuple[int, int, int]]:
+        """
+        Хеши фото последних отправленных объявлений
+        
+        Returns:
+            Список (ID пользователя, ID объявления, хеш) от старых к новым
+        """
+        async with async_session() as session:
+            result = await session.execute(
+                select(UserFilter.user_id, FoundCar.id, FoundCar.image_hash).join(UserFilter).where(
+                    and_(
+                        FoundCar.image_hash.is_not(None),
+                        FoundCar.duplicate_of_id.is_(None),
+                        FoundCar.found_at >= found_after
+                    )
+                ).order_by(FoundCar.id.desc()).limit(limit)
+            )
+            return [tuple(row) for row in reversed(result.all())]
+    
     @staticmethod
     async def mark_car_as_notified(car_id: int) -> None:
         """Отметить объявление как уведомленное"""
@@ -135,6 +225,17 @@ class DBManager:
                 car.notified = True
                 await session.commit()
     
+    @staticmethod
+    async def count_active_filters(user_id: int) -> int:
+        """Количество активных фильтров пользователя"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(func.count(UserFilter.id)).where(
+                    and_(UserFilter.user_id == user_id, UserFilter.is_active == True)
+                )
+            )
+            return result.scalar_one()
+    
     @staticmethod
     async def get_all_active_filters() -> List[UserFilter]:
         """Получить все активные фильтры всех пользователей"""
@@ -143,3 +244,617 @@ class DBManager:
                 select(UserFilter).where(UserFilter.is_active == True)
             )
             return list(result.scalars().all())
+    
+    @staticmethod
+    async def add_monitor_event(event_type: str, filter_id: Optional[int] = None,
+                                user_id: Optional[int] = None) -> MonitorEvent:
+        """Опубликовать событие для процессов мониторинга"""
+        async with async_session() as session:
+            monitor_event = MonitorEvent(event_type=event_type, filter_id=filter_id, user_id=user_id)
+            session.add(monitor_event)
+            await session.commit()
+            await session.refresh(monitor_event)
+            return monitor_event
+    
+    @staticmethod
+    async def get_monitor_events(after_id: int, limit: int = 100) -> List[MonitorEvent]:
+        """Получить события, опубликованные после указанного"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(MonitorEvent)
+                .where(MonitorEvent.id > after_id)
+                .order_by(MonitorEvent.id)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+    
+    @staticmethod
+    async def get_last_monitor_event_id() -> int:
+        """Получить ID последнего события"""
+        async with async_session() as session:
+            result = await session.execute(select(func.max(MonitorEvent.id)))
+            return result.scalar() or 0
+    
+    @staticmethod
+    async def delete_monitor_events_before(created_before: datetime) -> int:
+        """Удалить старые события"""
+        async with async_session() as session:
+            result = await session.execute(
+                delete(MonitorEvent).where(MonitorEvent.created_at < created_before)
+            )
+            await session.commit()
+            return result.rowcount
+    
+    @staticmethod
+    async def request_backfill(filter_id: int, sources: List[str]) -> None:
+        """Запросить (повторную) догрузку истории источников для фильтра"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(FilterBackfill).where(
+                    and_(
+                        FilterBackfill.filter_id == filter_id,
+                        FilterBackfill.source.in_(sources)
+                    )
+                )
+            )
+            existing = {backfill.source: backfill for backfill in result.scalars().all()}
+            for source in sources:
+                backfill = existing.get(source)
+                if backfill is None:
+                    session.add(FilterBackfill(filter_id=filter_id, source=source))
+                else:
+                    backfill.requested_at = datetime.utcnow()
+                    backfill.completed_at = None
+            await session.commit()
+    
+    @staticmethod
+    async def get_pending_backfills(sources: List[str], created_after: datetime) -> List[Tuple[UserFilter, str]]:
+        """
+        Получить невыполненные догрузки: (фильтр, источник)
+        
+        Догрузка нужна, если она запрошена явно, либо фильтр создан после created_after
+        и для источника еще нет записи о догрузке
+        """
+        async with async_session() as session:
+            filters_result = await session.execute(
+                select(UserFilter).where(UserFilter.is_active == True).order_by(UserFilter.id)
+            )
+            active_filters = list(filters_result.scalars().all())
+            if not active_filters:
+                return []
+            
+            backfills_result = await session.execute(
+                select(FilterBackfill).where(
+                    and_(
+                        FilterBackfill.filter_id.in_([f.id for f in active_filters]),
+                        FilterBackfill.source.in_(sources)
+                    )
+                )
+            )
+            backfills = {(b.filter_id, b.source): b for b in backfills_result.scalars().all()}
+            
+            pending = []
+            for user_filter in active_filters:
+                for source in sources:
+                    backfill = backfills.get((user_filter.id, source))
+                    if backfill is not None:
+                        if backfill.completed_at is None:
+                            pending.append((user_filter, source))
+                    elif user_filter.created_at and user_filter.created_at >= created_after:
+                        pending.append((user_filter, source))
+            return pending
+    
+    @staticmethod
+    async def complete_backfill(filter_id: int, source: str, checked_count: int, found_count: int) -> None:
+        """Отметить догрузку истории источника выполненной"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(FilterBackfill).where(
+                    and_(
+                        FilterBackfill.filter_id == filter_id,
+                        FilterBackfill.source == source
+                    )
+                )
+            )
+            backfill = result.scalar_one_or_none()
+            if backfill is None:
+                backfill = FilterBackfill(filter_id=filter_id, source=source)
+                session.add(backfill)
+            backfill.checked_count = checked_count
+            backfill.found_count = found_count
+            backfill.completed_at = datetime.utcnow()
+            await session.commit()
+    
+    @staticmethod
+    async def get_source_stats(filter_ids: Optional[List[int]] = None) -> List[FilterSourceStats]:
+        """Получить статистику источников (по всем фильтрам или по указанным)"""
+        async with async_session() as session:
+            query = select(FilterSourceStats)
+            if filter_ids is not None:
+                query = query.where(FilterSourceStats.filter_id.in_(filter_ids))
+            result = await session.execute(query)
+            return list(result.scalars().all())
+    
+    @staticmethod
+    async def record_source_stats(entries: List[Dict]) -> None:
+        """
+        Записать результаты проверок источников одной транзакцией
+        
+        Args:
+            entries: Словари с ключами filter_id, source, seconds, received, matched, new
+        """
+        if not entries:
+            return
+        async with async_session() as session:
+            result = await session.execute(
+                select(FilterSourceStats).where(
+                    FilterSourceStats.filter_id.in_({entry['filter_id'] for entry in entries})
+                )
+            )
+            existing = {(stats.filter_id, stats.source): stats for stats in result.scalars().all()}
+            now = datetime.utcnow()
+            for entry in entries:
+                key = (entry['filter_id'], entry['source'])
+                stats = existing.get(key)
+                if stats is None:
+                    stats = FilterSourceStats(
+                        filter_id=entry['filter_id'], source=entry['source'],
+                        checks_count=0, total_fetch_seconds=0.0, received_total=0,
+                        matched_total=0, new_total=0, zero_streak=0
+                    )
+                    session.add(stats)
+                    existing[key] = stats
+                stats.checks_count += 1
+                stats.total_fetch_seconds += entry['seconds']
+                stats.received_total += entry['received']
+                stats.matched_total += entry['matched']
+                stats.new_total += entry['new']
+                stats.last_checked_at = now
+                if entry['matched']:
+                    stats.zero_streak = 0
+                    stats.last_match_at = now
+                else:
+                    stats.zero_streak += 1
+            await session.commit()
+    
+    @staticmethod
+    async def reset_source_stats(filter_id: int) -> None:
+        """Сбросить серии проверок без совпадений (после изменения фильтра)"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(FilterSourceStats).where(FilterSourceStats.filter_id == filter_id)
+            )
+            for stats in result.scalars().all():
+                stats.zero_streak = 0
+            await session.commit()
+    
+    @staticmethod
+    async def get_ad_snapshots(sources: List[str], seen_after: datetime) -> List[AdSnapshot]:
+        """Состояния объявлений источников, встречавшихся после указанного времени"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(AdSnapshot).where(
+                    and_(AdSnapshot.source.in_(sources), AdSnapshot.last_seen_at >= seen_after)
+                )
+            )
+            return list(result.scalars().all())
+    
+    @staticmethod
+    async def save_ad_snapshots(rows: List[Dict]) -> None:
+        """Записать состояния объявлений (вставка или обновление по источнику и ID)"""
+        if not rows:
+            return
+        async with async_session() as session:
+            statement = sqlite_insert(AdSnapshot)
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=['source', 'ad_id'],
+                    set_={
+                        'price_usd': statement.excluded.price_usd,
+                        'price_byn': statement.excluded.price_byn,
+                        'state_hash': statement.excluded.state_hash,
+                        'last_seen_at': statement.excluded.last_seen_at,
+                        'removed_at': statement.excluded.removed_at,
+                    }
+                ),
+                rows
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def get_ad_snapshot(source: str, ad_id: str) -> Optional[AdSnapshot]:
+        """Состояние объявления"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(AdSnapshot).where(and_(AdSnapshot.source == source, AdSnapshot.ad_id == str(ad_id)))
+            )
+            return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def get_found_car_by_url(user_id: int, url: str) -> Optional[FoundCar]:
+        """Найденное для пользователя объявление по ссылке"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(FoundCar).join(UserFilter).where(
+                    and_(FoundCar.url == url, UserFilter.user_id == user_id)
+                ).order_by(FoundCar.id.desc()).limit(1)
+            )
+            return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def delete_ad_snapshots_before(seen_before: datetime) -> None:
+        """Удалить состояния давно не встречавшихся объявлений"""
+        async with async_session() as session:
+            await session.execute(delete(AdSnapshot).where(AdSnapshot.last_seen_at < seen_before))
+            await session.commit()
+    
+    @staticmethod
+    async def apply_price_change(source: str, ad_id: str, price_usd: Optional[float],
+                                 price_byn: Optional[float]) -> List[Tuple[int, FoundCar]]:
+        """
+        Обновить цену найденного объявления у всех пользователей
+        
+        Returns:
+            Список (ID пользователя, объявление) для уведомленных пользователей
+        """
+        async with async_session() as session:
+            result = await session.execute(
+                select(UserFilter.user_id, FoundCar).join(UserFilter).where(
+                    and_(FoundCar.source == source, FoundCar.ad_id == str(ad_id))
+                )
+            )
+            rows = result.all()
+            notified = []
+            for user_id, found_car in rows:
+                found_car.price_usd = price_usd
+                found_car.price_byn = price_byn
+                # Пользователь узнал об автомобиле из этого объявления, а не из дубликата
+                if found_car.notified and found_car.duplicate_of_id is None:
+                    notified.append((user_id, found_car))
+            await session.commit()
+            return notified
+    
+    @staticmethod
+    async def get_market_stats() -> List[MarketStat]:
+        """Скетчи рыночных цен (от давно обновленных к недавним)"""
+        async with async_session() as session:
+            result = await session.execute(select(MarketStat).order_by(MarketStat.updated_at, MarketStat.id))
+            return list(result.scalars().all())
+    
+    @staticmethod
+    async def save_market_stats(rows: List[Dict]) -> None:
+        """Записать скетчи рыночных цен (вставка или обновление по группе)"""
+        if not rows:
+            return
+        now = datetime.utcnow()
+        async with async_session() as session:
+            statement = sqlite_insert(MarketStat)
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=['key'],
+                    set_={
+                        'count': statement.excluded.count,
+                        'data': statement.excluded.data,
+                        'updated_at': statement.excluded.updated_at,
+                    }
+                ),
+                [dict(row, updated_at=now) for row in rows]
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def add_watched_ad(user_id: int, found_car_id: int) -> Optional[WatchedAd]:
+        """
+        Добавить найденное объявление в список наблюдения пользователя
+        
+        Returns:
+            Запись наблюдения (уже существующая, если объявление в списке) или None, если объявление не найдено
+        """
+        async with async_session() as session:
+            result = await session.execute(
+                select(FoundCar).join(UserFilter).where(
+                    and_(FoundCar.id == found_car_id, UserFilter.user_id == user_id)
+                )
+            )
+            found_car = result.scalar_one_or_none()
+            if found_car is None:
+                return None
+            result = await session.execute(
+                select(WatchedAd).where(and_(
+                    WatchedAd.user_id == user_id,
+                    WatchedAd.source == found_car.source,
+                    WatchedAd.ad_id == found_car.ad_id
+                ))
+            )
+            watched_ad = result.scalar_one_or_none()
+            if watched_ad is not None:
+                return watched_ad
+            watched_ad = WatchedAd(
+                user_id=user_id, source=found_car.source, ad_id=found_car.ad_id,
+                title=found_car.title, url=found_car.url,
+                price_usd=found_car.price_usd, price_byn=found_car.price_byn
+            )
+            session.add(watched_ad)
+            await session.commit()
+            await session.refresh(watched_ad)
+            return watched_ad
+    
+    @staticmethod
+    async def get_watched_ads(user_id: int) -> List[WatchedAd]:
+        """Список наблюдения пользователя"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(WatchedAd).where(WatchedAd.user_id == user_id).order_by(WatchedAd.created_at)
+            )
+            return list(result.scalars().all())
+    
+    @staticmethod
+    async def delete_watched_ad(watch_id: int, user_id: int) -> bool:
+        """Убрать объявление из списка наблюдения (только свое)"""
+        async with async_session() as session:
+            result = await session.execute(
+                delete(WatchedAd).where(and_(WatchedAd.id == watch_id, WatchedAd.user_id == user_id))
+            )
+            await session.commit()
+            return result.rowcount > 0
+    
+    @staticmethod
+    async def get_due_watched_ads(source: str, checked_before: datetime, limit: int) -> List[Tuple[str, str]]:
+        """
+        Объявления источника из списков наблюдения, которые пора проверить
+        
+        Одно объявление в списках нескольких пользователей возвращается один раз.
+        Снятые с продажи объявления больше не проверяются.
+        
+        Returns:
+            Список (ID объявления, ссылка), сначала давно не проверявшиеся
+        """
+        async with async_session() as session:
+            result = await session.execute(
+                select(WatchedAd.ad_id, func.min(WatchedAd.url)).where(and_(
+                    WatchedAd.source == source,
+                    WatchedAd.removed_at.is_(None),
+                    or_(WatchedAd.checked_at.is_(None), WatchedAd.checked_at < checked_before)
+                )).group_by(WatchedAd.ad_id).order_by(
+                    func.min(func.coalesce(WatchedAd.checked_at, WatchedAd.created_at))
+                ).limit(limit)
+            )
+            return [(ad_id, url) for ad_id, url in result.all()]
+    
+    @staticmethod
+    async def get_ad_watchers(source: str, ad_id: str) -> List[WatchedAd]:
+        """Записи наблюдения за объявлением всех пользователей"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(WatchedAd).where(and_(WatchedAd.source == source, WatchedAd.ad_id == str(ad_id)))
+            )
+            return list(result.scalars().all())
+    
+    @staticmethod
+    async def update_watched_ads(source: str, ad_id: str, **kwargs) -> None:
+        """Обновить записи наблюдения за объявлением у всех пользователей"""
+        async with async_session() as session:
+            await session.execute(
+                update(WatchedAd).where(
+                    and_(WatchedAd.source == source, WatchedAd.ad_id == str(ad_id))
+                ).values(**kwargs)
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def get_telegram_file_id(url: str) -> Optional[str]:
+        """file_id фото, уже загруженного в Telegram (None - фото еще не отправлялось)"""
+        async with async_session() as session:
+            result = await session.execute(select(TelegramFile.file_id).where(TelegramFile.url == url))
+            return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def save_telegram_file_id(url: str, file_id: str) -> None:
+        """Запомнить file_id фото (вставка или обновление по ссылке)"""
+        async with async_session() as session:
+            statement = sqlite_insert(TelegramFile).values(url=url, file_id=file_id, created_at=datetime.utcnow())
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=['url'],
+                    set_={'file_id': statement.excluded.file_id, 'created_at': statement.excluded.created_at}
+                )
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def delete_telegram_file(url: str) -> None:
+        """Забыть file_id фото (Telegram его больше не принимает)"""
+        async with async_session() as session:
+            await session.execute(delete(TelegramFile).where(TelegramFile.url == url))
+            await session.commit()
+    
+    @staticmethod
+    async def delete_telegram_files_before(created_before: datetime) -> None:
+        """Удалить file_id фото, загруженных давно (объявления уже неактуальны)"""
+        async with async_session() as session:
+            await session.execute(delete(TelegramFile).where(TelegramFile.created_at < created_before))
+            await session.commit()
+    
+    @staticmethod
+    async def get_digest_mode(user_id: int) -> bool:
+        """Включен ли у пользователя режим подборки"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(UserSettings.digest_mode).where(UserSettings.user_id == user_id)
+            )
+            return bool(result.scalar_one_or_none())
+    
+    @staticmethod
+    async def set_digest_mode(user_id: int, enabled: bool) -> None:
+        """Включить или выключить режим подборки"""
+        async with async_session() as session:
+            statement = sqlite_insert(UserSettings).values(
+                user_id=user_id, digest_mode=enabled, updated_at=datetime.utcnow()
+            )
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=['user_id'],
+                    set_={'digest_mode': statement.excluded.digest_mode, 'updated_at': statement.excluded.updated_at}
+                )
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def get_digest_user_ids() -> Set[int]:
+        """ID пользователей с включенным режимом подборки"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(UserSettings.user_id).where(UserSettings.digest_mode.is_(True))
+            )
+            return set(result.scalars().all())
+    
+    @staticmethod
+    async def get_last_outbox_id() -> int:
+        """ID последней записи очереди уведомлений (0 - очередь пуста)"""
+        async with async_session() as session:
+            result = await session.execute(select(func.max(NotificationOutbox.id)))
+            return result.scalar() or 0
+    
+    @staticmethod
+    async def start_outbox(outbox_ids: List[int]) -> None:
+        """Отметить уведомления как отправляемые (до обращения к Telegram)"""
+        if not outbox_ids:
+            return
+        async with async_session() as session:
+            await session.execute(
+                update(NotificationOutbox).where(NotificationOutbox.id.in_(outbox_ids))
+                .values(status='sending', claimed_at=datetime.utcnow())
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def claim_outbox(sources: List[str], recover_until_id: int, claimed_before: datetime,
+                           stale_before: datetime, limit: int) -> List[NotificationOutbox]:
+        """
+        Забрать на отправку уведомления, которые не отправил конвейер проверки
+        
+        Это повторные попытки после ошибки, записи до recover_until_id, оставшиеся
+        неотправленными после остановки процесса, и брошенные записи: не отправленные
+        и не взятые в работу с stale_before (конвейер упал до записи результата).
+        Записи, которые уже отправлялись после claimed_before, не берутся.
+        
+        Доставка "хотя бы один раз": если процесс остановился после отправки в Telegram,
+        но до записи ID сообщения, уведомление будет отправлено повторно.
+        
+        Returns:
+            Уведомления в порядке создания (уже отмечены как отправляемые)
+        """
+        async with async_session() as session:
+            result = await session.execute(
+                select(NotificationOutbox).where(
+                    and_(
+                        NotificationOutbox.source.in_(sources),
+                        NotificationOutbox.message_id.is_(None),
+                        or_(NotificationOutbox.claimed_at.is_(None), NotificationOutbox.claimed_at < claimed_before),
+                        or_(
+                            and_(NotificationOutbox.status == 'pending', NotificationOutbox.attempts > 0),
+                            and_(
+                                NotificationOutbox.status.in_(('pending', 'sending')),
+                                or_(
+                                    NotificationOutbox.id <= recover_until_id,
+                                    func.coalesce(NotificationOutbox.claimed_at, NotificationOutbox.created_at) < stale_before
+                                )
+                            )
+                        )
+                    )
+                ).order_by(NotificationOutbox.id).limit(limit)
+            )
+            entries = list(result.scalars().all())
+            now = datetime.utcnow()
+            for entry in entries:
+                entry.status = 'sending'
+                entry.claimed_at = now
+            await session.commit()
+            return entries
+    
+    @staticmethod
+    async def complete_outbox(message_ids: Dict[int, int], delivery: str = 'single') -> None:
+        """
+        Отметить уведомления отправленными
+        
+        Args:
+            message_ids: ID записи очереди -> ID сообщения в Telegram
+            delivery: single - каждое уведомление отдельным сообщением, group - общим сообщением
+        """
+        if not message_ids:
+            return
+        now = datetime.utcnow()
+        async with async_session() as session:
+            result = await session.execute(
+                select(NotificationOutbox).where(NotificationOutbox.id.in_(list(message_ids)))
+            )
+            entries = list(result.scalars().all())
+            for entry in entries:
+                entry.status = 'sent'
+                entry.message_id = message_ids[entry.id]
+                entry.delivery = delivery
+                entry.sent_at = now
+            # Отметка в объявлении - в той же транзакции
+            await session.execute(
+                update(FoundCar).where(FoundCar.id.in_([entry.found_car_id for entry in entries]))
+                .values(notified=True)
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def fail_outbox(outbox_ids: List[int], max_attempts: int) -> None:
+        """Вернуть неотправленные уведомления в очередь (после max_attempts попыток - отказаться)"""
+        if not outbox_ids:
+            return
+        async with async_session() as session:
+            await session.execute(
+                update(NotificationOutbox).where(NotificationOutbox.id.in_(outbox_ids)).values(
+                    attempts=NotificationOutbox.attempts + 1,
+                    status=case(
+                        (NotificationOutbox.attempts + 1 >= max_attempts, 'failed'),
+                        else_='pending'
+                    )
+                )
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def delete_outbox_before(created_before: datetime) -> None:
+        """Удалить старые отправленные и неотправленные уведомления (в работе остаются)"""
+        async with async_session() as session:
+            await session.execute(
+                delete(NotificationOutbox).where(
+                    and_(
+                        NotificationOutbox.created_at < created_before,
+                        NotificationOutbox.status.in_(('sent', 'failed'))
+                    )
+                )
+            )
+            await session.commit()
+    
+    @staticmethod
+    async def get_sent_notifications(source: str, ad_id: str) -> List[NotificationOutbox]:
+        """Отправленные отдельными сообщениями уведомления об объявлении (их можно изменить)"""
+        async with async_session() as session:
+            result = await session.execute(
+                select(NotificationOutbox).join(FoundCar).where(
+                    and_(
+                        FoundCar.source == source,
+                        FoundCar.ad_id == str(ad_id),
+                        NotificationOutbox.status == 'sent',
+                        NotificationOutbox.delivery == 'single',
+                        NotificationOutbox.message_id.is_not(None)
+                    )
+                )
+            )
+            return list(result.scalars().all())
+    
+    @staticmethod
+    async def set_outbox_status_text(outbox_id: int, status_text: str) -> None:
+        """Запомнить строки об изменениях, добавленные к отправленному сообщению"""
+        async with async_session() as session:
+            await session.execute(
+                update(NotificationOutbox).where(NotificationOutbox.id == outbox_id)
+                .values(status_text=status_text, edited_at=datetime.utcnow())
+            )
+            await session.commit()
@@ -10,15 +10,16 @@ from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMar
 from aiogram.fsm.context import FSMContext
 
 # Локальные импорты
-from config import BRANDS, BRAND_MODELS, BODY_TYPES
+from config import BRANDS, BRAND_MODELS, BODY_TYPES, WATCHLIST_MAX_PER_USER, MAX_ACTIVE_FILTERS_PER_USER
 from keyboards import (
     get_main_keyboard, get_filter_keyboard, get_brand_keyboard,
     get_model_keyboard, get_transmission_keyboard, get_engine_type_keyboard,
     get_body_type_keyboard, get_year_from_keyboard, get_year_to_keyboard,
-    get_price_from_keyboard, get_price_to_keyboard
+    get_price_from_keyboard, get_price_to_keyboard, get_watchlist_keyboard, get_max_age_keyboard,
+    get_digest_keyboard
 )
 from states import FilterStates
-from utils.formatters import format_filter_text
+from utils.formatters import format_filter_text, format_watchlist_text, format_digest_mode_text
 
 if TYPE_CHECKING:
     from db_manager import DBManager
@@ -85,6 +86,8 @@ def register_callback_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
                 transmission=filter_obj.transmission,
                 engine_type=filter_obj.engine_type,
                 body_type=filter_obj.body_type,
+                below_market_only=filter_obj.below_market_only,
+                max_age_days=filter_obj.max_age_days,
             )
             
             # Используем функцию форматирования для единообразия
@@ -558,6 +561,62 @@ def register_callback_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
         )
         await callback.answer()
     
+    # ========== Обработчики возраста объявлений ==========
+    @dp.callback_query(F.data.startswith("filter_max_age_"))
+    async def callback_set_max_age(callback: CallbackQuery, state: FSMContext):
+        """Выбрать максимальный возраст объявлений"""
+        filter_id = callback.data.split("_")[-1]
+        filter_id = None if filter_id == "None" else int(filter_id)
+        
+        await callback.message.edit_text(
+            "Присылать объявления, опубликованные не раньше чем:\n"
+            "(для сайтов, которые сообщают время публикации)",
+            reply_markup=get_max_age_keyboard(filter_id)
+        )
+        await callback.answer()
+    
+    @dp.callback_query(F.data.startswith("set_max_age_"))
+    async def callback_save_max_age(callback: CallbackQuery, state: FSMContext):
+        """Сохранить максимальный возраст объявлений"""
+        parts = callback.data.split("_")
+        max_age_days = int(parts[3])
+        filter_id = parts[4] if parts[4] != "None" else None
+        
+        data = await state.get_data()
+        if not data.get('filter_id') and filter_id:
+            data['filter_id'] = filter_id
+        
+        # 0 сохраняется как есть: так снимается ограничение у существующего фильтра
+        data['max_age_days'] = max_age_days
+        await state.update_data(**data)
+        
+        text = f"✅ Не старше {max_age_days} дн. с публикации" if max_age_days else "✅ Возраст объявлений не ограничен"
+        await callback.message.edit_text(text, reply_markup=get_filter_keyboard(data.get('filter_id')))
+        await callback.answer()
+    
+    # ========== Режим "только ниже рынка" ==========
+    @dp.callback_query(F.data.startswith("toggle_below_market_"))
+    async def callback_toggle_below_market(callback: CallbackQuery, state: FSMContext):
+        """Включить или выключить уведомления только об объявлениях дешевле рыночной медианы"""
+        filter_id = callback.data.split("_")[-1]
+        filter_id = None if filter_id == "None" else int(filter_id)
+        
+        data = await state.get_data()
+        if not data.get('filter_id') and filter_id:
+            data['filter_id'] = filter_id
+        
+        data['below_market_only'] = not data.get('below_market_only')
+        await state.update_data(**data)
+        
+        status = "включен" if data['below_market_only'] else "выключен"
+        await callback.message.edit_text(
+            f"✅ Режим «только ниже рынка» {status}\n\n"
+            "В этом режиме приходят только объявления дешевле медианы цен похожих автомобилей "
+            "(та же марка, модель и близкие годы). Пока похожих объявлений мало, проверка не применяется.",
+            reply_markup=get_filter_keyboard(data.get('filter_id'))
+        )
+        await callback.answer()
+    
     # ========== Обработчики сохранения и удаления фильтра ==========
     @dp.callback_query(F.data.startswith("save_filter_"))
     async def callback_save_filter(callback: CallbackQuery, state: FSMContext):
@@ -576,13 +635,15 @@ def register_callback_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
                 'transmission': data.get('transmission'),
                 'engine_type': data.get('engine_type'),
                 'body_type': data.get('body_type'),
+                'below_market_only': data.get('below_market_only'),
+                'max_age_days': data.get('max_age_days'),
             }
             
             # Удаляем None значения
             filter_data = {k: v for k, v in filter_data.items() if v is not None}
             
-            # Проверяем, что есть хотя бы один параметр
-            if not filter_data:
+            # Проверяем, что есть хотя бы один параметр (режим "только ниже рынка" и возраст сами по себе не параметры)
+            if not any(key not in ('below_market_only', 'max_age_days') for key in filter_data):
                 await callback.answer("❌ Укажите хотя бы один параметр фильтра!", show_alert=True)
                 return
             
@@ -591,6 +652,8 @@ def register_callback_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
                 user_id = callback.from_user.id
                 filter_obj = await db_manager.update_user_filter(filter_id, user_id, **filter_data)
                 if filter_obj:
+                    # Сообщаем процессам мониторинга о новых условиях фильтра
+                    await db_manager.add_monitor_event('filter_saved', filter_id=filter_obj.id, user_id=user_id)
                     await callback.message.edit_text(
                         "✅ <b>Фильтр обновлен!</b>\n\n" + format_filter_text(filter_obj),
                         parse_mode='HTML'
@@ -604,8 +667,16 @@ def register_callback_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
                     await callback.answer("❌ Ошибка: фильтр не найден или у вас нет доступа к нему!", show_alert=True)
                     return
             else:
-                # Создаем новый фильтр
+                # Создаем новый фильтр (в пределах лимита активных фильтров пользователя)
+                if 0 < MAX_ACTIVE_FILTERS_PER_USER <= await db_manager.count_active_filters(callback.from_user.id):
+                    await callback.answer(
+                        f"❌ Можно создать не более {MAX_ACTIVE_FILTERS_PER_USER} фильтров. "
+                        "Удалите ненужный или измените существующий фильтр",
+                        show_alert=True
+                    )
+                    return
                 filter_obj = await db_manager.add_user_filter(callback.from_user.id, **filter_data)
+                await db_manager.add_monitor_event('filter_saved', filter_id=filter_obj.id, user_id=callback.from_user.id)
                 await callback.message.edit_text(
                     f"✅ <b>Фильтр #{filter_obj.id} создан!</b>\n\n" + format_filter_text(filter_obj),
                     parse_mode='HTML'
@@ -701,6 +772,80 @@ def register_callback_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
             print(f"Ошибка в callback_my_filters: {e}")
             await callback.answer("❌ Произошла ошибка при загрузке фильтров!", show_alert=True)
     
+    # ========== Список наблюдения ==========
+    @dp.callback_query(F.data.startswith("watch_"))
+    async def callback_watch(callback: CallbackQuery):
+        """Добавить объявление из уведомления в список наблюдения"""
+        try:
+            found_car_id = int(callback.data.split("_")[-1])
+            user_id = callback.from_user.id
+            
+            watched_ads = await db_manager.get_watched_ads(user_id)
+            if len(watched_ads) >= WATCHLIST_MAX_PER_USER:
+                await callback.answer(
+                    f"❌ В списке наблюдения уже {len(watched_ads)} объявлений. "
+                    "Уберите ненужные командой /watchlist",
+                    show_alert=True
+                )
+                return
+            
+            watched_ad = await db_manager.add_watched_ad(user_id, found_car_id)
+            if watched_ad is None:
+                await callback.answer("❌ Объявление не найдено!", show_alert=True)
+                return
+            await callback.answer("👁 Объявление добавлено в список наблюдения. Список: /watchlist")
+        except ValueError:
+            await callback.answer("❌ Неверный ID объявления!", show_alert=True)
+        except Exception as e:
+            print(f"Ошибка в callback_watch: {e}")
+            await callback.answer("❌ Произошла ошибка при добавлении в список наблюдения!", show_alert=True)
+    
+    @dp.callback_query(F.data.startswith("unwatch_"))
+    async def callback_unwatch(callback: CallbackQuery):
+        """Убрать объявление из списка наблюдения (только свое)"""
+        try:
+            watch_id = int(callback.data.split("_")[-1])
+            user_id = callback.from_user.id
+            
+            if not await db_manager.delete_watched_ad(watch_id, user_id):
+                await callback.answer("❌ Объявление не найдено в вашем списке!", show_alert=True)
+                return
+            
+            watched_ads = await db_manager.get_watched_ads(user_id)
+            if watched_ads:
+                await callback.message.edit_text(
+                    format_watchlist_text(watched_ads),
+                    parse_mode='HTML',
+                    reply_markup=get_watchlist_keyboard(watched_ads),
+                    disable_web_page_preview=True
+                )
+            else:
+                await callback.message.edit_text("👁 Список наблюдения пуст")
+            await callback.answer("✅ Объявление убрано из списка наблюдения")
+        except ValueError:
+            await callback.answer("❌ Неверный ID объявления!", show_alert=True)
+        except Exception as e:
+            print(f"Ошибка в callback_unwatch: {e}")
+            await callback.answer("❌ Произошла ошибка при удалении из списка наблюдения!", show_alert=True)
+    
+    # ========== Режим подборки ==========
+    @dp.callback_query(F.data == "toggle_digest")
+    async def callback_toggle_digest(callback: CallbackQuery):
+        """Переключить режим подборки"""
+        try:
+            user_id = callback.from_user.id
+            enabled = not await db_manager.get_digest_mode(user_id)
+            await db_manager.set_digest_mode(user_id, enabled)
+            await callback.message.edit_text(
+                format_digest_mode_text(enabled),
+                parse_mode='HTML',
+                reply_markup=get_digest_keyboard(enabled)
+            )
+            await callback.answer("✅ Настройка сохранена")
+        except Exception as e:
+            print(f"Ошибка в callback_toggle_digest: {e}")
+            await callback.answer("❌ Произошла ошибка при сохранении настройки!", show_alert=True)
+    
     @dp.callback_query(F.data == "back_to_menu")
     async def callback_back_to_menu(callback: CallbackQuery, state: FSMContext):
         """Вернуться в главное меню"""
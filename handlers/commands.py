@@ -2,17 +2,23 @@
 Обработчики команд бота
 """
 # Стандартная библиотека
+from collections import defaultdict
+from datetime import datetime
 from typing import TYPE_CHECKING
 
 # Сторонние библиотеки
 from aiogram import Dispatcher, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 # Локальные импорты
-from keyboards import get_main_keyboard, get_filter_keyboard
-from utils.formatters import format_filter_text
+from config import ADMIN_IDS
+from keyboards import get_main_keyboard, get_filter_keyboard, get_watchlist_keyboard, get_digest_keyboard
+from utils.formatters import (
+    format_filter_text, format_source_stats_text, format_ad_status_text, format_watchlist_text,
+    format_digest_mode_text
+)
 
 if TYPE_CHECKING:
     from db_manager import DBManager
@@ -49,7 +55,10 @@ def register_command_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
             "Команды:\n"
             "/start - Главное меню\n"
             "/help - Эта справка\n"
-            "/filters - Список ваших фильтров",
+            "/filters - Список ваших фильтров\n"
+            "/check ссылка - Продается ли еще найденный автомобиль\n"
+            "/watchlist - Объявления, за которыми вы следите\n"
+            "/digest - Присылать новые объявления подборкой",
             reply_markup=get_main_keyboard()
         )
     
@@ -68,6 +77,75 @@ def register_command_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
         
         await message.answer(text, parse_mode='HTML', reply_markup=get_main_keyboard())
     
+    @dp.message(Command("check"))
+    async def cmd_check(message: Message, command: CommandObject):
+        """Проверить, есть ли еще в продаже объявление, о котором пришло уведомление"""
+        url = (command.args or '').strip()
+        if not url:
+            await message.answer("Укажите ссылку на объявление из уведомления: /check https://...")
+            return
+        
+        found_car = await db_manager.get_found_car_by_url(message.from_user.id, url)
+        if not found_car:
+            await message.answer("Это объявление не найдено среди ваших уведомлений")
+            return
+        snapshot = await db_manager.get_ad_snapshot(found_car.source, found_car.ad_id)
+        await message.answer(format_ad_status_text(found_car, snapshot), parse_mode='HTML')
+    
+    @dp.message(Command("watchlist"))
+    async def cmd_watchlist(message: Message):
+        """Показать список наблюдения пользователя"""
+        watched_ads = await db_manager.get_watched_ads(message.from_user.id)
+        if not watched_ads:
+            await message.answer(
+                "Вы пока не следите ни за одним объявлением.\n"
+                "Нажмите «👁 Следить за ценой» под уведомлением, чтобы узнавать об изменении цены и снятии с продажи."
+            )
+            return
+        await message.answer(
+            format_watchlist_text(watched_ads),
+            parse_mode='HTML',
+            reply_markup=get_watchlist_keyboard(watched_ads),
+            disable_web_page_preview=True
+        )
+    
+    @dp.message(Command("digest"))
+    async def cmd_digest(message: Message):
+        """Показать и переключить режим подборки"""
+        enabled = await db_manager.get_digest_mode(message.from_user.id)
+        await message.answer(
+            format_digest_mode_text(enabled),
+            parse_mode='HTML',
+            reply_markup=get_digest_keyboard(enabled)
+        )
+    
+    @dp.message(Command("sources"))
+    async def cmd_sources(message: Message):
+        """Решения мониторинга по источникам для каждого фильтра (только для администраторов)"""
+        if message.from_user.id not in ADMIN_IDS:
+            return
+        filters = await db_manager.get_all_active_filters()
+        if not filters:
+            await message.answer("Нет активных фильтров")
+            return
+        
+        stats_by_filter = defaultdict(list)
+        for stats in await db_manager.get_source_stats([f.id for f in filters]):
+            stats_by_filter[stats.filter_id].append(stats)
+        
+        # Длинный отчет разбивается на несколько сообщений (лимит Telegram - 4096 символов)
+        MAX_MESSAGE_LENGTH = 3500
+        now = datetime.utcnow()
+        text = "📊 <b>Источники по фильтрам</b>\n\n"
+        for f in filters:
+            filter_text = format_source_stats_text(f, stats_by_filter[f.id], now) + "\n"
+            if len(text) + len(filter_text) > MAX_MESSAGE_LENGTH:
+                await message.answer(text, parse_mode='HTML')
+                text = ""
+            text += filter_text
+        if text:
+            await message.answer(text, parse_mode='HTML')
+    
     @dp.message(F.text == "➕ Добавить фильтр")
     async def handle_add_filter_button(message: Message, state: FSMContext):
         """Обработчик кнопки 'Добавить фильтр' из постоянной клавиатуры"""
@@ -173,7 +251,10 @@ def register_command_handlers(dp: Dispatcher, db_manager: 'DBManager') -> None:
             "Команды:\n"
             "/start - Главное меню\n"
             "/help - Эта справка\n"
-            "/filters - Список ваших фильтров",
+            "/filters - Список ваших фильтров\n"
+            "/check ссылка - Продается ли еще найденный автомобиль\n"
+            "/watchlist - Объявления, за которыми вы следите\n"
+            "/digest - Присылать новые объявления подборкой",
             reply_markup=get_main_keyboard()
         )
     
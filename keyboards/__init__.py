@@ -12,6 +12,7 @@ from aiogram.types import (
 
 # Локальные импорты
 from config import BRANDS, BRAND_MODELS, BODY_TYPES
+from database import WatchedAd
 
 
 def get_filter_keyboard(filter_id: Optional[int] = None) -> InlineKeyboardMarkup:
@@ -25,7 +26,9 @@ def get_filter_keyboard(filter_id: Optional[int] = None) -> InlineKeyboardMarkup
          InlineKeyboardButton(text="💰 Цена до (USD)", callback_data=f"filter_price_to_{filter_id}")],
         [InlineKeyboardButton(text="⚙️ Коробка передач", callback_data=f"filter_transmission_{filter_id}"),
          InlineKeyboardButton(text="⛽ Тип двигателя", callback_data=f"filter_engine_type_{filter_id}")],
-        [InlineKeyboardButton(text="🚙 Тип кузова", callback_data=f"filter_body_type_{filter_id}")],
+        [InlineKeyboardButton(text="🚙 Тип кузова", callback_data=f"filter_body_type_{filter_id}"),
+         InlineKeyboardButton(text="🕒 Не старше", callback_data=f"filter_max_age_{filter_id}")],
+        [InlineKeyboardButton(text="📊 Только ниже рынка (вкл/выкл)", callback_data=f"toggle_below_market_{filter_id}")],
         [InlineKeyboardButton(text="✅ Сохранить фильтр", callback_data=f"save_filter_{filter_id}"),
          InlineKeyboardButton(text="❌ Удалить фильтр", callback_data=f"delete_filter_{filter_id}")],
     ]
@@ -138,6 +141,23 @@ def get_engine_type_keyboard(filter_id: Optional[int] = None) -> InlineKeyboardM
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def get_max_age_keyboard(filter_id: Optional[int] = None) -> InlineKeyboardMarkup:
+    """Клавиатура выбора максимального возраста объявления"""
+    buttons = [
+        [InlineKeyboardButton(text="1 день", callback_data=f"set_max_age_1_{filter_id}"),
+         InlineKeyboardButton(text="3 дня", callback_data=f"set_max_age_3_{filter_id}")],
+        [InlineKeyboardButton(text="7 дней", callback_data=f"set_max_age_7_{filter_id}"),
+         InlineKeyboardButton(text="30 дней", callback_data=f"set_max_age_30_{filter_id}")],
+        [InlineKeyboardButton(text="Без ограничения", callback_data=f"set_max_age_0_{filter_id}")],
+    ]
+    # Кнопка "Назад" - возвращает к редактированию фильтра или к созданию нового
+    if filter_id is not None:
+        buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data=f"edit_filter_{filter_id}")])
+    else:
+        buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="add_filter")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
 def get_body_type_keyboard(filter_id: Optional[int] = None) -> InlineKeyboardMarkup:
     """Клавиатура выбора типа кузова"""
     buttons: List[List[InlineKeyboardButton]] = []
@@ -266,3 +286,28 @@ def get_price_to_keyboard(filter_id: Optional[int] = None) -> InlineKeyboardMark
         back_cb = "add_filter"
     buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data=back_cb)])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_watch_keyboard(found_car_id: int) -> InlineKeyboardMarkup:
+    """Кнопка добавления найденного объявления в список наблюдения"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="👁 Следить за ценой", callback_data=f"watch_{found_car_id}")]
+    ])
+
+
+def get_watchlist_keyboard(watched_ads: List[WatchedAd]) -> InlineKeyboardMarkup:
+    """Кнопки удаления объявлений из списка наблюдения"""
+    buttons = [
+        [InlineKeyboardButton(text=f"🗑 Не следить: {number}. {watched_ad.title[:40]}",
+                              callback_data=f"unwatch_{watched_ad.id}")]
+        for number, watched_ad in enumerate(watched_ads, 1)
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_digest_keyboard(enabled: bool) -> InlineKeyboardMarkup:
+    """Кнопка переключения режима подборки"""
+    text = "📨 Присылать по одному" if enabled else "📚 Присылать подборкой"
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=text, callback_data="toggle_digest")]
+    ])
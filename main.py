@@ -1,14 +1,28 @@
 """
 Главный файл для запуска бота
+
+Режимы запуска:
+    python main.py                       - бот и мониторинг в одном процессе
+    python main.py --mode bot            - только обработчики Telegram-бота
+    python main.py --mode monitor        - только мониторинг объявлений
+    python main.py --mode monitor --sources av.by,kufar.by
+
+Бот и процессы мониторинга связаны через базу данных (таблица monitor_events),
+поэтому их можно запускать, масштабировать и перезапускать независимо.
 """
 # Стандартная библиотека
+import argparse
 import asyncio
 import logging
 import sys
+from typing import List, Optional
 
 # Локальные импорты
 from bot import dp, bot
+from config import PARSE_WORKERS, CHECK_INTERVAL_MINUTES
 from db_manager import init_db
+from parsers.factory import ParserFactory
+from parsers.pool import configure_parse_pool, shutdown_parse_pool
 from services import MonitorService, bot_instance
 
 # Настройка логирования
@@ -23,7 +37,32 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
+def parse_args() -> argparse.Namespace:
+    """Разбор аргументов командной строки"""
+    arg_parser = argparse.ArgumentParser(description="Бот для мониторинга объявлений о продаже автомобилей")
+    arg_parser.add_argument(
+        '--mode', choices=['all', 'bot', 'monitor'], default='all',
+        help="all - бот и мониторинг, bot - только бот, monitor - только мониторинг"
+    )
+    arg_parser.add_argument(
+        '--sources', default='',
+        help="Источники для процесса мониторинга через запятую (по умолчанию все)"
+    )
+    return arg_parser.parse_args()
+
+
+def parse_sources(value: str) -> Optional[List[str]]:
+    """Список источников из аргумента --sources"""
+    sources = [source.strip().lower() for source in value.split(',') if source.strip()]
+    if not sources:
+        return None
+    unknown = [source for source in sources if ParserFactory.get_parser(source) is None]
+    if unknown:
+        raise SystemExit(f"Неизвестные источники: {', '.join(unknown)}")
+    return sources
+
+
+async def main(mode: str = 'all', sources: Optional[List[str]] = None):
     """Главная функция"""
     monitor = None
     try:
@@ -31,38 +70,49 @@ async def main():
         logger.info("Инициализация базы данных...")
         await init_db()
         logger.info("База данных инициализирована")
-        
-        # Создание и запуск сервиса мониторинга
-        logger.info("Запуск сервиса мониторинга...")
-        monitor = MonitorService()
-        monitor.start(interval_minutes=15)  # Проверка каждые 15 минут
-        
-        # Запускаем первую проверку через небольшую задержку
-        async def initial_check():
-            await asyncio.sleep(5)  # Даем боту время на запуск
-            await monitor.check_ads()
-        
-        asyncio.create_task(initial_check())
-        
-        # Запуск бота
-        logger.info("Запуск Telegram-бота...")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
-    
+
+        if mode in ('all', 'monitor'):
+            # Пул процессов для разбора страниц источников
+            configure_parse_pool(PARSE_WORKERS)
+
+            # Создание и запуск сервиса мониторинга
+            logger.info("Запуск сервиса мониторинга...")
+            monitor = MonitorService(sources)
+            await monitor.load_state()
+            monitor.start(interval_minutes=CHECK_INTERVAL_MINUTES)
+            await monitor.start_event_listener()
+
+            # Запускаем первую проверку через небольшую задержку
+            async def initial_check():
+                await asyncio.sleep(5)  # Даем боту время на запуск
+                await monitor.check_ads()
+
+            asyncio.create_task(initial_check())
+
+        if mode in ('all', 'bot'):
+            # Запуск бота
+            logger.info("Запуск Telegram-бота...")
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        else:
+            # Процесс мониторинга работает до остановки
+            await asyncio.Event().wait()
+
     except KeyboardInterrupt:
         logger.info("Остановка бота...")
-        if monitor:
-            monitor.stop()
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}", exc_info=True)
+    finally:
         if monitor:
             monitor.stop()
-    finally:
+            await monitor.close()
+        shutdown_parse_pool()
         await bot.session.close()
         await bot_instance.session.close()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.mode, parse_sources(args.sources)))
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
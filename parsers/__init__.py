@@ -7,5 +7,6 @@ from .kufar_parser import KufarParser
 from .onliner_parser import OnlinerParser
 from .abw_parser import AbwParser
 from .factory import ParserFactory
+from .listing import Listing
 
-__all__ = ['AvByParser', 'KufarParser', 'OnlinerParser', 'AbwParser', 'ParserFactory']
+__all__ = ['AvByParser', 'KufarParser', 'OnlinerParser', 'AbwParser', 'ParserFactory', 'Listing']
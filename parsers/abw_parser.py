@@ -6,14 +6,15 @@
 import asyncio
 import logging
 import re
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 
 # Сторонние библиотеки
 import cloudscraper
 from bs4 import BeautifulSoup
 
 # Локальные импорты
-from .base_parser import BaseParser
+from .base_parser import BaseParser, ParsedPage
+from .listing import Listing
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,7 @@ logger = logging.getLogger(__name__)
 class AbwParser(BaseParser):
     """Парсер объявлений с abw.by"""
     
+    SOURCE = 'abw.by'
     BASE_URL = "https://abw.by/cars"
     MAX_ADS = 50
     
@@ -37,7 +39,7 @@ class AbwParser(BaseParser):
         super().__init__()
         self.scraper = cloudscraper.create_scraper()
     
-    def _build_url(self, filters: Dict) -> str:
+    def _build_url(self, filters: Dict, page: int = 1) -> str:
         """Формирование URL с фильтрами"""
         url = self.BASE_URL
         params = []
@@ -59,18 +61,21 @@ class AbwParser(BaseParser):
             params.append(f"price_from={int(filters['price_from_usd'])}")
         if filters.get('price_to_usd'):
             params.append(f"price_to={int(filters['price_to_usd'])}")
+        if page > 1:
+            params.append(f"page={page}")
         
         if params:
             url += '?' + '&'.join(params)
         
         return url
     
-    async def search(self, filters: Dict) -> List[Dict]:
-        """Поиск объявлений на abw.by"""
-        results = []
+    async def fetch_page(self, filters: Dict, cursor: Optional[int] = None) -> ParsedPage:
+        """Загрузка страницы поиска abw.by (cursor - номер страницы)"""
+        page = cursor or 1
+        result = ParsedPage([], [])
         
         try:
-            url = self._build_url(filters)
+            url = self._build_url(filters, page)
             logger.info(f"abw.by: Используется URL: {url} (фильтры: brand={filters.get('brand')}, model={filters.get('model')}, price_to={filters.get('price_to_usd')})")
             
             await asyncio.sleep(0.5)
@@ -78,21 +83,16 @@ class AbwParser(BaseParser):
             response = await self._fetch_page(url)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'lxml')
-                logger.info(f"abw.by: Получен HTML, размер: {len(response.text)} символов")
-                
-                ads = self._extract_ad_elements(soup)
-                logger.info(f"abw.by: Найдено объявлений: {len(ads)}")
-                
-                results = self._parse_and_filter(ads, filters)
+                cars, _ = await self.parse_in_pool(response.content)
+                result = ParsedPage(self.filter_listings(cars, filters), [str(car.ad_id) for car in cars], page + 1)
             else:
                 logger.warning(f"abw.by: HTTP {response.status_code} для URL: {url}")
         
         except Exception as e:
             logger.error(f"Ошибка при парсинге abw.by: {e}", exc_info=True)
         
-        logger.info(f"abw.by: Завершено, найдено {len(results)} объявлений")
-        return results
+        logger.info(f"abw.by: Завершено, найдено {len(result.listings)} объявлений")
+        return result
     
     async def _fetch_page(self, url: str):
         """Выполнение HTTP запроса"""
@@ -109,6 +109,21 @@ class AbwParser(BaseParser):
             )
         )
     
+    def parse_page(self, content: Union[str, bytes]) -> List[Listing]:
+        """Разбор страницы abw.by в список объявлений"""
+        soup = BeautifulSoup(content, 'lxml')
+        logger.info(f"abw.by: Получен HTML, размер: {len(content)} символов")
+        
+        ads = self._extract_ad_elements(soup)
+        logger.info(f"abw.by: Найдено объявлений: {len(ads)}")
+        
+        cars = []
+        for ad in ads:
+            car_data = self._parse_ad(ad)
+            if car_data:
+                cars.append(car_data)
+        return cars
+    
     def _extract_ad_elements(self, soup: BeautifulSoup) -> List:
         """Извлечение элементов объявлений из HTML"""
         ads = []
@@ -147,31 +162,7 @@ class AbwParser(BaseParser):
         logger.info(f"abw.by: Найдено уникальных объявлений: {len(ads)}")
         return ads[:self.MAX_ADS]
     
-    def _parse_and_filter(self, ads: List, filters: Dict) -> List[Dict]:
-        """Парсинг и фильтрация объявлений"""
-        results = []
-        parsed_count = 0
-        filtered_count = 0
-        first_filtered = None
-        
-        for ad in ads:
-            car_data = self._parse_ad(ad)
-            if car_data:
-                parsed_count += 1
-                if self.matches_filters(car_data, filters):
-                    results.append(car_data)
-                else:
-                    filtered_count += 1
-                    if filtered_count == 1 and first_filtered is None:
-                        first_filtered = car_data
-        
-        if first_filtered:
-            logger.info(f"abw.by: Пример отфильтрованного: brand='{first_filtered.get('brand')}', model='{first_filtered.get('model')}', filter_brand='{filters.get('brand')}', filter_model='{filters.get('model')}', year={first_filtered.get('year')}, filter_year_from={filters.get('year_from')}, price_usd={first_filtered.get('price_usd')}, filter_price_to={filters.get('price_to_usd')}")
-        
-        logger.info(f"abw.by: Распарсено {parsed_count} из {len(ads)}, отфильтровано {filtered_count}, осталось {len(results)}")
-        return results
-    
-    def _parse_ad(self, ad_element) -> Optional[Dict]:
+    def _parse_ad(self, ad_element) -> Optional[Listing]:
         """Парсинг одного объявления"""
         try:
             # СНАЧАЛА извлекаем URL - это ключевой элемент для идентификации
@@ -262,24 +253,24 @@ class AbwParser(BaseParser):
                 if title_parts:
                     title = ' '.join(title_parts)
             
-            return {
-                'source': 'abw.by',
-                'ad_id': ad_id or str(hash(full_text[:50])),
-                'title': title or full_text[:100],
-                'brand': brand,
-                'model': model,
-                'price_usd': price_usd,
-                'price_byn': price_byn,
-                'year': year,
-                'mileage': mileage,
-                'engine_volume': engine_volume,
-                'city': city,
-                'url': url or 'https://abw.by/cars',
-                'image_url': image_url,
-                'transmission': transmission,
-                'engine_type': engine_type,
-                'body_type': body_type,
-            }
+            return Listing(
+                source='abw.by',
+                ad_id=ad_id or self.fallback_ad_id(full_text[:50]),
+                title=title or full_text[:100],
+                brand=brand,
+                model=model,
+                price_usd=price_usd,
+                price_byn=price_byn,
+                year=year,
+                mileage=mileage,
+                engine_volume=engine_volume,
+                city=city,
+                url=url or 'https://abw.by/cars',
+                image_url=image_url,
+                transmission=transmission,
+                engine_type=engine_type,
+                body_type=body_type,
+            )
         except Exception as e:
             logger.error(f"Ошибка при парсинге объявления abw.by: {e}", exc_info=True)
             return None
@@ -7,21 +7,26 @@ import asyncio
 import json
 import logging
 import re
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 
 # Сторонние библиотеки
 import cloudscraper
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 # Локальные импорты
-from .base_parser import BaseParser
+from .base_parser import BaseParser, ParsedPage
+from .listing import Listing
 
 logger = logging.getLogger(__name__)
 
+# Объявления лежат в JSON внутри <script>, остальная разметка не нужна
+SCRIPT_STRAINER = SoupStrainer('script')
+
 
 class AvByParser(BaseParser):
     """Парсер объявлений с av.by"""
     
+    SOURCE = 'av.by'
     BASE_URL = "https://cars.av.by/filter"
     BASE_URL_ALT = "https://cars.av.by/"
     MAX_RETRIES = 3
@@ -68,13 +73,12 @@ class AvByParser(BaseParser):
             'Upgrade-Insecure-Requests': '1',
         })
     
-    async def search(self, filters: Dict) -> List[Dict]:
-        """Поиск объявлений на av.by с retry логикой"""
-        results = []
-        
+    async def fetch_page(self, filters: Dict, cursor: Optional[int] = None) -> ParsedPage:
+        """Загрузка страницы поиска av.by с retry логикой (cursor - номер страницы)"""
+        page = cursor or 1
         for attempt in range(self.MAX_RETRIES):
             try:
-                url = self._build_url(filters)
+                url = self._build_url(filters, page)
                 if url != self.BASE_URL:
                     logger.info(f"av.by: URL с фильтрами: {url}")
                 
@@ -90,19 +94,18 @@ class AvByParser(BaseParser):
                 response = await self._fetch_page(url)
                 
                 if response.status_code == 200:
-                    adverts = self._extract_adverts_from_html(response.text)
+                    cars, _ = await self.parse_in_pool(response.content)
                     
-                    if not adverts and url == self.BASE_URL:
+                    if not cars and url == self.BASE_URL:
                         # Пробуем альтернативный URL
                         await asyncio.sleep(2)
                         alt_response = await self._fetch_page(self.BASE_URL_ALT)
                         if alt_response.status_code == 200:
-                            adverts = self._extract_adverts_from_html(alt_response.text)
+                            cars, _ = await self.parse_in_pool(alt_response.content)
                     
-                    if adverts:
-                        results = self._parse_and_filter(adverts, filters)
+                    if cars:
                         # Выходим только если нашли объявления
-                        break
+                        return ParsedPage(self.filter_listings(cars, filters), [str(car.ad_id) for car in cars], page + 1)
                     else:
                         # Если объявлений не найдено, пробуем еще раз
                         if attempt < self.MAX_RETRIES - 1:
@@ -138,9 +141,9 @@ class AvByParser(BaseParser):
                 else:
                     logger.error(f"Ошибка при парсинге av.by после {self.MAX_RETRIES} попыток: {e}", exc_info=True)
         
-        return results
+        return ParsedPage([], [])
     
-    def _build_url(self, filters: Dict) -> str:
+    def _build_url(self, filters: Dict, page: int = 1) -> str:
         """Формирование URL с фильтрами"""
         url = self.BASE_URL
         params = []
@@ -158,6 +161,8 @@ class AvByParser(BaseParser):
             params.append(f"price_from={int(filters['price_from_usd'])}")
         if filters.get('price_to_usd'):
             params.append(f"price_to={int(filters['price_to_usd'])}")
+        if page > 1:
+            params.append(f"page={page}")
         
         if params:
             url += '?' + '&'.join(params)
@@ -180,9 +185,18 @@ class AvByParser(BaseParser):
             )
         )
     
-    def _extract_adverts_from_html(self, html: str) -> List[Dict]:
+    def parse_page(self, content: Union[str, bytes]) -> List[Listing]:
+        """Разбор страницы av.by в список объявлений"""
+        cars = []
+        for ad in self._extract_adverts_from_html(content):
+            car_data = self._parse_ad(ad)
+            if car_data:
+                cars.append(car_data)
+        return cars
+    
+    def _extract_adverts_from_html(self, html: Union[str, bytes]) -> List[Dict]:
         """Извлечение объявлений из HTML"""
-        soup = BeautifulSoup(html, 'lxml')
+        soup = BeautifulSoup(html, 'lxml', parse_only=SCRIPT_STRAINER)
         logger.info(f"av.by: Получен HTML, размер: {len(html)} символов")
         
         # Ищем __NEXT_DATA__ script
@@ -244,31 +258,7 @@ class AvByParser(BaseParser):
             logger.error(f"Ошибка при извлечении объявлений av.by: {e}", exc_info=True)
             return []
     
-    def _parse_and_filter(self, adverts: List[Dict], filters: Dict) -> List[Dict]:
-        """Парсинг и фильтрация объявлений"""
-        results = []
-        parsed_count = 0
-        filtered_count = 0
-        first_filtered = None
-        
-        for ad in adverts:
-            car_data = self._parse_ad(ad)
-            if car_data:
-                parsed_count += 1
-                if self.matches_filters(car_data, filters):
-                    results.append(car_data)
-                else:
-                    filtered_count += 1
-                    if filtered_count == 1 and first_filtered is None:
-                        first_filtered = car_data
-        
-        if first_filtered:
-            logger.info(f"av.by: Пример отфильтрованного: brand='{first_filtered.get('brand')}', model='{first_filtered.get('model')}', filter_brand='{filters.get('brand')}', filter_model='{filters.get('model')}', year={first_filtered.get('year')}, filter_year_from={filters.get('year_from')}, price_usd={first_filtered.get('price_usd')}, filter_price_to={filters.get('price_to_usd')}")
-        
-        logger.info(f"av.by: Распарсено {parsed_count} из {len(adverts)}, отфильтровано {filtered_count}, осталось {len(results)}")
-        return results
-    
-    def _parse_ad(self, ad: Dict) -> Optional[Dict]:
+    def _parse_ad(self, ad: Dict) -> Optional[Listing]:
         """Парсинг одного объявления"""
         try:
             ad_id = str(ad.get('id', ''))
@@ -313,24 +303,28 @@ class AvByParser(BaseParser):
             # URL
             url = self._extract_url(ad, ad_id)
             
-            return {
-                'source': 'av.by',
-                'ad_id': ad_id,
-                'title': title or f"{brand} {model}".strip(),
-                'brand': brand,
-                'model': model,
-                'price_usd': price_usd,
-                'price_byn': price_byn,
-                'year': year,
-                'mileage': mileage,
-                'engine_volume': engine_volume,
-                'city': city,
-                'url': url,
-                'image_url': image_url,
-                'transmission': transmission,
-                'engine_type': engine_type,
-                'body_type': body_type,
-            }
+            # Время публикации
+            published_at = self.parse_timestamp(ad.get('publishedAt') or ad.get('refreshedAt'))
+            
+            return Listing(
+                source='av.by',
+                ad_id=ad_id,
+                title=title or f"{brand} {model}".strip(),
+                brand=brand,
+                model=model,
+                price_usd=price_usd,
+                price_byn=price_byn,
+                year=year,
+                mileage=mileage,
+                engine_volume=engine_volume,
+                city=city,
+                url=url,
+                image_url=image_url,
+                transmission=transmission,
+                engine_type=engine_type,
+                body_type=body_type,
+                published_at=published_at,
+            )
         except Exception as e:
             logger.error(f"Ошибка при парсинге объявления av.by: {e}", exc_info=True)
             return None
@@ -2,19 +2,54 @@
 Базовый класс для парсеров объявлений
 """
 # Стандартная библиотека
+import asyncio
+import hashlib
+import json
 import logging
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, List, Dict, NamedTuple, Optional, Tuple, Union
 
 # Сторонние библиотеки
 import cloudscraper
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Локальные импорты
+from .listing import Listing
 
 logger = logging.getLogger(__name__)
 
+# Курс для пересчета цен (1 USD = 2.9 BYN), общий для парсеров и текста уведомлений
+EXCHANGE_RATE = 2.9
+
+# Разметка schema.org на странице объявления
+JSON_LD_STRAINER = SoupStrainer('script', attrs={'type': 'application/ld+json'})
+# Ответы сервера, означающие, что объявление удалено
+REMOVED_STATUSES = (404, 410)
+# Значения availability (schema.org) у проданных и снятых объявлений
+UNAVAILABLE_MARKERS = ('OutOfStock', 'SoldOut', 'Discontinued')
+
+
+class ParsedPage(NamedTuple):
+    """Результат загрузки одной страницы поиска"""
+    listings: List[Listing]  # Объявления, прошедшие фильтры
+    ad_ids: List[str]  # ID всех объявлений страницы до фильтрации в порядке выдачи
+    next_cursor: Any = None  # Указатель на следующую страницу (None - страниц больше нет)
+
+
+class AdDetails(NamedTuple):
+    """Состояние объявления по его странице"""
+    removed: bool  # Объявление удалено или снято с продажи
+    price_usd: Optional[float] = None
+    price_byn: Optional[float] = None
+
 
 class BaseParser(ABC):
     """Базовый класс для всех парсеров"""
     
+    SOURCE = ''
+    EXCHANGE_RATE = EXCHANGE_RATE
+    
     def __init__(self):
         self.scraper = cloudscraper.create_scraper()
         self.headers = {
@@ -23,14 +58,164 @@ class BaseParser(ABC):
             'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
         }
     
+    # Пауза между страницами при постраничной загрузке (секунды)
+    PAGE_DELAY = 2
+    
     @abstractmethod
-    async def search(self, filters: Dict) -> List[Dict]:
+    async def fetch_page(self, filters: Dict, cursor: Any = None) -> ParsedPage:
+        """
+        Загрузка и разбор одной страницы поиска
+        
+        Args:
+            filters: Фильтры поиска
+            cursor: Указатель на страницу из предыдущего ParsedPage (None - первая страница)
+        """
+        pass
+    
+    async def stream(self, filters: Dict, max_pages: int = 1,
+                     page_ids: Optional[List[str]] = None) -> AsyncIterator[Listing]:
+        """
+        Потоковый поиск объявлений по фильтрам
+        Объявления выдаются сразу после разбора каждой страницы, поэтому
+        потребитель может начать обработку раньше и прекратить чтение досрочно
+        
+        Args:
+            filters: Фильтры поиска
+            max_pages: Сколько страниц истории загружать (следующая запрашивается, только если нужна)
+            page_ids: Список, в который добавляются ID всех объявлений загруженных страниц (до фильтрации)
+        """
+        cursor = None
+        for page_number in range(max_pages):
+            if page_number > 0:
+                await asyncio.sleep(self.PAGE_DELAY)
+            page = await self.fetch_page(filters, cursor)
+            if page_ids is not None:
+                page_ids.extend(page.ad_ids)
+            for car in page.listings:
+                yield car
+            if not page.ad_ids or page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+    
+    async def search(self, filters: Dict) -> List[Listing]:
         """
         Поиск объявлений по фильтрам
         Возвращает список словарей с данными объявлений
         """
+        return [car async for car in self.stream(filters)]
+    
+    async def fetch_ad(self, url: str) -> Optional[AdDetails]:
+        """
+        Загрузка страницы одного объявления
+        Запрос идет через сессию парсера, поэтому соединения с сайтом переиспользуются
+        
+        Returns:
+            Состояние объявления или None (состояние определить не удалось)
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(
+                None,
+                lambda: self.scraper.get(url, timeout=30, headers=self.headers)
+            )
+        except Exception as e:
+            logger.warning(f"{self.SOURCE}: Ошибка загрузки объявления {url}: {e}")
+            return None
+        
+        if response.status_code in REMOVED_STATUSES:
+            return AdDetails(removed=True)
+        if response.status_code != 200:
+            logger.warning(f"{self.SOURCE}: HTTP {response.status_code} при загрузке объявления {url}")
+            return None
+        # Разбор HTML - работа процессора, не блокируем event loop
+        return await asyncio.to_thread(self.parse_ad_page, response.content)
+    
+    def parse_ad_page(self, content: Union[str, bytes]) -> AdDetails:
+        """
+        Разбор страницы объявления: цена и наличие из разметки schema.org (JSON-LD)
+        Парсеры сайтов с другой разметкой переопределяют этот метод
+        """
+        soup = BeautifulSoup(content, 'lxml', parse_only=JSON_LD_STRAINER)
+        price_usd = price_byn = None
+        removed = False
+        found = False
+        for script in soup.find_all('script'):
+            try:
+                data = json.loads(script.string or '')
+            except ValueError:
+                continue
+            for item in data if isinstance(data, list) else [data]:
+                offers = item.get('offers') if isinstance(item, dict) else None
+                if isinstance(offers, list):
+                    offers = offers[0] if offers else None
+                if not isinstance(offers, dict):
+                    continue
+                found = True
+                price = self.parse_price(str(offers.get('price') or ''))
+                currency = str(offers.get('priceCurrency') or '').upper()
+                if currency == 'USD':
+                    price_usd = price
+                elif currency in ('BYN', 'BYR'):
+                    price_byn = price
+                availability = str(offers.get('availability') or '')
+                if any(marker in availability for marker in UNAVAILABLE_MARKERS):
+                    removed = True
+        
+        if not found:
+            # Страница загрузилась, но цены на ней нет - считаем объявление активным без данных о цене
+            return AdDetails(removed=False)
+        price_usd, price_byn = self.normalize_prices(price_usd, price_byn)
+        return AdDetails(removed, price_usd, price_byn)
+    
+    @abstractmethod
+    def parse_page(self, content: Union[str, bytes]) -> List[Listing]:
+        """
+        Разбор загруженной страницы (без фильтрации)
+        Выполняется в пуле процессов, поэтому не должен обращаться к сети
+        """
         pass
     
+    def parse_page_with_cursor(self, content: Union[str, bytes]) -> Tuple[List[Listing], Any]:
+        """
+        Разбор страницы вместе с указателем следующей страницы из самого ответа
+        (None - указатель определяет fetch_page). Выполняется в пуле процессов
+        """
+        return self.parse_page(content), None
+    
+    async def parse_in_pool(self, content: Union[str, bytes]) -> Tuple[List[Listing], Any]:
+        """Разбор страницы в пуле процессов, не блокируя event loop (объявления и указатель следующей страницы)"""
+        # Импорт внутри метода: модуль пула импортирует base_parser
+        from .pool import parse_page
+        return await parse_page(self.SOURCE, content)
+    
+    def filter_listings(self, cars: List[Listing], filters: Dict) -> List[Listing]:
+        """Фильтрация разобранных объявлений с логированием статистики"""
+        results = []
+        filtered_count = 0
+        first_filtered = None
+        
+        for car_data in cars:
+            if self.matches_filters(car_data, filters):
+                results.append(car_data)
+            else:
+                filtered_count += 1
+                if first_filtered is None:
+                    first_filtered = car_data
+        
+        if first_filtered:
+            logger.info(f"{self.SOURCE}: Пример отфильтрованного: brand='{first_filtered.get('brand')}', model='{first_filtered.get('model')}', filter_brand='{filters.get('brand')}', filter_model='{filters.get('model')}', year={first_filtered.get('year')}, filter_year_from={filters.get('year_from')}, price_usd={first_filtered.get('price_usd')}, filter_price_to={filters.get('price_to_usd')}")
+        
+        logger.info(f"{self.SOURCE}: Распарсено {len(cars)}, отфильтровано {filtered_count}, осталось {len(results)}")
+        return results
+    
+    def fallback_ad_id(self, text: str) -> str:
+        """
+        ID объявления из его текста (для карточек без ID)
+        Разбор идет в пуле процессов, а hash() строк в каждом процессе свой,
+        поэтому ID должен зависеть только от текста
+        """
+        return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+    
     def parse_price(self, price_str: str) -> Optional[float]:
         """Парсинг цены из строки"""
         if not price_str:
@@ -42,6 +227,29 @@ class BaseParser(ABC):
         except ValueError:
             return None
     
+    def parse_timestamp(self, value: Any) -> Optional[datetime]:
+        """
+        Парсинг времени публикации: ISO 8601 или Unix-время (секунды или миллисекунды)
+        
+        Returns:
+            Время в UTC без часового пояса (как datetime.utcnow) или None
+        """
+        if value is None or value == '':
+            return None
+        try:
+            if isinstance(value, (int, float)) or str(value).isdigit():
+                timestamp = float(value)
+                if timestamp > 1e11:
+                    # Миллисекунды
+                    timestamp /= 1000
+                return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+            parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except (ValueError, OverflowError, OSError):
+            return None
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    
     def parse_year(self, year_str: str) -> Optional[int]:
         """Парсинг года из строки"""
         if not year_str:
@@ -96,8 +304,8 @@ class BaseParser(ABC):
         Returns:
             Кортеж (price_usd, price_byn) после нормализации
         """
-        # Конвертация валют, если одна из цен отсутствует (курс: 1 USD = 2.9 BYN)
-        EXCHANGE_RATE = 2.9
+        # Конвертация валют, если одна из цен отсутствует
+        EXCHANGE_RATE = self.EXCHANGE_RATE
         if price_usd and not price_byn:
             if validate:
                 if price_usd < 1000000:  # Проверка на разумность (максимум 1 млн USD)
@@ -223,7 +431,7 @@ class BaseParser(ABC):
         
         return None
     
-    def matches_filters(self, car: Dict, filters: Dict) -> bool:
+    def matches_filters(self, car: Listing, filters: Dict) -> bool:
         """Проверка соответствия автомобиля фильтрам"""
         # Если фильтров нет, пропускаем все
         if not filters:
@@ -3,26 +3,125 @@
 Упрощенная версия без дублирования кода
 """
 import asyncio
+import json
 import logging
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import Any, List, Dict, Optional, Tuple, TypedDict, Union
 
 import httpx
 
-from .base_parser import BaseParser
+from .base_parser import BaseParser, ParsedPage
+from .listing import Listing
 
 logger = logging.getLogger(__name__)
 
+# Пробуем импортировать msgspec для типизированного декодирования, если не установлен - используем json
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+
+class KufarParameter(TypedDict, total=False):
+    """Параметр объявления из ad_parameters"""
+    p: Any  # Код параметра
+    pu: Any  # Альтернативный код параметра
+    pl: Any  # Подпись параметра
+    v: Any  # Значение
+    vl: Any  # Текстовое значение
+
+
+class KufarAd(TypedDict, total=False):
+    """Объявление kufar.by: только поля, которые читает парсер"""
+    ad_id: Any
+    list_time: Any
+    subject: Any
+    title: Any
+    ad_title: Any
+    ad_parameters: List[KufarParameter]
+    params: List[KufarParameter]
+    location: Any
+    city: Any
+    description: Any
+    ad_text: Any
+    ad_link: Any
+    link: Any
+    url: Any
+    ad_url: Any
+    images: Any
+    price: Any
+    price_byn: Any
+    priceBYN: Any
+    price_usd: Any
+    priceUSD: Any
+
+
+class KufarPaginationPage(TypedDict, total=False):
+    label: str
+    num: Any
+    token: Optional[str]
+
+
+class KufarPagination(TypedDict, total=False):
+    pages: List[KufarPaginationPage]
+
+
+class KufarResponse(TypedDict, total=False):
+    """Ответ rendered-paginated (остальные поля при декодировании пропускаются)"""
+    ads: List[KufarAd]
+    pagination: KufarPagination
+
+
+# Декодер строится один раз: неизвестные поля пропускаются без создания объектов
+RESPONSE_DECODER = msgspec.json.Decoder(KufarResponse) if MSGSPEC_AVAILABLE else None
+
+# Тип параметра -> коды/подстроки подписи (порядок задает приоритет)
+PARAM_MAPPING = {
+    'brand': ['brand', 'brn'],
+    'model': ['cars_level_1', 'crl', 'model'],
+    'year': ['regdate', 'rgd', 'year'],
+    'mileage': ['mileage', 'odometer', 'пробег'],
+    'engine_volume': ['engine_volume', 'объем', 'engine'],
+    'city': ['city', 'город', 'location'],
+    'transmission': ['transmission', 'коробка', 'gearbox'],
+    'engine_type': ['fuel_type', 'топливо', 'fuel'],
+    'body_type': ['body_type', 'кузов', 'body'],
+}
+
+# Прямой диспетчер код -> тип параметра (первое вхождение в PARAM_MAPPING выигрывает)
+PARAM_CODE_FIELDS: Dict[str, str] = {}
+for _param_type, _codes in PARAM_MAPPING.items():
+    for _code in _codes:
+        PARAM_CODE_FIELDS.setdefault(_code, _param_type)
+
+
+@lru_cache(maxsize=1024)
+def resolve_param_type(param_code: Optional[str], param_label: str) -> Optional[str]:
+    """
+    Определение типа параметра по коду и подписи
+
+    Подписи и коды повторяются во всех объявлениях, поэтому результат кешируется,
+    а полный перебор PARAM_MAPPING выполняется только для новой пары (код, подпись).
+    """
+    if not param_label:
+        return PARAM_CODE_FIELDS.get(param_code)
+    
+    for key, codes in PARAM_MAPPING.items():
+        if param_code in codes or any(code in param_label for code in codes):
+            return key
+    return None
+
 
 class KufarParser(BaseParser):
     """Парсер объявлений с kufar.by"""
     
+    SOURCE = 'kufar.by'
     BASE_URL = "https://api.kufar.by/search-api/v1/search/rendered-paginated"
-    EXCHANGE_RATE = 2.9
     
-    async def search(self, filters: Dict) -> List[Dict]:
-        """Поиск объявлений на kufar.by"""
-        results = []
-        
+    async def fetch_page(self, filters: Dict, cursor: Optional[str] = None) -> ParsedPage:
+        """Загрузка страницы поиска kufar.by (cursor - токен следующей страницы из ответа API)"""
+        result = ParsedPage([], [])
         try:
             params = {
                 'cat': 2010,  # Категория Автомобили
@@ -39,6 +138,8 @@ class KufarParser(BaseParser):
             
             if query_parts:
                 params['query'] = ' '.join(query_parts)
+            if cursor:
+                params['cursor'] = cursor
             
             headers = {
                 **self.headers,
@@ -57,41 +158,37 @@ class KufarParser(BaseParser):
                 )
                 
                 if response.status_code == 200:
-                    data = response.json()
-                    ads = data.get('ads', [])
-                    
-                    logger.info(f"kufar.by: Получено {len(ads)} объявлений из API")
-                    
-                    parsed_count = 0
-                    filtered_count = 0
-                    first_filtered = None
-                    
-                    for ad in ads:
-                        car_data = self._parse_ad(ad)
-                        if car_data:
-                            parsed_count += 1
-                            if not filters or self.matches_filters(car_data, filters):
-                                results.append(car_data)
-                            else:
-                                filtered_count += 1
-                                if filtered_count == 1 and first_filtered is None:
-                                    first_filtered = car_data
-                    
-                    if first_filtered:
-                        logger.info(f"kufar.by: Пример отфильтрованного: brand='{first_filtered.get('brand')}', model='{first_filtered.get('model')}', filter_brand='{filters.get('brand')}', filter_model='{filters.get('model')}', year={first_filtered.get('year')}, filter_year_from={filters.get('year_from')}, price_usd={first_filtered.get('price_usd')}, filter_price_to={filters.get('price_to_usd')}")
-                    
-                    logger.info(f"kufar.by: Распарсено {parsed_count} из {len(ads)}, отфильтровано {filtered_count}, осталось {len(results)}")
+                    cars, next_cursor = await self.parse_in_pool(response.content)
+                    result = ParsedPage(self.filter_listings(cars, filters), [str(car.ad_id) for car in cars], next_cursor)
                 elif response.status_code == 429:
-                    logger.warning(f"kufar.by: Rate limit (429), пропускаю этот запрос")
+                    logger.warning("kufar.by: Rate limit (429), пропускаю этот запрос")
                 else:
                     logger.warning(f"kufar.by: HTTP {response.status_code}: {response.text[:200]}")
         
         except Exception as e:
             logger.error(f"Ошибка при парсинге kufar.by: {e}", exc_info=True)
         
-        return results
+        return result
+    
+    def parse_page(self, content: Union[str, bytes]) -> List[Listing]:
+        """Разбор ответа API kufar.by в список объявлений"""
+        return self.parse_page_with_cursor(content)[0]
+    
+    def parse_page_with_cursor(self, content: Union[str, bytes]) -> Tuple[List[Listing], Optional[str]]:
+        """Разбор ответа API kufar.by: объявления и токен следующей страницы (ответ декодируется один раз)"""
+        data = self._decode_response(content)
+        ads = data.get('ads', [])
+        
+        logger.info(f"kufar.by: Получено {len(ads)} объявлений из API")
+        
+        cars = []
+        for ad in ads:
+            car_data = self._parse_ad(ad)
+            if car_data:
+                cars.append(car_data)
+        return cars, self._next_cursor(data)
     
-    def _parse_ad(self, ad: Dict) -> Optional[Dict]:
+    def _parse_ad(self, ad: Dict) -> Optional[Listing]:
         """Парсинг одного объявления"""
         try:
             ad_id = str(ad.get('ad_id', ''))
@@ -171,24 +268,28 @@ class KufarParser(BaseParser):
             elif not url.startswith('http'):
                 url = f"https://kufar.by{url}" if url.startswith('/') else f"https://kufar.by/{url}"
             
-            return {
-                'source': 'kufar.by',
-                'ad_id': ad_id,
-                'title': title,
-                'brand': brand,
-                'model': model,
-                'price_usd': price_usd,
-                'price_byn': price_byn,
-                'year': year,
-                'mileage': mileage,
-                'engine_volume': engine_volume,
-                'city': city,
-                'url': url,
-                'image_url': image_url,
-                'transmission': transmission,
-                'engine_type': engine_type,
-                'body_type': body_type,
-            }
+            # Время публикации (поднятия) объявления
+            published_at = self.parse_timestamp(ad.get('list_time'))
+            
+            return Listing(
+                source='kufar.by',
+                ad_id=ad_id,
+                title=title,
+                brand=brand,
+                model=model,
+                price_usd=price_usd,
+                price_byn=price_byn,
+                year=year,
+                mileage=mileage,
+                engine_volume=engine_volume,
+                city=city,
+                url=url,
+                image_url=image_url,
+                transmission=transmission,
+                engine_type=engine_type,
+                body_type=body_type,
+                published_at=published_at,
+            )
         except Exception as e:
             logger.error(f"Ошибка при парсинге объявления kufar.by: {e}", exc_info=True)
             return None
@@ -198,18 +299,6 @@ class KufarParser(BaseParser):
         params = {}
         params_list = ad.get('ad_parameters', []) or ad.get('params', [])
         
-        param_mapping = {
-            'brand': ['brand', 'brn'],
-            'model': ['cars_level_1', 'crl', 'model'],
-            'year': ['regdate', 'rgd', 'year'],
-            'mileage': ['mileage', 'odometer', 'пробег'],
-            'engine_volume': ['engine_volume', 'объем', 'engine'],
-            'city': ['city', 'город', 'location'],
-            'transmission': ['transmission', 'коробка', 'gearbox'],
-            'engine_type': ['fuel_type', 'топливо', 'fuel'],
-            'body_type': ['body_type', 'кузов', 'body'],
-        }
-        
         for p in params_list:
             if not isinstance(p, dict):
                 continue
@@ -217,13 +306,12 @@ class KufarParser(BaseParser):
             param_code = p.get('p') or p.get('pu')
             param_text = p.get('vl')
             param_value = p.get('v')
-            param_label = p.get('pl', '').lower()
+            param_label = str(p.get('pl') or '').lower()
             
-            param_type = None
-            for key, codes in param_mapping.items():
-                if param_code in codes or any(code in param_label for code in codes):
-                    param_type = key
-                    break
+            # Коды сравниваются только со строками, поэтому остальные значения равносильны None
+            if not isinstance(param_code, str):
+                param_code = None
+            param_type = resolve_param_type(param_code, param_label)
             
             if param_type:
                 if param_type == 'mileage' and param_value is not None:
@@ -235,6 +323,26 @@ class KufarParser(BaseParser):
         
         return params
     
+    def _decode_response(self, content: Union[str, bytes]) -> Dict:
+        """Декодирование ответа API с пропуском ненужных полей"""
+        if RESPONSE_DECODER is not None:
+            try:
+                return RESPONSE_DECODER.decode(content)
+            except msgspec.ValidationError as e:
+                # Схема ответа изменилась - декодируем без типизации
+                logger.warning(f"kufar.by: Ответ не соответствует схеме ({e}), декодирую без типизации")
+        return json.loads(content)
+    
+    def _next_cursor(self, data: Dict) -> Optional[str]:
+        """Токен следующей страницы из блока pagination декодированного ответа"""
+        pagination = data.get('pagination') or {}
+        if not isinstance(pagination, dict):
+            return None
+        for page in pagination.get('pages') or []:
+            if isinstance(page, dict) and page.get('label') == 'next' and page.get('token'):
+                return page['token']
+        return None
+    
     def _normalize_price_value(self, price_val: float) -> Optional[float]:
         """Нормализация значения цены (обработка копеек)"""
         if not price_val or price_val <= 0:
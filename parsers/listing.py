@@ -0,0 +1,109 @@
+"""
+Компактная запись объявления
+"""
+# Стандартная библиотека
+import sys
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Dict, Optional, Tuple
+
+# Поля объявления в фиксированном порядке (для компактной передачи между процессами)
+LISTING_FIELDS = (
+    'source', 'ad_id', 'title', 'brand', 'model', 'price_usd', 'price_byn',
+    'year', 'mileage', 'engine_volume', 'city', 'url', 'image_url',
+    'transmission', 'engine_type', 'body_type', 'published_at',
+)
+
+# Поля, которые сохраняются в модель FoundCar
+FOUND_CAR_FIELDS = tuple(field for field in LISTING_FIELDS if field not in ('brand', 'model', 'published_at'))
+
+_FIELD_SET = frozenset(LISTING_FIELDS)
+_ROW_GETTER = attrgetter(*LISTING_FIELDS)
+_FOUND_CAR_GETTER = attrgetter(*FOUND_CAR_FIELDS)
+
+
+def _intern(value: Any) -> Any:
+    """Интернирование короткой строки (источник, марка, город и т.п. повторяются в каждом объявлении)"""
+    if value is None:
+        return None
+    if type(value) is not str:
+        if not isinstance(value, str):
+            return value
+        # Строки BeautifulSoup (NavigableString) интернировать нельзя
+        value = str(value)
+    return sys.intern(value)
+
+
+class Listing:
+    """
+    Объявление с фиксированным набором полей
+
+    Хранится в слотах без словаря на каждый экземпляр, повторяющиеся строки
+    интернируются. Для совместимости поддерживает чтение как словарь: car.get('title'), car['url'].
+    """
+
+    __slots__ = LISTING_FIELDS
+
+    def __init__(self, source: str, ad_id: str, title: Optional[str] = None,
+                 brand: Optional[str] = None, model: Optional[str] = None,
+                 price_usd: Optional[float] = None, price_byn: Optional[float] = None,
+                 year: Optional[int] = None, mileage: Optional[int] = None,
+                 engine_volume: Optional[float] = None, city: Optional[str] = None,
+                 url: Optional[str] = None, image_url: Optional[str] = None,
+                 transmission: Optional[str] = None, engine_type: Optional[str] = None,
+                 body_type: Optional[str] = None, published_at: Optional[datetime] = None):
+        self.source = _intern(source)
+        self.ad_id = ad_id
+        self.title = title
+        self.brand = _intern(brand)
+        self.model = _intern(model)
+        self.price_usd = price_usd
+        self.price_byn = price_byn
+        self.year = year
+        self.mileage = mileage
+        self.engine_volume = engine_volume
+        self.city = _intern(city)
+        self.url = url
+        self.image_url = image_url
+        self.transmission = _intern(transmission)
+        self.engine_type = _intern(engine_type)
+        self.body_type = _intern(body_type)
+        # Время публикации на сайте (UTC, None - источник его не сообщает)
+        self.published_at = published_at
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> 'Listing':
+        """Создать объявление из кортежа в порядке LISTING_FIELDS"""
+        return cls(*row)
+
+    def as_row(self) -> Tuple:
+        """Кортеж значений в порядке LISTING_FIELDS"""
+        return _ROW_GETTER(self)
+
+    def db_fields(self) -> Dict[str, Any]:
+        """Поля для сохранения в FoundCar"""
+        return dict(zip(FOUND_CAR_FIELDS, _FOUND_CAR_GETTER(self)))
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Все поля объявления в виде словаря"""
+        return dict(zip(LISTING_FIELDS, self.as_row()))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in _FIELD_SET
+
+    def __reduce__(self):
+        # Передача между процессами кортежем, строки интернируются заново при распаковке
+        return (self.__class__.from_row, (self.as_row(),))
+
+    def __repr__(self) -> str:
+        return f"Listing(source={self.source!r}, ad_id={self.ad_id!r}, title={self.title!r})"
@@ -9,14 +9,15 @@ import asyncio
 import json
 import logging
 import re
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 
 # Сторонние библиотеки
 import cloudscraper
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 # Локальные импорты
-from .base_parser import BaseParser
+from .base_parser import BaseParser, ParsedPage
+from .listing import Listing
 
 logger = logging.getLogger(__name__)
 
@@ -34,10 +35,34 @@ except ImportError:
         "Установите: pip install playwright && playwright install chromium"
     )
 
+# Класс карточки объявления на странице списка
+OFFERS_UNIT_CLASS = 'vehicle-form__offers-unit'
+# Разбираем только карточки объявлений, остальная страница в дерево не попадает
+OFFERS_UNIT_STRAINER = SoupStrainer('a', class_=lambda x: x and OFFERS_UNIT_CLASS in str(x))
+# Сколько карточек нужно, чтобы не искать объявления fallback-методами
+MIN_OFFERS_UNITS = 5
+
+# Селекторы метода 2: (тег, ключевые слова в классе) в порядке приоритета
+FALLBACK_SELECTORS = [
+    ('div', ('vehicle', 'car', 'auto')),
+    ('article', ('item', 'listing')),
+    ('div', ('listing',)),
+    ('div', ('card',)),
+    ('li', ('item', 'car')),
+]
+
+DIGITS_RE = re.compile(r'\d+')
+AD_LINK_HREF_RE = re.compile(r'/car/|/vehicle/|/auto/|\d+')
+AD_PATH_ID_RE = re.compile(r'/\d+')
+AD_LONG_ID_RE = re.compile(r'\d{4,}')
+HOME_URL_RE = re.compile(r'^https?://(www\.)?onliner\.by/?$')
+CONTAINER_CLASS_RE = re.compile(r'list|grid|items|cards|vehicles', re.I)
+
 
 class OnlinerParser(BaseParser):
     """Парсер объявлений с ab.onliner.by (автобарахолка onliner)"""
     
+    SOURCE = 'ab.onliner.by'
     BASE_URL = "https://ab.onliner.by/"
     
     def __init__(self):
@@ -124,9 +149,9 @@ class OnlinerParser(BaseParser):
         except Exception as e:
             logger.error(f"ab.onliner.by: Ошибка при закрытии Playwright: {e}")
     
-    async def search(self, filters: Dict) -> List[Dict]:
-        """Поиск объявлений на ab.onliner.by с улучшенным HTML парсингом"""
-        results = []
+    async def fetch_page(self, filters: Dict, cursor: Optional[int] = None) -> ParsedPage:
+        """Загрузка страницы ab.onliner.by с улучшенным HTML парсингом (cursor - номер страницы)"""
+        page = cursor or 1
         max_retries = 2
         
         for attempt in range(max_retries):
@@ -158,6 +183,8 @@ class OnlinerParser(BaseParser):
                     params.append(f"price_from={int(filters['price_from_usd'])}")
                 if filters.get('price_to_usd'):
                     params.append(f"price_to={int(filters['price_to_usd'])}")
+                if page > 1:
+                    params.append(f"page={page}")
                 
                 # Если есть фильтры, добавляем их в URL
                 if params:
@@ -190,138 +217,17 @@ class OnlinerParser(BaseParser):
                         )
                     )
                     if response.status_code == 200:
-                        html_content = response.text
-                        logger.info(f"ab.onliner.by: Получен HTML через cloudscraper, размер: {len(html_content)} символов")
+                        html_content = response.content
+                        logger.info(f"ab.onliner.by: Получен HTML через cloudscraper, размер: {len(html_content)} байт")
                     else:
                         logger.error(f"ab.onliner.by: Ошибка HTTP {response.status_code}")
                         continue
                 
                 if html_content:
-                    soup = BeautifulSoup(html_content, 'lxml')
-                    
-                    # Парсим HTML напрямую (основной метод для onliner)
-                    # Ищем объявления в HTML - используем правильные селекторы на основе реальной структуры
-                    listings = []
-                    
-                    # Метод 1: Ищем элементы с классом vehicle-form__offers-unit (самый надежный способ)
-                    # Это основной контейнер для каждого объявления на странице списка
-                    offers_units = soup.find_all('a', class_=lambda x: x and 'vehicle-form__offers-unit' in str(x))
-                    logger.info(f"ab.onliner.by: Найдено элементов vehicle-form__offers-unit: {len(offers_units)}")
-                    
-                    # Все элементы с классом vehicle-form__offers-unit - это объявления
-                    listings = list(offers_units)
-                    
-                    logger.info(f"ab.onliner.by: Найдено объявлений: {len(listings)}")
-                    
-                    # Метод 2: Fallback - если метод 1 не нашел объявлений (используется редко)
-                    if not listings:
-                        selectors = [
-                            ('div', {'class': lambda x: x and ('vehicle' in str(x).lower() or 'car' in str(x).lower() or 'auto' in str(x).lower())}),
-                            ('article', {'class': lambda x: x and ('item' in str(x).lower() or 'listing' in str(x).lower())}),
-                            ('div', {'class': lambda x: x and 'listing' in str(x).lower()}),
-                            ('div', {'class': lambda x: x and 'card' in str(x).lower()}),
-                            ('li', {'class': lambda x: x and ('item' in str(x).lower() or 'car' in str(x).lower())}),
-                        ]
-                        
-                        for tag, attrs in selectors:
-                            found = soup.find_all(tag, attrs)
-                            if found:
-                                for item in found:
-                                    if item not in listings:
-                                        listings.append(item)
-                                logger.info(f"ab.onliner.by: Метод 2 нашел {len(found)} элементов через селектор {tag}")
-                                break
-                    
-                    logger.info(f"ab.onliner.by: Найдено элементов для парсинга (после метода 2): {len(listings)}")
-                    
-                    # Метод 3: Fallback через data-атрибуты (используется только если метод 1 не нашел объявлений)
-                    if len(listings) < 5:
-                        # Пробуем разные варианты data-атрибутов
-                        all_listings = soup.find_all('div', attrs={'data-id': re.compile(r'\d+')})
-                        if not all_listings:
-                            all_listings = soup.find_all('article', attrs={'data-id': re.compile(r'\d+')})
-                        if not all_listings:
-                            all_listings = soup.find_all('li', attrs={'data-id': re.compile(r'\d+')})
-                        if not all_listings:
-                            # Пробуем найти любые элементы с data-атрибутами, связанными с объявлениями
-                            all_listings = soup.find_all(attrs={'data-id': re.compile(r'\d+')})
-                            all_listings.extend(soup.find_all(attrs={'data-ad-id': re.compile(r'\d+')}))
-                            all_listings.extend(soup.find_all(attrs={'data-vehicle-id': re.compile(r'\d+')}))
-                        
-                        # Фильтруем элементы - проверяем, что они содержат ссылку на объявление
-                        # Если не нашли ссылки, все равно добавляем элементы с data-id (они могут содержать объявления)
-                        for item in all_listings:
-                            # Проверяем, что элемент содержит ссылку на объявление
-                            # Пробуем разные варианты поиска ссылки
-                            link = None
-                            # Вариант 1: прямая ссылка с href
-                            link = item.find('a', href=re.compile(r'/car/|/vehicle/|/auto/|\d+'))
-                            if not link:
-                                # Вариант 2: любая ссылка с href, содержащая цифры (ID)
-                                link = item.find('a', href=re.compile(r'\d+'))
-                            if not link:
-                                # Вариант 3: ссылка внутри дочерних элементов
-                                all_links = item.find_all('a', href=True)
-                                for l in all_links:
-                                    href = l.get('href', '')
-                                    if href and not re.match(r'^https?://(www\.)?onliner\.by/?$', href):
-                                        if re.search(r'/\d+', href) or re.search(r'\d{4,}', href):
-                                            link = l
-                                            break
-                            
-                            # Если нашли ссылку, добавляем элемент
-                            if link:
-                                href = link.get('href', '')
-                                # Пропускаем ссылки на главную страницу
-                                if href and not re.match(r'^https?://(www\.)?onliner\.by/?$', href):
-                                    # Проверяем наличие ID в URL или в самом href
-                                    if re.search(r'/\d+', href) or re.search(r'\d{4,}', href):
-                                        if item not in listings:
-                                            listings.append(item)
-                            # Если не нашли ссылку, но есть data-id, все равно добавляем (может быть объявление)
-                            elif ad_id := item.get('data-id', ''):
-                                # Проверяем, что data-id содержит цифры (ID объявления)
-                                if re.match(r'^\d+$', str(ad_id)):
-                                    if item not in listings:
-                                        listings.append(item)
-                        
-                        logger.info(f"ab.onliner.by: После фильтрации по ссылкам из data-id: {len(listings)} элементов")
-                    
-                    # Если все еще не нашли, пробуем найти через структуру страницы
-                    if not listings:
-                        # Ищем контейнеры с объявлениями
-                        containers = soup.find_all(['div', 'section', 'article'], class_=re.compile(r'list|grid|items|cards|vehicles', re.I))
-                        for container in containers:
-                            items = container.find_all(['div', 'article', 'li'], recursive=False)
-                            # Фильтруем элементы с ссылками на объявления
-                            for item in items:
-                                link = item.find('a', href=re.compile(r'/car/|/vehicle/|/auto/|\d+'))
-                                if link:
-                                    href = link.get('href', '')
-                                    if href and not re.match(r'^https?://(www\.)?onliner\.by/?$', href):
-                                        if re.search(r'/\d+', href):
-                                            if item not in listings:
-                                                listings.append(item)
-                            if listings:
-                                break
-                    
-                    # Парсим найденные объявления
-                    if listings:
-                        parsed_count = 0
-                        filtered_count = 0
-                        for listing in listings[:50]:  # Ограничиваем 50 объявлениями
-                            car_data = self._parse_html_ad(listing)
-                            if car_data:
-                                parsed_count += 1
-                                if self.matches_filters(car_data, filters):
-                                    results.append(car_data)
-                                else:
-                                    filtered_count += 1
-                        
-                        logger.info(f"ab.onliner.by: Распарсено {parsed_count} из {len(listings)}, отфильтровано {filtered_count}, осталось {len(results)}")
+                    cars, _ = await self.parse_in_pool(html_content)
                     
                     # Если успешно получили данные, выходим из цикла retry
-                    break
+                    return ParsedPage(self.filter_listings(cars, filters), [str(car.ad_id) for car in cars], page + 1)
                     
                 elif response.status_code == 429:
                     if attempt < max_retries - 1:
@@ -349,9 +255,190 @@ class OnlinerParser(BaseParser):
                 else:
                     logger.error(f"Ошибка при парсинге ab.onliner.by: {e}", exc_info=True)
         
-        return results
-    
-    def _parse_ad(self, ad: Dict) -> Dict:
+        return ParsedPage([], [])
+
+    def parse_page(self, content: Union[str, bytes]) -> List[Listing]:
+        """Разбор страницы ab.onliner.by в список объявлений"""
+        listings = self._extract_listing_elements(content)
+        
+        cars = []
+        for listing in listings[:50]:  # Ограничиваем 50 объявлениями
+            car_data = self._parse_html_ad(listing)
+            if car_data:
+                cars.append(car_data)
+        return cars
+
+    def _extract_listing_elements(self, html_content: Union[str, bytes]) -> List:
+        """
+        Поиск элементов объявлений в HTML
+
+        Если на странице достаточно карточек vehicle-form__offers-unit, разбирается только
+        их поддерево (через SoupStrainer). Иначе страница сразу разбирается целиком
+        для fallback-методов: число карточек оценивается по тексту страницы без разбора,
+        поэтому короткие и последние страницы тоже разбираются один раз.
+        """
+        # Класс встречается в тексте не реже, чем на странице есть карточек
+        marker = OFFERS_UNIT_CLASS.encode() if isinstance(html_content, bytes) else OFFERS_UNIT_CLASS
+        if html_content.count(marker) >= MIN_OFFERS_UNITS:
+            # Метод 1: Ищем элементы с классом vehicle-form__offers-unit (самый надежный способ)
+            # Это основной контейнер для каждого объявления на странице списка
+            offers_soup = BeautifulSoup(html_content, 'lxml', parse_only=OFFERS_UNIT_STRAINER)
+            offers_units = offers_soup.find_all('a')
+            logger.info(f"ab.onliner.by: Найдено элементов vehicle-form__offers-unit: {len(offers_units)}")
+
+            # Метод 3 включается, если объявлений меньше MIN_OFFERS_UNITS, поэтому полный разбор не нужен
+            if len(offers_units) >= MIN_OFFERS_UNITS:
+                logger.info(f"ab.onliner.by: Найдено объявлений: {len(offers_units)}")
+                return list(offers_units)
+            # Класс встретился и вне карточек (стили, скрипты) - нужен полный разбор
+
+        # Fallback: разбираем страницу целиком и собираем кандидатов для всех методов за один обход
+        soup = BeautifulSoup(html_content, 'lxml')
+        candidates = self._collect_fallback_candidates(soup)
+
+        # Все элементы с классом vehicle-form__offers-unit - это объявления
+        listings = list(candidates['offers_units'])
+        seen = {id(item) for item in listings}
+
+        def add_listing(item) -> None:
+            if id(item) not in seen:
+                seen.add(id(item))
+                listings.append(item)
+
+        logger.info(f"ab.onliner.by: Найдено объявлений: {len(listings)}")
+
+        # Метод 2: Fallback - если метод 1 не нашел объявлений (используется редко)
+        if not listings:
+            for selector_index, found in enumerate(candidates['selectors']):
+                if found:
+                    for item in found:
+                        add_listing(item)
+                    logger.info(f"ab.onliner.by: Метод 2 нашел {len(found)} элементов через селектор {FALLBACK_SELECTORS[selector_index][0]}")
+                    break
+
+        logger.info(f"ab.onliner.by: Найдено элементов для парсинга (после метода 2): {len(listings)}")
+
+        # Метод 3: Fallback через data-атрибуты (используется только если метод 1 не нашел объявлений)
+        if len(listings) < MIN_OFFERS_UNITS:
+            # Пробуем разные варианты data-атрибутов
+            all_listings = (candidates['data_id']['div'] or
+                            candidates['data_id']['article'] or
+                            candidates['data_id']['li'])
+            if not all_listings:
+                # Пробуем найти любые элементы с data-атрибутами, связанными с объявлениями
+                all_listings = (candidates['data_id_any'] +
+                                candidates['data_ad_id'] +
+                                candidates['data_vehicle_id'])
+
+            # Фильтруем элементы - проверяем, что они содержат ссылку на объявление
+            # Если не нашли ссылки, все равно добавляем элементы с data-id (они могут содержать объявления)
+            for item in all_listings:
+                link = self._find_ad_link(item)
+
+                # Если нашли ссылку, добавляем элемент
+                if link:
+                    href = link.get('href', '')
+                    # Пропускаем ссылки на главную страницу
+                    if href and not HOME_URL_RE.match(href):
+                        # Проверяем наличие ID в URL или в самом href
+                        if AD_PATH_ID_RE.search(href) or AD_LONG_ID_RE.search(href):
+                            add_listing(item)
+                # Если не нашли ссылку, но есть data-id, все равно добавляем (может быть объявление)
+                elif ad_id := item.get('data-id', ''):
+                    # Проверяем, что data-id содержит цифры (ID объявления)
+                    if re.match(r'^\d+$', str(ad_id)):
+                        add_listing(item)
+
+            logger.info(f"ab.onliner.by: После фильтрации по ссылкам из data-id: {len(listings)} элементов")
+
+        # Если все еще не нашли, пробуем найти через структуру страницы
+        if not listings:
+            # Ищем контейнеры с объявлениями
+            for container in candidates['containers']:
+                items = container.find_all(['div', 'article', 'li'], recursive=False)
+                # Фильтруем элементы с ссылками на объявления
+                for item in items:
+                    link = item.find('a', href=AD_LINK_HREF_RE)
+                    if link:
+                        href = link.get('href', '')
+                        if href and not HOME_URL_RE.match(href):
+                            if AD_PATH_ID_RE.search(href):
+                                add_listing(item)
+                if listings:
+                    break
+
+        return listings
+
+    def _collect_fallback_candidates(self, soup: BeautifulSoup) -> Dict:
+        """
+        Один обход дерева вместо отдельного find_all для каждой стратегии поиска
+
+        Кандидаты раскладываются по корзинам в порядке документа,
+        поэтому приоритет стратегий сохраняется.
+        """
+        candidates = {
+            'offers_units': [],
+            'selectors': [[] for _ in FALLBACK_SELECTORS],
+            'data_id': {'div': [], 'article': [], 'li': []},
+            'data_id_any': [],
+            'data_ad_id': [],
+            'data_vehicle_id': [],
+            'containers': [],
+        }
+
+        for tag in soup.find_all(True):
+            name = tag.name
+            attrs = tag.attrs
+
+            classes = attrs.get('class')
+            if classes:
+                class_str = ' '.join(classes) if isinstance(classes, list) else str(classes)
+                class_lower = class_str.lower()
+
+                if name == 'a' and 'vehicle-form__offers-unit' in class_str:
+                    candidates['offers_units'].append(tag)
+
+                for index, (selector_tag, keywords) in enumerate(FALLBACK_SELECTORS):
+                    if name == selector_tag and any(kw in class_lower for kw in keywords):
+                        candidates['selectors'][index].append(tag)
+
+                if name in ('div', 'section', 'article') and CONTAINER_CLASS_RE.search(class_str):
+                    candidates['containers'].append(tag)
+
+            data_id = attrs.get('data-id')
+            if data_id is not None and DIGITS_RE.search(str(data_id)):
+                candidates['data_id_any'].append(tag)
+                if name in candidates['data_id']:
+                    candidates['data_id'][name].append(tag)
+
+            data_ad_id = attrs.get('data-ad-id')
+            if data_ad_id is not None and DIGITS_RE.search(str(data_ad_id)):
+                candidates['data_ad_id'].append(tag)
+
+            data_vehicle_id = attrs.get('data-vehicle-id')
+            if data_vehicle_id is not None and DIGITS_RE.search(str(data_vehicle_id)):
+                candidates['data_vehicle_id'].append(tag)
+
+        return candidates
+
+    def _find_ad_link(self, item):
+        """Поиск ссылки на объявление внутри элемента"""
+        # Вариант 1: прямая ссылка с href
+        link = item.find('a', href=AD_LINK_HREF_RE)
+        if not link:
+            # Вариант 2: любая ссылка с href, содержащая цифры (ID)
+            link = item.find('a', href=DIGITS_RE)
+        if not link:
+            # Вариант 3: ссылка внутри дочерних элементов
+            for candidate in item.find_all('a', href=True):
+                href = candidate.get('href', '')
+                if href and not HOME_URL_RE.match(href):
+                    if AD_PATH_ID_RE.search(href) or AD_LONG_ID_RE.search(href):
+                        link = candidate
+                        break
+        return link
+
+    def _parse_ad(self, ad: Dict) -> Optional[Listing]:
         """Парсинг одного объявления"""
         try:
             ad_id = str(ad.get('id', ''))
@@ -516,29 +603,29 @@ class OnlinerParser(BaseParser):
             elif not url.startswith('http'):
                 url = f"https://ab.onliner.by{url}" if url.startswith('/') else f"https://ab.onliner.by/{url}"
             
-            return {
-                'source': 'ab.onliner.by',
-                'ad_id': ad_id,
-                'title': title,
-                'brand': brand,
-                'model': model,
-                'price_usd': price_usd,
-                'price_byn': price_byn,
-                'year': year,
-                'mileage': mileage,
-                'engine_volume': engine_volume,
-                'city': city,
-                'url': url,
-                'image_url': image_url,
-                'transmission': transmission,
-                'engine_type': engine_type,
-                'body_type': body_type,
-            }
+            return Listing(
+                source='ab.onliner.by',
+                ad_id=ad_id,
+                title=title,
+                brand=brand,
+                model=model,
+                price_usd=price_usd,
+                price_byn=price_byn,
+                year=year,
+                mileage=mileage,
+                engine_volume=engine_volume,
+                city=city,
+                url=url,
+                image_url=image_url,
+                transmission=transmission,
+                engine_type=engine_type,
+                body_type=body_type,
+            )
         except Exception as e:
             logger.error(f"Ошибка при парсинге объявления ab.onliner.by: {e}", exc_info=True)
             return None
     
-    def _parse_html_ad(self, element) -> Dict:
+    def _parse_html_ad(self, element) -> Optional[Listing]:
         """Парсинг объявления из HTML элемента (основной метод для onliner)"""
         try:
             # Если элемент - это ссылка с классом vehicle-form__offers-unit, извлекаем URL напрямую
@@ -869,7 +956,7 @@ class OnlinerParser(BaseParser):
             
             if not ad_id:
                 # Генерируем ID из заголовка если нет
-                ad_id = str(hash(title[:50])) if title else str(hash(str(element)[:100]))
+                ad_id = self.fallback_ad_id(title[:50] if title else str(element)[:100])
             
             # Улучшаем title: если он короткий или неполный, формируем из brand + model + год
             if title and len(title) < 10:
@@ -906,24 +993,24 @@ class OnlinerParser(BaseParser):
             if model and (len(model) < 2 or model.lower() in ['aerogrill', 'catalog', 'onliner'] or 'aerogrill' in model.lower() or 'catalog' in model.lower()):
                 return None
             
-            return {
-                'source': 'ab.onliner.by',
-                'ad_id': str(ad_id),
-                'title': title,
-                'brand': brand,
-                'model': model,
-                'price_usd': price_usd,
-                'price_byn': price_byn,
-                'year': year,
-                'mileage': mileage,
-                'engine_volume': engine_volume,
-                'city': city,
-                'url': url or f"https://ab.onliner.by/car/{ad_id}",
-                'image_url': image_url,
-                'transmission': transmission,
-                'engine_type': engine_type,
-                'body_type': body_type,
-            }
+            return Listing(
+                source='ab.onliner.by',
+                ad_id=str(ad_id),
+                title=title,
+                brand=brand,
+                model=model,
+                price_usd=price_usd,
+                price_byn=price_byn,
+                year=year,
+                mileage=mileage,
+                engine_volume=engine_volume,
+                city=city,
+                url=url or f"https://ab.onliner.by/car/{ad_id}",
+                image_url=image_url,
+                transmission=transmission,
+                engine_type=engine_type,
+                body_type=body_type,
+            )
         except Exception as e:
             logger.error(f"Ошибка при парсинге HTML объявления ab.onliner.by: {e}", exc_info=True)
             return None
@@ -0,0 +1,113 @@
+"""
+Пул процессов для CPU-тяжелого разбора страниц
+
+HTTP-запросы остаются асинхронными в основном процессе, а разбор HTML/JSON
+(сырые байты на входе, кортежи с полями объявлений на выходе) выполняется
+в отдельных процессах, чтобы не блокировать event loop бота.
+"""
+# Стандартная библиотека
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, List, Optional, Tuple, Union
+
+# Локальные импорты
+from .listing import Listing
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_workers = 0
+
+
+def _init_worker(log_level: int) -> None:
+    """Настройка логирования в процессе-обработчике"""
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+
+def parse_page_rows(source: str, content: Union[str, bytes]) -> Tuple[List[Tuple], Any]:
+    """Разбор страницы источника в процессе пула (компактные кортежи и указатель следующей страницы)"""
+    # Импорт внутри функции: фабрика импортирует парсеры, которые импортируют этот модуль
+    from .factory import ParserFactory
+
+    parser = ParserFactory.get_parser(source)
+    if parser is None:
+        return [], None
+    cars, next_cursor = parser.parse_page_with_cursor(content)
+    return [car.as_row() for car in cars], next_cursor
+
+
+def configure_parse_pool(workers: int) -> None:
+    """
+    Создать пул процессов для разбора страниц
+
+    Args:
+        workers: Количество процессов (0 - разбор в потоке основного процесса)
+    """
+    global _executor, _workers
+    shutdown_parse_pool()
+    _workers = workers
+    if workers <= 0:
+        logger.info("Разбор страниц выполняется в основном процессе")
+        return
+
+    _executor = _create_executor(workers)
+    logger.info(f"Пул разбора страниц запущен (процессов: {workers})")
+
+
+def _create_executor(workers: int) -> ProcessPoolExecutor:
+    """Пул процессов (процессы запускаются при первой задаче, event loop не блокируется)"""
+    # forkserver не наследует потоки и состояние event loop, на Windows доступен только spawn
+    start_methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in start_methods else 'spawn')
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(logging.getLogger().getEffectiveLevel(),)
+    )
+
+
+def _replace_broken_pool(broken: ProcessPoolExecutor) -> None:
+    """
+    Заменить поврежденный пул новым
+
+    Ошибку поврежденного пула получают все страницы, которые в нем разбирались,
+    но пул пересоздается один раз: если его уже заменили, ничего не делаем.
+    """
+    global _executor
+    if _executor is not broken:
+        return
+    logger.error("Пул разбора страниц поврежден, пересоздаю")
+    _executor = _create_executor(_workers)
+    # Процессы поврежденного пула уже завершены, ждать их не нужно
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_parse_pool() -> None:
+    """Остановить пул процессов"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def parse_page(source: str, content: Union[str, bytes]) -> Tuple[List[Listing], Any]:
+    """Разобрать страницу вне event loop и вернуть объявления и указатель следующей страницы"""
+    loop = asyncio.get_running_loop()
+    executor = _executor
+    try:
+        # Без пула разбираем в потоке, чтобы хотя бы не останавливать event loop целиком
+        rows, next_cursor = await loop.run_in_executor(executor, parse_page_rows, source, content)
+    except BrokenProcessPool:
+        # Процесс-обработчик упал: пересоздаем пул, текущую страницу разбираем в потоке
+        logger.warning(f"{source}: Страница не разобрана в пуле процессов, разбираю в потоке")
+        _replace_broken_pool(executor)
+        rows, next_cursor = await loop.run_in_executor(None, parse_page_rows, source, content)
+    # Строки интернируются заново уже в основном процессе
+    return [Listing.from_row(row) for row in rows], next_cursor
@@ -3,6 +3,9 @@
 """
 # Локальные импорты
 from .monitor import MonitorService
-from .notifications import send_notification, bot_instance
+from .notifications import (
+    send_notification, send_price_change, send_watch_removed, send_overflow_summary, send_digest, bot_instance
+)
 
-__all__ = ['MonitorService', 'send_notification', 'bot_instance']
+__all__ = ['MonitorService', 'send_notification', 'send_price_change', 'send_watch_removed', 'send_overflow_summary',
+           'send_digest', 'bot_instance']
@@ -0,0 +1,99 @@
+"""
+Поиск одного и того же автомобиля на разных сайтах
+
+Объявление описывается отпечатком из нормализованных марки, модели, года, корзин пробега
+и цены и города. Отпечаток разбивается на несколько ключей (полос) по подмножествам признаков,
+а числовые признаки округляются по двум сдвинутым сеткам - так близкие значения на границе
+корзины все равно дают общий ключ (locality-sensitive hashing). Объявления с общим ключом
+сравниваются точно, поэтому проверка одного объявления - это поиск по нескольким ключам в индексе.
+"""
+# Стандартная библиотека
+import hashlib
+import re
+from typing import Iterable, List, Optional
+
+# Локальные импорты
+from config import (
+    DUPLICATE_MILEAGE_BUCKET_KM, DUPLICATE_PRICE_BUCKET_USD,
+    DUPLICATE_MILEAGE_TOLERANCE, DUPLICATE_PRICE_TOLERANCE
+)
+from database import FoundCar
+from parsers.listing import Listing
+
+_NON_ALNUM = re.compile(r'[^0-9a-zа-яё]+')
+
+
+def normalize(value: Optional[str]) -> str:
+    """Нормализация строки: регистр, пробелы и знаки препинания ("Mercedes-Benz" == "mercedes benz")"""
+    if not value:
+        return ''
+    return _NON_ALNUM.sub('', str(value).lower())
+
+
+def _buckets(value: Optional[float], size: int) -> List[str]:
+    """Номера корзины значения на основной и сдвинутой на половину корзины сетках"""
+    if value is None or value <= 0:
+        return ['', '']
+    return [f"{int(value // size)}", f"{int((value + size / 2) // size)}s"]
+
+
+def fingerprint_keys(car: Listing) -> List[str]:
+    """
+    Ключи отпечатка объявления для индекса дубликатов
+
+    Returns:
+        Список коротких хешей (пустой, если марки или года недостаточно для сравнения)
+    """
+    brand = normalize(car.brand)
+    model = normalize(car.model)
+    if not brand or not car.year:
+        return []
+    base = f"{brand}|{model}|{car.year}"
+    city = normalize(car.city)
+    mileage_buckets = _buckets(car.mileage, DUPLICATE_MILEAGE_BUCKET_KM)
+    price_buckets = _buckets(car.price_usd, DUPLICATE_PRICE_BUCKET_USD)
+
+    bands = set()
+    for grid in (0, 1):
+        mileage = mileage_buckets[grid]
+        price = price_buckets[grid]
+        # Полосы: каждая допускает расхождение в одном из признаков
+        if mileage:
+            bands.add(f"m|{base}|{mileage}|{city}")
+        if price:
+            bands.add(f"p|{base}|{price}|{city}")
+        if mileage and price:
+            bands.add(f"mp|{base}|{mileage}|{price}")
+    return sorted(hashlib.blake2b(band.encode('utf-8'), digest_size=8).hexdigest() for band in bands)
+
+
+def _close(a: Optional[float], b: Optional[float], tolerance: float, minimum: float) -> Optional[bool]:
+    """Близки ли значения (None - сравнить нельзя)"""
+    if not a or not b:
+        return None
+    return abs(a - b) <= max(minimum, tolerance * max(a, b))
+
+
+def is_probable_duplicate(car: Listing, found_car: FoundCar) -> bool:
+    """Точная проверка кандидата из индекса: тот же год и близкие пробег и цена"""
+    if car.year != found_car.year:
+        return False
+    city, found_city = normalize(car.city), normalize(found_car.city)
+    if city and found_city and city != found_city:
+        return False
+    mileage = _close(car.mileage, found_car.mileage, DUPLICATE_MILEAGE_TOLERANCE, 1000)
+    price = _close(car.price_usd, found_car.price_usd, DUPLICATE_PRICE_TOLERANCE, 100)
+    if mileage is False or price is False:
+        return False
+    # Нужен хотя бы один совпавший числовой признак
+    return bool(mileage or price)
+
+
+def find_original(car: Listing, candidates: Iterable[FoundCar]) -> Optional[FoundCar]:
+    """Уже отправленное пользователю объявление о том же автомобиле"""
+    for found_car in candidates:
+        if found_car.source == car.source and found_car.ad_id == str(car.ad_id):
+            continue
+        if is_probable_duplicate(car, found_car):
+            return found_car
+    return None
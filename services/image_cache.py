@@ -0,0 +1,207 @@
+"""
+Локальный кэш фото объявлений для отправки в Telegram
+
+Фото источников бывают по несколько мегабайт, а часть CDN не отдает их серверам Telegram.
+Каждое фото загружается один раз, уменьшается и пережимается в JPEG подходящего для
+Telegram размера и хранится на диске под хешем содержимого (одинаковые фото с разных
+ссылок хранятся одним файлом). Общий размер кэша ограничен: при переполнении удаляются
+давно не использованные файлы. В Telegram отправляются уже подготовленные байты.
+"""
+# Стандартная библиотека
+import asyncio
+import hashlib
+import io
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+# Сторонние библиотеки
+import httpx
+
+# Пробуем импортировать Pillow, если не установлен - фото отправляются по ссылке
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_image(data: bytes, max_side: int, quality: int) -> bytes:
+    """Уменьшить фото до max_side по большей стороне и сохранить в JPEG"""
+    with Image.open(io.BytesIO(data)) as image:
+        # Для JPEG декодер сразу уменьшает изображение, если оно намного больше нужного
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+class ImageCache:
+    """Подготовленные фото на диске с вытеснением давно не использованных"""
+
+    def __init__(self, directory: str, max_bytes: int, max_side: int, quality: int,
+                 max_source_bytes: int, timeout: float, url_cache_size: int):
+        """
+        Args:
+            directory: Каталог кэша
+            max_bytes: Наибольший общий размер файлов кэша
+            max_side: Наибольшая сторона подготовленного фото (пикселей)
+            quality: Качество JPEG
+            max_source_bytes: Фото больше этого размера не загружаются
+            timeout: Таймаут загрузки фото (с)
+            url_cache_size: Сколько ссылок помнить в памяти
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        self.quality = quality
+        self.max_source_bytes = max_source_bytes
+        self.timeout = timeout
+        self.url_cache_size = url_cache_size
+        # Ссылка -> хеш подготовленного фото (None - фото не удалось загрузить или разобрать)
+        self._urls: 'OrderedDict[str, Optional[str]]' = OrderedDict()
+        # Хеш -> размер файла в порядке использования
+        self._files: 'OrderedDict[str, int]' = OrderedDict()
+        self._total_bytes = 0
+        # Загрузки, которые выполняются сейчас: одно фото не загружается дважды
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loaded = False
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
+            )
+        return self._client
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / f"{digest}.jpg"
+
+    def _load(self) -> None:
+        """Учесть файлы, оставшиеся с прошлого запуска (от давно использованных к недавним)"""
+        self._loaded = True
+        if not self.directory.exists():
+            return
+        files = []
+        for path in self.directory.glob('*/*.jpg'):
+            stat = path.stat()
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, digest, size in sorted(files):
+            self._files[digest] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._files:
+            digest, size = self._files.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._path(digest).unlink()
+            except OSError:
+                pass
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        path = self._path(digest)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        # Время изменения - время последнего использования (для вытеснения после перезапуска)
+        os.utime(path)
+        return data
+
+    def _write(self, data: bytes) -> str:
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if digest not in self._files:
+            path = self._path(digest)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix('.tmp')
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        return digest
+
+    async def get(self, url: Optional[str]) -> Optional[bytes]:
+        """Подготовленное фото по ссылке (None - фото недоступно или Pillow не установлен)"""
+        if not url or not PIL_AVAILABLE:
+            return None
+        if not self._loaded:
+            await asyncio.to_thread(self._load)
+        if url in self._urls:
+            self._urls.move_to_end(url)
+            digest = self._urls[url]
+            if digest is None:
+                return None
+            if digest in self._files:
+                data = await asyncio.to_thread(self._read, digest)
+                if data is not None:
+                    self._files.move_to_end(digest)
+                    return data
+            # Файл вытеснен - загружаем заново
+            del self._urls[url]
+
+        task = self._pending.get(url)
+        if task is None:
+            task = self._pending[url] = asyncio.create_task(self._fetch(url))
+            task.add_done_callback(lambda _: self._pending.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url: str) -> Optional[bytes]:
+        try:
+            async with self._get_client().stream('GET', url) as response:
+                if response.status_code != 200:
+                    logger.debug(f"Фото не загружено ({response.status_code}): {url}")
+                    self._remember(url, None)
+                    return None
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_source_bytes:
+                        logger.debug(f"Фото больше {self.max_source_bytes} байт, не загружаем: {url}")
+                        self._remember(url, None)
+                        return None
+                    chunks.append(chunk)
+        except Exception as e:
+            # Сетевые ошибки не кэшируются - фото попробуем загрузить в следующий раз
+            logger.debug(f"Не удалось загрузить фото {url}: {e}")
+            return None
+
+        source = b''.join(chunks)
+        try:
+            # Декодирование и сжатие - работа процессора, не блокируем event loop
+            data = await asyncio.to_thread(prepare_image, source, self.max_side, self.quality)
+            digest = await asyncio.to_thread(self._write, data)
+        except Exception as e:
+            logger.debug(f"Не удалось подготовить фото {url}: {e}")
+            self._remember(url, None)
+            return None
+
+        logger.debug(f"Фото {url} подготовлено: {len(source)} -> {len(data)} байт")
+        if digest not in self._files:
+            self._files[digest] = len(data)
+            self._total_bytes += len(data)
+        self._files.move_to_end(digest)
+        self._remember(url, digest)
+        self._evict()
+        return data
+
+    def _remember(self, url: str, digest: Optional[str]) -> None:
+        self._urls[url] = digest
+        if len(self._urls) > self.url_cache_size:
+            self._urls.popitem(last=False)
+
+    async def aclose(self) -> None:
+        """Закрыть HTTP-клиент"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
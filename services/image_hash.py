@@ -0,0 +1,215 @@
+"""
+Перцептивные хеши фото объявлений для поиска перевыложенных объявлений
+
+Дилеры перевыкладывают тот же автомобиль под новым ID, но с теми же фото.
+Для миниатюры объявления считается dHash (64 бита), а похожие хеши ищутся
+в многоблочном индексе: хеш делится на (порог + 1) блоков, и по принципу Дирихле
+у хешей на расстоянии Хэмминга не больше порога совпадает хотя бы один блок целиком.
+Поэтому поиск - это несколько обращений к словарю и ограниченное число точных сравнений.
+"""
+# Стандартная библиотека
+import asyncio
+import io
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Hashable, List, Optional, Tuple
+
+# Сторонние библиотеки
+import httpx
+
+# Пробуем импортировать Pillow, если не установлен - проверка фото отключается
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Локальные импорты
+from config import IMAGE_HASH_TIMEOUT, IMAGE_HASH_MAX_BYTES
+
+if TYPE_CHECKING:
+    from .image_cache import ImageCache
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+_SIGN_BIT = 1 << (HASH_BITS - 1)
+
+
+def dhash(data: bytes) -> int:
+    """Разностный хеш изображения: знак перепада яркости соседних пикселей уменьшенной копии 9x8"""
+    with Image.open(io.BytesIO(data)) as image:
+        # Для JPEG декодер сразу уменьшает изображение - это в разы быстрее полного декодирования
+        image.draft('L', (64, 64))
+        pixels = list(image.convert('L').resize((9, 8), Image.Resampling.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def to_db(value: Optional[int]) -> Optional[int]:
+    """Хеш в знаковое 64-битное число (так он помещается в BigInteger)"""
+    if value is None:
+        return None
+    return value - (1 << HASH_BITS) if value & _SIGN_BIT else value
+
+
+def from_db(value: Optional[int]) -> Optional[int]:
+    """Хеш из знакового 64-битного числа"""
+    if value is None:
+        return None
+    return value & ((1 << HASH_BITS) - 1)
+
+
+class ImageHashIndex:
+    """
+    Многоблочный индекс хешей фото недавно отправленных объявлений (по пользователям)
+
+    Размер индекса ограничен: при переполнении забываются самые старые записи.
+    Ключ записи - ID объявления в базе или (пока объявление сохраняется) объект объявления.
+    """
+
+    def __init__(self, max_distance: int, max_size: int, max_candidates: int):
+        """
+        Args:
+            max_distance: Наибольшее расстояние Хэмминга, при котором фото считаются одинаковыми
+            max_size: Сколько записей хранить
+            max_candidates: Сколько кандидатов проверять при одном поиске (ограничение стоимости)
+        """
+        self.max_distance = max_distance
+        self.max_size = max_size
+        self.max_candidates = max_candidates
+        # Границы блоков: хеш делится на max_distance + 1 частей почти равной длины
+        blocks = max_distance + 1
+        bounds = [HASH_BITS * index // blocks for index in range(blocks + 1)]
+        self._blocks: List[Tuple[int, int]] = [
+            (start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])
+        ]
+        # Ключ записи -> (ID пользователя, хеш)
+        self._entries: 'OrderedDict[Hashable, Tuple[int, int]]' = OrderedDict()
+        # (ID пользователя, номер блока, значение блока) -> ключи записей (dict как упорядоченное множество)
+        self._buckets: Dict[Tuple[int, int, int], Dict[Hashable, None]] = {}
+
+    def _keys(self, user_id: int, value: int) -> List[Tuple[int, int, int]]:
+        return [(user_id, index, (value >> start) & mask) for index, (start, mask) in enumerate(self._blocks)]
+
+    def add(self, user_id: int, value: int, entry_key: Hashable) -> None:
+        """Добавить хеш фото объявления"""
+        if entry_key in self._entries:
+            return
+        self._entries[entry_key] = (user_id, value)
+        for key in self._keys(user_id, value):
+            self._buckets.setdefault(key, {})[entry_key] = None
+        if len(self._entries) > self.max_size:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, entry_key: Hashable) -> None:
+        """Удалить запись (если она есть)"""
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        for key in self._keys(*entry):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.pop(entry_key, None)
+                if not bucket:
+                    del self._buckets[key]
+
+    def rekey(self, old_key: Hashable, new_key: Hashable) -> None:
+        """Заменить ключ записи (после сохранения объявления в базу)"""
+        entry = self._entries.get(old_key)
+        if entry is not None:
+            self.remove(old_key)
+            self.add(entry[0], entry[1], new_key)
+
+    def find(self, user_id: int, value: int) -> Optional[Hashable]:
+        """Ключ записи пользователя с почти таким же фото (None - не найдено)"""
+        checked = set()
+        for key in self._keys(user_id, value):
+            bucket = self._buckets.get(key)
+            if not bucket:
+                continue
+            # Сначала самые свежие записи
+            for entry_key in reversed(bucket):
+                if entry_key in checked:
+                    continue
+                if len(checked) >= self.max_candidates:
+                    return None
+                checked.add(entry_key)
+                if bin(self._entries[entry_key][1] ^ value).count('1') <= self.max_distance:
+                    return entry_key
+        return None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ImageHasher:
+    """Загрузка миниатюр и расчет хешей с кэшем по URL"""
+
+    def __init__(self, cache_size: int, image_cache: Optional['ImageCache'] = None):
+        """
+        Args:
+            cache_size: Сколько хешей помнить
+            image_cache: Локальный кэш фото (фото загружается один раз для хеша и для отправки)
+        """
+        self.cache_size = cache_size
+        self.image_cache = image_cache
+        # URL фото -> хеш (None - фото не удалось загрузить или разобрать)
+        self._cache: 'OrderedDict[str, Optional[int]]' = OrderedDict()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=IMAGE_HASH_TIMEOUT,
+                follow_redirects=True,
+                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
+            )
+        return self._client
+
+    async def hash_url(self, url: Optional[str]) -> Optional[int]:
+        """Хеш фото по URL (одно и то же фото загружается один раз)"""
+        if not url or not PIL_AVAILABLE:
+            return None
+        if url in self._cache:
+            self._cache.move_to_end(url)
+            return self._cache[url]
+
+        if self.image_cache is not None:
+            data = await self.image_cache.get(url)
+            if data is None:
+                return None
+            value = await asyncio.to_thread(dhash, data)
+            self._remember(url, value)
+            return value
+
+        value = None
+        try:
+            response = await self._get_client().get(url)
+            if response.status_code == 200 and len(response.content) <= IMAGE_HASH_MAX_BYTES:
+                # Декодирование изображения - работа процессора, не блокируем event loop
+                value = await asyncio.to_thread(dhash, response.content)
+            else:
+                logger.debug(f"Фото не загружено ({response.status_code}, {len(response.content)} байт): {url}")
+        except Exception as e:
+            # Сетевые ошибки не кэшируются - фото попробуем загрузить в следующий раз
+            logger.debug(f"Не удалось получить хеш фото {url}: {e}")
+            return None
+
+        self._remember(url, value)
+        return value
+
+    def _remember(self, url: str, value: Optional[int]) -> None:
+        self._cache[url] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def aclose(self) -> None:
+        """Закрыть HTTP-клиент"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
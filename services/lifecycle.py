@@ -0,0 +1,39 @@
+"""
+Поиск снятых с продажи объявлений по изменению выдачи источника
+
+Выдача источника упорядочена от новых объявлений к старым и ограничена окном
+(загруженные страницы поиска до фильтрации). Объявление, пропавшее из окна,
+могло быть вытеснено новыми, поэтому снятым оно считается, только если по числу
+новых объявлений выше него оно должно было остаться в окне. Страницы объявлений
+при этом не загружаются.
+"""
+# Стандартная библиотека
+from typing import List, Sequence
+
+
+def disappeared(previous: Sequence[str], current: Sequence[str]) -> List[str]:
+    """
+    Объявления предыдущей выдачи, которые должны были остаться в окне, но пропали
+
+    Args:
+        previous: ID объявлений предыдущей проверки в порядке выдачи
+        current: ID объявлений текущей проверки в порядке выдачи
+    """
+    if not previous:
+        return []
+    previous_set = frozenset(previous)
+    current_set = frozenset(current)
+    # Выше старого объявления могли появиться все новые объявления
+    shift = len(current_set - previous_set)
+    # Хвост окна не сравнивается: в этот раз могло быть загружено меньше страниц,
+    # поэтому надежны только позиции внутри текущей выдачи
+    window = len(current)
+
+    removed = []
+    for position, ad_id in enumerate(previous):
+        if ad_id in current_set:
+            continue
+        # Пропавшие выше объявления сдвигают это объявление вверх
+        if position + shift - len(removed) < window:
+            removed.append(ad_id)
+    return removed
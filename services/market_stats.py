@@ -0,0 +1,191 @@
+"""
+Статистика рыночных цен по марке, модели и году
+
+Для каждой группы (марка, модель, корзина годов) цены новых объявлений добавляются
+в потоковый квантильный скетч KLL: он хранит O(k log n) значений вместо всех цен,
+а перцентиль и медиана считаются по кэшированной сводке. Число групп ограничено,
+давно не обновлявшиеся группы вытесняются.
+"""
+# Стандартная библиотека
+import json
+import math
+import random
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# Локальные импорты
+from config import MARKET_YEAR_BUCKET, MARKET_MIN_SAMPLES
+from database import MarketStat
+from parsers.listing import Listing
+from .duplicates import normalize
+
+# Во сколько раз уменьшается емкость уровня при переходе к более низкому уровню
+_CAPACITY_RATIO = 2 / 3
+
+
+class KLLSketch:
+    """
+    Потоковый квантильный скетч KLL (Karnin, Lang, Liberty)
+
+    Значения накапливаются на нулевом уровне; переполненный уровень сортируется
+    и передает на следующий уровень каждое второе значение (вес значения удваивается).
+    """
+
+    __slots__ = ('k', 'count', '_levels', '_size', '_max_size', '_summary')
+
+    def __init__(self, k: int = 200, levels: Optional[List[List[float]]] = None, count: int = 0):
+        self.k = k
+        self.count = count
+        self._levels: List[List[float]] = levels or [[]]
+        self._size = sum(len(level) for level in self._levels)
+        self._max_size = self._total_capacity()
+        # Отсортированные значения и накопленные веса (сбрасывается при добавлении)
+        self._summary: Optional[Tuple[List[float], List[int]]] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return int(math.ceil(self.k * _CAPACITY_RATIO ** depth)) + 1
+
+    def _total_capacity(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self._levels)))
+
+    def update(self, value: float) -> None:
+        """Добавить значение"""
+        self._levels[0].append(value)
+        self._size += 1
+        self.count += 1
+        self._summary = None
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        for level in range(len(self._levels)):
+            items = self._levels[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+                self._max_size = self._total_capacity()
+            items.sort()
+            # Нечетное значение остается на уровне
+            keep = [items.pop()] if len(items) % 2 else []
+            self._levels[level + 1].extend(items[random.getrandbits(1)::2])
+            self._levels[level] = keep
+            self._size = sum(len(level_items) for level_items in self._levels)
+            if self._size < self._max_size:
+                break
+
+    def _get_summary(self) -> Tuple[List[float], List[int]]:
+        if self._summary is None:
+            weighted = sorted(
+                (value, 1 << level) for level, items in enumerate(self._levels) for value in items
+            )
+            values, cumulative, total = [], [], 0
+            for value, weight in weighted:
+                total += weight
+                values.append(value)
+                cumulative.append(total)
+            self._summary = (values, cumulative)
+        return self._summary
+
+    def rank(self, value: float) -> float:
+        """Доля значений меньше указанного (0..1)"""
+        values, cumulative = self._get_summary()
+        if not values:
+            return 0.0
+        index = bisect_left(values, value)
+        return (cumulative[index - 1] if index else 0) / cumulative[-1]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Значение квантиля q (0..1)"""
+        values, cumulative = self._get_summary()
+        if not values:
+            return None
+        index = bisect_left(cumulative, q * cumulative[-1])
+        return values[min(index, len(values) - 1)]
+
+    def to_json(self) -> str:
+        return json.dumps({'k': self.k, 'levels': self._levels}, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, data: str, count: int) -> 'KLLSketch':
+        state = json.loads(data)
+        return cls(state['k'], state['levels'], count)
+
+
+class MarketEstimate(NamedTuple):
+    """Положение цены объявления среди похожих"""
+    percentile: float  # Доля похожих объявлений дешевле этого (%)
+    median: float  # Медиана цены похожих объявлений (USD)
+    count: int  # Сколько цен учтено
+
+    @property
+    def below_median(self) -> bool:
+        return self.percentile < 50
+
+
+class MarketStats:
+    """Скетчи цен по группам похожих автомобилей"""
+
+    def __init__(self, max_groups: int, k: int = 200):
+        self.max_groups = max_groups
+        self.k = k
+        self._sketches: 'OrderedDict[str, KLLSketch]' = OrderedDict()
+        self._dirty: Set[str] = set()
+
+    @staticmethod
+    def group_key(car: Listing) -> Optional[str]:
+        """Группа похожих автомобилей: марка, модель и корзина годов"""
+        brand = normalize(car.brand)
+        if not brand or not car.year:
+            return None
+        year_bucket = car.year // MARKET_YEAR_BUCKET * MARKET_YEAR_BUCKET
+        return f"{brand}|{normalize(car.model)}|{year_bucket}"
+
+    def add(self, car: Listing) -> None:
+        """Учесть цену объявления"""
+        key = self.group_key(car)
+        if key is None or not car.price_usd:
+            return
+        sketch = self._sketches.get(key)
+        if sketch is None:
+            sketch = self._sketches[key] = KLLSketch(self.k)
+            if len(self._sketches) > self.max_groups:
+                old_key, _ = self._sketches.popitem(last=False)
+                self._dirty.discard(old_key)
+        else:
+            self._sketches.move_to_end(key)
+        sketch.update(float(car.price_usd))
+        self._dirty.add(key)
+
+    def estimate(self, car: Listing) -> Optional[MarketEstimate]:
+        """Перцентиль цены объявления среди похожих (None - цены нет или похожих мало)"""
+        if not car.price_usd:
+            return None
+        key = self.group_key(car)
+        sketch = self._sketches.get(key) if key is not None else None
+        if sketch is None or sketch.count < MARKET_MIN_SAMPLES:
+            return None
+        return MarketEstimate(sketch.rank(float(car.price_usd)) * 100, sketch.quantile(0.5), sketch.count)
+
+    def load(self, stats: Iterable[MarketStat]) -> None:
+        """Загрузить сохраненные скетчи (в порядке обновления, лишние вытесняются как в add)"""
+        for stat in stats:
+            self._sketches[stat.key] = KLLSketch.from_json(stat.data, stat.count)
+            self._sketches.move_to_end(stat.key)
+            while len(self._sketches) > self.max_groups:
+                old_key, _ = self._sketches.popitem(last=False)
+                self._dirty.discard(old_key)
+
+    def pop_dirty(self) -> List[Dict]:
+        """Изменившиеся скетчи для записи в базу"""
+        rows = [
+            {'key': key, 'count': self._sketches[key].count, 'data': self._sketches[key].to_json()}
+            for key in self._dirty if key in self._sketches
+        ]
+        self._dirty = set()
+        return rows
+
+    def __len__(self) -> int:
+        return len(self._sketches)
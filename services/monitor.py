@@ -4,17 +4,41 @@
 # Стандартная библиотека
 import asyncio
 import logging
-from typing import Dict, List
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
 
 # Сторонние библиотеки
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
 # Локальные импорты
-from database import UserFilter
+from config import (
+    SOURCE_CONCURRENCY, MONITOR_EVENT_POLL_SECONDS, MONITOR_EVENT_TTL_HOURS, CYCLE_BUDGET_SECONDS,
+    RECENT_LISTINGS_PER_SOURCE, BACKFILL_MAX_PAGES, BACKFILL_INTERVAL_MINUTES, BACKFILL_JOBS_PER_RUN,
+    BACKFILL_FILTER_MAX_AGE_DAYS, DUPLICATE_WINDOW_DAYS, IMAGE_HASH_ENABLED, IMAGE_HASH_MAX_DISTANCE,
+    IMAGE_HASH_INDEX_SIZE, IMAGE_HASH_MAX_CANDIDATES, IMAGE_HASH_CACHE_SIZE, NOTIFY_DELAY_SECONDS,
+    PRICE_NOTIFY_INCREASES, SNAPSHOT_RETENTION_DAYS, MARKET_MAX_GROUPS, MARKET_SKETCH_K,
+    WATCHLIST_INTERVAL_MINUTES, WATCHLIST_POLL_MINUTES, WATCHLIST_BATCH_SIZE, WATCHLIST_REQUEST_DELAY,
+    MAX_ACTIVE_FILTERS_PER_USER, MAX_NOTIFICATIONS_PER_HOUR, TELEGRAM_FILE_RETENTION_DAYS,
+    OUTBOX_RETRY_MINUTES, OUTBOX_RETENTION_DAYS, NOTIFY_EDIT_DELAY_SECONDS, NOTIFY_EDIT_MAX_LINES
+)
+from database import UserFilter, MonitorEvent
 from db_manager import DBManager
+from parsers.base_parser import AdDetails
 from parsers.factory import ParserFactory
-from .notifications import send_notification
+from parsers.listing import Listing
+from utils.source_stats import source_state, SOURCE_PRUNED, SOURCE_PROBE
+from .image_hash import ImageHasher, ImageHashIndex, PIL_AVAILABLE, from_db
+from .lifecycle import disappeared
+from .market_stats import MarketStats
+from .notifications import (
+    send_price_change, send_watch_removed, edit_notification, format_price_change, image_cache
+)
+from .outbox import OutboxWorker
+from .pipeline import CheckPipeline, FilterJob, filter_to_dict
+from .price_tracker import PriceChange, PriceTracker, find_price_change
+from .quotas import NotificationQuota, limit_active_filters
+from .recent_listings import RecentListings
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +46,50 @@ logger = logging.getLogger(__name__)
 class MonitorService:
     """Сервис для мониторинга объявлений"""
     
-    def __init__(self):
+    def __init__(self, sources: Optional[List[str]] = None):
+        """
+        Args:
+            sources: Источники, которые проверяет этот процесс (None - все)
+        """
         self.scheduler = AsyncIOScheduler()
         self.db_manager = DBManager()
-        self.parsers = ParserFactory.get_all_parsers()
+        self.parsers = {
+            source: parser for source, parser in ParserFactory.get_all_parsers().items()
+            if not sources or source in sources
+        }
+        # Ограничение одновременных запросов к каждому источнику (общее для всех циклов)
+        self.source_locks: Dict[str, asyncio.Semaphore] = {
+            source: asyncio.Semaphore(SOURCE_CONCURRENCY) for source in self.parsers
+        }
+        # Проверки с сайтов не должны идти одновременно
+        self._check_lock = asyncio.Lock()
+        # Объявления, проверенные и еще не сохраненные, общие для всех конвейеров (защита от дубликатов)
+        self._claimed: Set[Tuple[int, str, str]] = set()
+        # Время последней проверки каждой пары (фильтр, источник) - для упорядочивания по давности
+        self._last_checked: Dict[Tuple[int, str], datetime] = {}
+        # Последние объявления источников для мгновенной проверки новых фильтров
+        self.recent = RecentListings(RECENT_LISTINGS_PER_SOURCE)
+        # Хеши фото отправленных объявлений для поиска перевыложенных объявлений
+        self.image_index: Optional[ImageHashIndex] = None
+        self.image_hasher: Optional[ImageHasher] = None
+        if IMAGE_HASH_ENABLED:
+            if PIL_AVAILABLE:
+                self.image_index = ImageHashIndex(IMAGE_HASH_MAX_DISTANCE, IMAGE_HASH_INDEX_SIZE, IMAGE_HASH_MAX_CANDIDATES)
+                self.image_hasher = ImageHasher(IMAGE_HASH_CACHE_SIZE, image_cache)
+            else:
+                logger.warning("Pillow не установлен, поиск перевыложенных объявлений по фото отключен")
+        # Состояния объявлений для отслеживания изменений цены и снятия с продажи
+        self.price_tracker = PriceTracker()
+        # Статистика рыночных цен для оценки цены в уведомлениях
+        self.market_stats = MarketStats(MARKET_MAX_GROUPS, MARKET_SKETCH_K)
+        # Часовой лимит уведомлений о новых объявлениях (общий для всех конвейеров)
+        self.quota = NotificationQuota(MAX_NOTIFICATIONS_PER_HOUR)
+        # Повторная отправка уведомлений из очереди (записи своих источников)
+        self.outbox = OutboxWorker(self.db_manager, list(self.parsers))
+        # ID объявлений в выдаче каждой пары (фильтр, источник) при последней проверке
+        self._visible: Dict[Tuple[int, str], List[str]] = {}
+        self._event_cursor = 0
+        self._event_task: Optional[asyncio.Task] = None
     
     async def check_ads(self) -> None:
         """Проверка объявлений по всем активным фильтрам"""
@@ -40,10 +104,27 @@ class MonitorService:
                 return
             
             logger.info(f"Найдено {len(filters)} активных фильтров")
+            # Фильтры сверх лимита пользователя не проверяются
+            allowed = limit_active_filters(filters, MAX_ACTIVE_FILTERS_PER_USER)
+            if len(allowed) < len(filters):
+                logger.warning(f"Пропущено фильтров сверх лимита пользователя ({MAX_ACTIVE_FILTERS_PER_USER}): {len(filters) - len(allowed)}")
+                filters = allowed
             
-            # Проверяем каждый фильтр последовательно (для избежания rate limiting)
-            for user_filter in filters:
-                await self.check_filter(user_filter)
+            await self.run_pipeline(filters, budget=CYCLE_BUDGET_SECONDS)
+            
+            # Удаляем обработанные события
+            await self.db_manager.delete_monitor_events_before(
+                datetime.utcnow() - timedelta(hours=MONITOR_EVENT_TTL_HOURS)
+            )
+            # Забываем давно не встречавшиеся объявления
+            snapshots_before = datetime.utcnow() - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+            self.price_tracker.forget_before(snapshots_before)
+            await self.db_manager.delete_ad_snapshots_before(snapshots_before)
+            await self.db_manager.delete_telegram_files_before(
+                datetime.utcnow() - timedelta(days=TELEGRAM_FILE_RETENTION_DAYS)
+            )
+            await self.db_manager.delete_outbox_before(datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS))
+            self.quota.forget_idle()
                 
         except Exception as e:
             logger.error(f"Ошибка при проверке объявлений: {e}", exc_info=True)
@@ -51,117 +132,415 @@ class MonitorService:
     async def check_filter(self, user_filter: UserFilter) -> None:
         """Проверка объявлений по одному фильтру"""
         try:
-            # Преобразуем фильтр в словарь для парсеров
-            filter_dict = {
-                'brand': user_filter.brand,
-                'model': user_filter.model,
-                'year_from': user_filter.year_from,
-                'year_to': user_filter.year_to,
-                'price_from_usd': user_filter.price_from_usd,
-                'price_to_usd': user_filter.price_to_usd,
-                'transmission': user_filter.transmission,
-                'engine_type': user_filter.engine_type,
-                'body_type': user_filter.body_type,
-            }
-            
-            # Удаляем None значения
-            filter_dict = {k: v for k, v in filter_dict.items() if v is not None}
-            
-            # Проверяем каждый источник
-            for source_name, parser in self.parsers.items():
-                try:
-                    logger.info(f"Проверяю {source_name} для фильтра #{user_filter.id}...")
-                    if filter_dict:
-                        logger.debug(f"  Фильтры: {filter_dict}")
-                    cars = await parser.search(filter_dict)
-                    logger.info(f"  Найдено объявлений на {source_name}: {len(cars)}")
-                    
-                    if len(cars) > 0:
-                        logger.debug(f"  Пример первого объявления: {cars[0].get('title', 'N/A')[:50]}...")
-                    
-                    valid_count = 0
-                    new_cars_count = 0
-                    filtered_count = 0
-                    exists_count = 0
-                    # Определяем количество проверяемых объявлений
-                    # Если фильтр создан недавно (менее 7 дней назад), проверяем больше объявлений
-                    # чтобы не пропустить объявления, которые были выложены до создания фильтра
-                    from datetime import datetime, timedelta
-                    filter_age = datetime.utcnow() - user_filter.created_at.replace(tzinfo=None) if user_filter.created_at else timedelta(days=7)
-                    if filter_age < timedelta(days=7):
-                        # Новый фильтр - проверяем больше объявлений (до 200)
-                        # Это нужно, чтобы охватить объявления, выложенные несколько дней назад
-                        cars_to_check = cars[:200]
-                        logger.info(f"  Фильтр #{user_filter.id} создан недавно ({filter_age.days} дней назад), проверяю до 200 объявлений")
-                    else:
-                        # Старый фильтр - проверяем только новые (первые 50)
-                        cars_to_check = cars[:50]
-                    
-                    for car in cars_to_check:
-                        # Проверяем, что данные объявления валидны
-                        title = car.get('title', '').strip()
-                        url = car.get('url', '').strip()
-                        
-                        # Пропускаем объявления без заголовка или с неправильным URL
-                        if not title or len(title) < 3:
-                            continue
-                        if not url or url == 'https://abw.by/cars' or 'filter' in url.lower():
-                            continue
-                        
-                        # Дополнительная проверка фильтров (на случай если парсер не применил их)
-                        # Особенно важно для цены - проверяем еще раз перед сохранением
-                        if not parser.matches_filters(car, filter_dict):
-                            filtered_count += 1
-                            if filtered_count == 1:
-                                logger.debug(f"  [FILTER #{user_filter.id}] Отфильтровано объявление: {title[:50]}... (brand={car.get('brand')}, model={car.get('model')}, year={car.get('year')}, price_usd={car.get('price_usd')})")
-                            continue
-                        
-                        valid_count += 1
-                        
-                        # Проверяем, не было ли уже это объявление для данного пользователя
-                        # (чтобы не отправлять дубликаты, если объявление подходит нескольким фильтрам пользователя)
-                        exists = await self.db_manager.check_car_exists_for_user(
-                            car['source'],
-                            car['ad_id'],
-                            user_filter.user_id
-                        )
-                        
-                        if exists:
-                            exists_count += 1
-                        
-                        if not exists:
-                            # Удаляем поля, которых нет в модели FoundCar
-                            car_data = {k: v for k, v in car.items() 
-                                       if k in ['source', 'ad_id', 'title', 'price_usd', 'price_byn', 
-                                               'year', 'mileage', 'engine_volume', 'city', 'url', 
-                                               'image_url', 'transmission', 'engine_type', 'body_type']}
-                            
-                            # Сохраняем новое объявление
-                            found_car = await self.db_manager.add_found_car(
-                                filter_id=user_filter.id,
-                                **car_data
-                            )
-                            
-                            # Отправляем уведомление
-                            await send_notification(user_filter.user_id, car)
-                            
-                            # Отмечаем как уведомленное
-                            await self.db_manager.mark_car_as_notified(found_car.id)
-                            
-                            new_cars_count += 1
-                            logger.info(f"  [NEW] Найдено новое объявление: {title[:50]}")
-                            
-                            # Небольшая задержка между уведомлениями
-                            await asyncio.sleep(10)
-                    
-                    logger.info(f"  Валидных объявлений на {source_name}: {valid_count} из {len(cars)}, отфильтровано: {filtered_count}, уже в БД: {exists_count}, новых: {new_cars_count}")
-                
-                except Exception as e:
-                    logger.error(f"Ошибка при проверке {source_name}: {e}", exc_info=True)
+            await self.run_pipeline([user_filter])
+        except Exception as e:
+            logger.error(f"Ошибка при проверке фильтра #{user_filter.id}: {e}", exc_info=True)
+    
+    async def run_backfill(self) -> None:
+        """
+        Догрузка истории источников для новых фильтров (низкий приоритет)
+        
+        Каждая пара (фильтр, источник) догружается один раз на глубину BACKFILL_MAX_PAGES страниц.
+        Догрузка не начинается и прерывается между заданиями, пока идет обычный цикл проверки.
+        """
+        if self._check_lock.locked():
+            return
+        try:
+            pending = await self.db_manager.get_pending_backfills(
+                list(self.parsers),
+                datetime.utcnow() - timedelta(days=BACKFILL_FILTER_MAX_AGE_DAYS)
+            )
+            for user_filter, source in pending[:BACKFILL_JOBS_PER_RUN]:
+                if self._check_lock.locked():
+                    logger.info("Догрузка истории приостановлена: идет цикл проверки")
+                    return
+                logger.info(f"Догрузка истории {source} для фильтра #{user_filter.id} ({BACKFILL_MAX_PAGES} стр.)")
+                job = FilterJob(
+                    user_filter, filter_to_dict(user_filter), source, self.parsers[source],
+                    limit=None, max_pages=BACKFILL_MAX_PAGES
+                )
+                pipeline = self._create_pipeline()
+                await pipeline.run_jobs([job])
+                await self._process_price_changes(pipeline)
+                if pipeline.failed_jobs:
+                    # Запись о догрузке не создается - задание повторится при следующем запуске
                     continue
+                await self.db_manager.complete_backfill(
+                    user_filter.id, source, pipeline.counters['received'], pipeline.counters['new']
+                )
+        except Exception as e:
+            logger.error(f"Ошибка при догрузке истории: {e}", exc_info=True)
+    
+    async def check_filter_recent(self, user_filter: UserFilter) -> None:
+        """Мгновенная проверка фильтра по буферу последних объявлений (без запросов к сайтам)"""
+        try:
+            await self.run_pipeline([user_filter], from_recent=True)
+        except Exception as e:
+            logger.error(f"Ошибка при проверке фильтра #{user_filter.id} по буферу: {e}", exc_info=True)
+    
+    async def run_pipeline(self, filters: List[UserFilter], budget: Optional[float] = None,
+                           from_recent: bool = False) -> CheckPipeline:
+        """
+        Прогнать фильтры через конвейер проверки
+        
+        Args:
+            filters: Фильтры для проверки
+            budget: Бюджет времени в секундах (None - без ограничения)
+            from_recent: Проверять по буферу последних объявлений вместо запросов к сайтам
+        """
+        pipeline = self._create_pipeline(from_recent)
+        if from_recent:
+            # Проверка по буферу не ждет текущего цикла: она не обращается к сайтам
+            await pipeline.run(filters)
+            return pipeline
+        
+        if self._check_lock.locked():
+            logger.info("Предыдущая проверка еще выполняется, жду ее завершения")
+        async with self._check_lock:
+            skip, probe = await self._pruned_sources(filters)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            deadline = started + budget if budget else None
+            await pipeline.run(filters, deadline=deadline, last_checked=self._last_checked,
+                               skip=skip, deprioritized=probe)
+            elapsed = loop.time() - started
+        
+        checked_at = datetime.utcnow()
+        # Задания с ошибкой остаются давно не проверенными и идут первыми в следующем цикле
+        for job in pipeline.completed:
+            self._last_checked[job.key] = checked_at
+        await self._record_source_stats(pipeline)
+        removed = self._detect_removed(pipeline)
+        await self._process_price_changes(pipeline)
+        await self._mark_removed_notifications(removed)
+        if budget:
+            # Забываем удаленные и отключенные фильтры
+            active_ids = {user_filter.id for user_filter in filters}
+            for key in [key for key in self._last_checked if key[0] not in active_ids]:
+                del self._last_checked[key]
+            for key in [key for key in self._visible if key[0] not in active_ids]:
+                del self._visible[key]
         
+        if pipeline.deferred:
+            logger.warning(f"Бюджет цикла ({budget:.0f} с) исчерпан: перенесено на следующий цикл заданий: {len(pipeline.deferred)} из {len(pipeline.deferred) + len(pipeline.completed) + len(pipeline.failed_jobs)}")
+        if budget and elapsed > budget:
+            logger.warning(f"Цикл проверки превысил бюджет: {elapsed:.0f} с при бюджете {budget:.0f} с")
+        else:
+            logger.info(f"Цикл проверки занял {elapsed:.0f} с")
+        return pipeline
+    
+    def _create_pipeline(self, from_recent: bool = False) -> CheckPipeline:
+        """Конвейер с общими для всех циклов буфером, набором объявлений в работе, индексом фото и лимитами"""
+        return CheckPipeline(self.db_manager, self.parsers, self.source_locks,
+                             self.recent, from_recent, self._claimed,
+                             self.image_index, self.image_hasher, self.price_tracker, self.market_stats,
+                             self.quota)
+    
+    async def load_state(self) -> None:
+        """Загрузить состояние, сохраненное до перезапуска"""
+        await self.load_snapshots()
+        await self.load_market_stats()
+        await self.load_image_index()
+        await self.outbox.load()
+    
+    async def load_snapshots(self) -> None:
+        """Загрузить состояния объявлений своих источников"""
+        try:
+            snapshots = await self.db_manager.get_ad_snapshots(
+                list(self.parsers), datetime.utcnow() - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+            )
+            self.price_tracker.load(snapshots)
+            logger.info(f"Загружено состояний объявлений: {len(self.price_tracker)}")
         except Exception as e:
-            logger.error(f"Ошибка при проверке фильтра #{user_filter.id}: {e}", exc_info=True)
+            logger.error(f"Ошибка при загрузке состояний объявлений: {e}", exc_info=True)
+    
+    async def load_market_stats(self) -> None:
+        """Загрузить скетчи рыночных цен"""
+        try:
+            self.market_stats.load(await self.db_manager.get_market_stats())
+            logger.info(f"Загружено групп рыночных цен: {len(self.market_stats)}")
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке рыночных цен: {e}", exc_info=True)
+    
+    async def load_image_index(self) -> None:
+        """Загрузить в индекс хеши фото объявлений, отправленных до перезапуска"""
+        if self.image_index is None:
+            return
+        try:
+            rows = await self.db_manager.get_recent_image_hashes(
+                datetime.utcnow() - timedelta(days=DUPLICATE_WINDOW_DAYS), IMAGE_HASH_INDEX_SIZE
+            )
+            for user_id, found_car_id, image_hash in rows:
+                self.image_index.add(user_id, from_db(image_hash), found_car_id)
+            logger.info(f"Загружено хешей фото: {len(self.image_index)}")
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке хешей фото: {e}", exc_info=True)
+    
+    async def _pruned_sources(self, filters: List[UserFilter]) -> Tuple[Set[Tuple[int, str]], Set[Tuple[int, str]]]:
+        """
+        Пары (фильтр, источник), которые давно не дают совпадений
+        
+        Returns:
+            (пропускаемые в этом цикле, проверяемые повторно в конце цикла)
+        """
+        skip: Set[Tuple[int, str]] = set()
+        probe: Set[Tuple[int, str]] = set()
+        try:
+            stats_list = await self.db_manager.get_source_stats([user_filter.id for user_filter in filters])
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке статистики источников: {e}", exc_info=True)
+            return skip, probe
+        now = datetime.utcnow()
+        for stats in stats_list:
+            if stats.source not in self.parsers:
+                continue
+            state = source_state(stats, now)
+            if state == SOURCE_PRUNED:
+                skip.add((stats.filter_id, stats.source))
+            elif state == SOURCE_PROBE:
+                probe.add((stats.filter_id, stats.source))
+        if skip or probe:
+            logger.info(f"Источники без совпадений: пропущено {len(skip)}, повторная проверка {len(probe)}")
+        return skip, probe
+    
+    async def _record_source_stats(self, pipeline: CheckPipeline) -> None:
+        """Сохранить стоимость и отдачу выполненных заданий"""
+        entries = []
+        # Задания с ошибкой загрузки не учитываются: ошибка - не признак того, что у источника
+        # нет подходящих объявлений
+        for job in pipeline.completed:
+            stats = pipeline.job_stats.get(job.key, {})
+            entries.append({
+                'filter_id': job.user_filter.id,
+                'source': job.source,
+                'seconds': stats.get('seconds', 0.0),
+                'received': stats.get('received', 0),
+                'matched': stats.get('matched', 0),
+                'new': stats.get('new', 0),
+            })
+        try:
+            await self.db_manager.record_source_stats(entries)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении статистики источников: {e}", exc_info=True)
+    
+    def _detect_removed(self, pipeline: CheckPipeline) -> List[Tuple[str, str]]:
+        """
+        Отметить снятыми объявления, пропавшие из выдачи (записываются вместе с состояниями)
+        
+        Returns:
+            Объявления, отмеченные снятыми впервые: (источник, ID)
+        """
+        # Объявление, которое видно в выдаче другого фильтра, точно не снято
+        visible_now: Dict[str, Set[str]] = {}
+        for (_, source), ad_ids in pipeline.job_ids.items():
+            visible_now.setdefault(source, set()).update(ad_ids)
+        
+        removed_ads = []
+        for key, ad_ids in pipeline.job_ids.items():
+            previous = self._visible.get(key)
+            self._visible[key] = ad_ids
+            if previous is None:
+                continue
+            source = key[1]
+            missing = [ad_id for ad_id in disappeared(previous, ad_ids) if ad_id not in visible_now[source]]
+            removed = self.price_tracker.mark_removed(source, missing)
+            for ad_id in removed:
+                logger.info(f"  [REMOVED] {source} #{ad_id} пропало из выдачи")
+            removed_ads.extend((source, ad_id) for ad_id in removed)
+        if removed_ads:
+            logger.info(f"Снято с продажи объявлений: {len(removed_ads)}")
+        return removed_ads
+    
+    async def _edit_notifications(self, source: str, ad_id: str, line: str) -> Set[int]:
+        """
+        Дописать строку об изменении к уведомлениям об объявлении, отправленным отдельными сообщениями
+        
+        Returns:
+            ID пользователей, чьи уведомления изменены (им не нужно отдельное сообщение)
+        """
+        edited = set()
+        for entry in await self.db_manager.get_sent_notifications(source, ad_id):
+            # Последние изменения, чтобы подпись к фото не превысила ограничение Telegram
+            lines = entry.status_text.split('\n') if entry.status_text else []
+            lines = lines[max(0, len(lines) - NOTIFY_EDIT_MAX_LINES + 1):]
+            status_text = '\n'.join(lines + [line])
+            if await edit_notification(entry, status_text):
+                await self.db_manager.set_outbox_status_text(entry.id, status_text)
+                edited.add(entry.user_id)
+            await asyncio.sleep(NOTIFY_EDIT_DELAY_SECONDS)
+        return edited
+    
+    async def _mark_removed_notifications(self, removed: List[Tuple[str, str]]) -> None:
+        """Отметить в уведомлениях, что объявления сняты с продажи"""
+        line = f"❌ {datetime.now().strftime('%d.%m')}: снято с продажи"
+        for source, ad_id in removed:
+            try:
+                await self._edit_notifications(source, ad_id, line)
+            except Exception as e:
+                logger.error(f"Ошибка при изменении уведомлений о {source} #{ad_id}: {e}", exc_info=True)
+    
+    async def _process_price_changes(self, pipeline: CheckPipeline) -> None:
+        """Записать изменившиеся состояния объявлений и уведомить пользователей об изменении цены"""
+        try:
+            await self.db_manager.save_ad_snapshots(self.price_tracker.pop_dirty())
+            await self.db_manager.save_market_stats(self.market_stats.pop_dirty())
+            for change in pipeline.price_changes:
+                car = change.car
+                recipients = await self.db_manager.apply_price_change(car.source, car.ad_id, car.price_usd, car.price_byn)
+                user_ids = {user_id for user_id, _ in recipients}
+                # Пользователи, следящие за объявлением, узнают о цене один раз - из выдачи или со страницы
+                watchers = await self.db_manager.get_ad_watchers(car.source, car.ad_id)
+                if watchers:
+                    user_ids.update(
+                        watched_ad.user_id for watched_ad in watchers
+                        if find_price_change(car, watched_ad.price_usd, watched_ad.price_byn) is not None
+                    )
+                    await self.db_manager.update_watched_ads(
+                        car.source, car.ad_id, price_usd=car.price_usd, price_byn=car.price_byn
+                    )
+                await self._send_price_change(change, user_ids)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке изменений цены: {e}", exc_info=True)
+    
+    async def _send_price_change(self, change: PriceChange, user_ids: Set[int]) -> None:
+        """
+        Уведомить пользователей об изменении цены
+        
+        Новая цена дописывается к исходному уведомлению; отдельное сообщение получают только
+        пользователи, чье уведомление изменить нельзя (о повышении - только если включено).
+        """
+        car = change.car
+        old_price, new_price, currency = change.prices
+        logger.info(f"  [PRICE] {car.source} #{car.ad_id}: {old_price} -> {new_price} {currency}")
+        prices = format_price_change(change)
+        edited = set()
+        if prices is not None:
+            icon = "📉" if change.is_drop else "📈"
+            edited = await self._edit_notifications(
+                car.source, car.ad_id, f"{icon} {datetime.now().strftime('%d.%m')}: цена {prices}"
+            )
+        if not change.is_drop and not PRICE_NOTIFY_INCREASES:
+            return
+        for user_id in user_ids - edited:
+            await send_price_change(user_id, change)
+            await asyncio.sleep(NOTIFY_DELAY_SECONDS)
+    
+    async def poll_watchlist(self) -> None:
+        """
+        Проверка страниц объявлений из списков наблюдения
+        
+        Объявление в списках нескольких пользователей загружается один раз, поэтому стоимость
+        зависит от числа разных объявлений. Источники проверяются параллельно, объявления одного
+        источника - партиями по WATCHLIST_BATCH_SIZE с паузой между запросами и под общим
+        ограничением одновременных запросов к сайту.
+        """
+        try:
+            results = await asyncio.gather(
+                *(self._poll_watch_source(source) for source in self.parsers), return_exceptions=True
+            )
+            checked = 0
+            for source, result in zip(self.parsers, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Ошибка при проверке списка наблюдения {source}: {result}", exc_info=result)
+                else:
+                    checked += result
+            if checked:
+                logger.info(f"Проверено объявлений из списков наблюдения: {checked}")
+            await self.db_manager.save_ad_snapshots(self.price_tracker.pop_dirty())
+        except Exception as e:
+            logger.error(f"Ошибка при проверке списка наблюдения: {e}", exc_info=True)
+    
+    async def _poll_watch_source(self, source: str) -> int:
+        """Проверить очередную партию объявлений источника из списков наблюдения"""
+        due = await self.db_manager.get_due_watched_ads(
+            source, datetime.utcnow() - timedelta(minutes=WATCHLIST_POLL_MINUTES), WATCHLIST_BATCH_SIZE
+        )
+        parser = self.parsers[source]
+        for index, (ad_id, url) in enumerate(due):
+            if index:
+                await asyncio.sleep(WATCHLIST_REQUEST_DELAY)
+            async with self.source_locks[source]:
+                details = await parser.fetch_ad(url)
+            await self._apply_watch_result(source, ad_id, details)
+        return len(due)
+    
+    async def _apply_watch_result(self, source: str, ad_id: str, details: Optional[AdDetails]) -> None:
+        """Обновить записи наблюдения за объявлением и уведомить следящих пользователей"""
+        now = datetime.utcnow()
+        if details is None or not (details.removed or details.price_usd or details.price_byn):
+            # Состояние не изменилось или неизвестно - объявление проверится в следующий раз
+            await self.db_manager.update_watched_ads(source, ad_id, checked_at=now)
+            return
+        
+        watchers = await self.db_manager.get_ad_watchers(source, ad_id)
+        if details.removed:
+            await self.db_manager.update_watched_ads(source, ad_id, checked_at=now, removed_at=now)
+            self.price_tracker.mark_removed(source, [ad_id], now)
+            logger.info(f"  [REMOVED] {source} #{ad_id} снято с продажи (страница объявления)")
+            edited = await self._edit_notifications(
+                source, ad_id, f"❌ {datetime.now().strftime('%d.%m')}: снято с продажи"
+            )
+            for watched_ad in watchers:
+                if watched_ad.removed_at is None and watched_ad.user_id not in edited:
+                    await send_watch_removed(watched_ad.user_id, watched_ad)
+                    await asyncio.sleep(NOTIFY_DELAY_SECONDS)
+            return
+        
+        await self.db_manager.update_watched_ads(
+            source, ad_id, checked_at=now, price_usd=details.price_usd, price_byn=details.price_byn
+        )
+        change = None
+        user_ids: Set[int] = set()
+        for watched_ad in watchers:
+            car = Listing(source, ad_id, title=watched_ad.title, url=watched_ad.url,
+                          price_usd=details.price_usd, price_byn=details.price_byn)
+            watcher_change = find_price_change(car, watched_ad.price_usd, watched_ad.price_byn)
+            if watcher_change is not None:
+                change = change or watcher_change
+                user_ids.add(watched_ad.user_id)
+        if change is None:
+            return
+        # Цена найденных объявлений обновляется сразу: из выдачи об этом изменении уже не уведомим
+        recipients = await self.db_manager.apply_price_change(source, ad_id, details.price_usd, details.price_byn)
+        user_ids.update(user_id for user_id, _ in recipients)
+        self.price_tracker.set_prices(source, ad_id, details.price_usd, details.price_byn)
+        await self._send_price_change(change, user_ids)
+    
+    async def start_event_listener(self) -> None:
+        """Начать получение событий от бота (обрабатываются только новые события)"""
+        self._event_cursor = await self.db_manager.get_last_monitor_event_id()
+        self._event_task = asyncio.create_task(self._listen_events())
+        logger.info(f"Получение событий запущено (источники: {', '.join(self.parsers)})")
+    
+    async def _listen_events(self) -> None:
+        """Периодический опрос таблицы событий"""
+        while True:
+            try:
+                events = await self.db_manager.get_monitor_events(self._event_cursor)
+                for monitor_event in events:
+                    self._event_cursor = monitor_event.id
+                    await self.handle_event(monitor_event)
+            except Exception as e:
+                logger.error(f"Ошибка при получении событий: {e}", exc_info=True)
+            await asyncio.sleep(MONITOR_EVENT_POLL_SECONDS)
+    
+    async def handle_event(self, monitor_event: MonitorEvent) -> None:
+        """Обработка события от бота"""
+        if monitor_event.event_type == 'filter_saved':
+            user_filter = await self.db_manager.get_filter_by_id(monitor_event.filter_id)
+            if user_filter and user_filter.is_active:
+                # Измененный фильтр проверяется с сайтов в первую очередь, а его история догружается заново
+                for source in self.parsers:
+                    self._last_checked.pop((user_filter.id, source), None)
+                    # Выдача по новым условиям с прежней не сравнивается
+                    self._visible.pop((user_filter.id, source), None)
+                await self.db_manager.request_backfill(user_filter.id, list(self.parsers))
+                # Условия фильтра могли измениться - отключенные источники проверяются заново
+                await self.db_manager.reset_source_stats(user_filter.id)
+                # Полная проверка с сайтов пройдет в ближайшем цикле: фильтр еще ни разу не проверялся,
+                # поэтому его задания встанут в начало очереди
+                logger.info(f"Фильтр #{user_filter.id} сохранен, проверяю по последним {len(self.recent)} объявлениям")
+                await self.check_filter_recent(user_filter)
     
     def start(self, interval_minutes: int = 3) -> None:
         """Запустить мониторинг"""
@@ -170,12 +549,54 @@ class MonitorService:
             self.check_ads,
             trigger=IntervalTrigger(minutes=interval_minutes),
             id='check_ads',
-            replace_existing=True
+            replace_existing=True,
+            # Не более одного цикла одновременно, пропущенные запуски объединяются в один
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=None
+        )
+        # Догрузка истории для новых фильтров - отдельная задача, не нагружающая обычный цикл
+        self.scheduler.add_job(
+            self.run_backfill,
+            trigger=IntervalTrigger(minutes=BACKFILL_INTERVAL_MINUTES),
+            id='run_backfill',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        # Проверка страниц объявлений из списков наблюдения
+        self.scheduler.add_job(
+            self.poll_watchlist,
+            trigger=IntervalTrigger(minutes=WATCHLIST_INTERVAL_MINUTES),
+            id='poll_watchlist',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        # Уведомления из очереди: сразу после запуска - оставшиеся с прошлого запуска, затем повторные попытки
+        self.scheduler.add_job(
+            self.outbox.run,
+            trigger=IntervalTrigger(minutes=OUTBOX_RETRY_MINUTES),
+            id='deliver_outbox',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now()
         )
         self.scheduler.start()
         logger.info(f"Мониторинг запущен (интервал: {interval_minutes} минут)")
     
     def stop(self) -> None:
         """Остановить мониторинг"""
+        if self._event_task:
+            self._event_task.cancel()
+            self._event_task = None
         self.scheduler.shutdown()
         logger.info("Мониторинг остановлен")
+    
+    async def close(self) -> None:
+        """Освободить сетевые ресурсы сервиса"""
+        if self.image_hasher is not None:
+            await self.image_hasher.aclose()
+        if image_cache is not None:
+            await image_cache.aclose()
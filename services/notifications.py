@@ -5,12 +5,27 @@
 import logging
 import os
 from pathlib import Path
-from typing import Dict
-
+from typing import List, Optional, Tuple
 # Сторонние библиотеки
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import BufferedInputFile, InputMediaPhoto, Message
 from dotenv import load_dotenv
 
+# Локальные импорты
+from config import (
+    OVERFLOW_SUMMARY_LINKS, TELEGRAM_FILE_CACHE_SIZE, DIGEST_ALBUM_SIZE, IMAGE_CACHE_ENABLED, IMAGE_CACHE_DIR,
+    IMAGE_CACHE_MAX_MB, IMAGE_CACHE_MAX_SIDE, IMAGE_CACHE_QUALITY, IMAGE_CACHE_MAX_SOURCE_BYTES, IMAGE_CACHE_TIMEOUT
+)
+from database import NotificationOutbox, UserFilter, WatchedAd
+from keyboards import get_watch_keyboard
+from parsers.listing import Listing
+from utils.rendering import NotificationPayload, render_notification
+from .image_cache import ImageCache, PIL_AVAILABLE
+from .market_stats import MarketEstimate
+from .price_tracker import PriceChange
+from .telegram_files import TelegramFileCache
+
 logger = logging.getLogger(__name__)
 
 # Загружаем .env из корневой директории проекта
@@ -26,183 +41,321 @@ if not BOT_TOKEN:
 
 bot_instance = Bot(token=BOT_TOKEN)
 
+# ID сообщения для уведомлений, которые пользователю не отправить (бот заблокирован, чат не найден):
+# повторять их отправку бессмысленно. Telegram нумерует сообщения с 1
+UNDELIVERABLE = 0
+
+# file_id загруженных фото: каждое фото загружается в Telegram с сайта один раз
+file_cache = TelegramFileCache(TELEGRAM_FILE_CACHE_SIZE)
+
+# Подготовленные фото: загружаются с сайта один раз и отправляются в Telegram уменьшенными
+image_cache: Optional[ImageCache] = None
+if IMAGE_CACHE_ENABLED:
+    if PIL_AVAILABLE:
+        image_cache = ImageCache(
+            IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB * 1024 * 1024, IMAGE_CACHE_MAX_SIDE, IMAGE_CACHE_QUALITY,
+            IMAGE_CACHE_MAX_SOURCE_BYTES, IMAGE_CACHE_TIMEOUT, TELEGRAM_FILE_CACHE_SIZE
+        )
+    else:
+        logger.warning("Pillow не установлен, фото отправляются по ссылке без локального кэша")
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Ошибка отправки, которая повторится при любой следующей попытке (чат пользователя недоступен)"""
+    return isinstance(error, TelegramForbiddenError) or 'chat not found' in str(error).lower()
+
 
-async def send_notification(user_id: int, car_data: Dict):
-    """Отправить уведомление о найденном автомобиле"""
-    # Логируем данные для отладки (INFO уровень, чтобы видеть в логах)
-    logger.info(f"Отправка уведомления: title={car_data.get('title')}, year={car_data.get('year')}, mileage={car_data.get('mileage')}, engine_volume={car_data.get('engine_volume')}, city={car_data.get('city')}, transmission={car_data.get('transmission')}, engine_type={car_data.get('engine_type')}, body_type={car_data.get('body_type')}, source={car_data.get('source')}")
+async def _photo_input(photo_url: str):
+    """Подготовленное фото из локального кэша или ссылка (если фото не удалось подготовить)"""
+    data = await image_cache.get(photo_url) if image_cache is not None else None
+    if data is None:
+        return photo_url
+    return BufferedInputFile(data, filename='photo.jpg')
+
+
+async def _send_photo(user_id: int, photo_url: str, caption: str, reply_markup=None) -> Message:
+    """
+    Отправить фото с подписью: по file_id, если фото уже загружалось, иначе из локального кэша
+    (или по ссылке, если фото не удалось подготовить)
     
-    # Проверяем, что есть минимальные данные для отправки
-    title = car_data.get('title', '').strip()
-    if not title or len(title) < 3:
-        logger.warning(f"Пропущено уведомление: нет заголовка или заголовок слишком короткий (title: '{title}')")
-        return
+    Если Telegram не смог получить фото, отправляется текст без фото.
+    """
+    file_id = await file_cache.get(photo_url)
+    if file_id is not None:
+        try:
+            return await bot_instance.send_photo(user_id, file_id, caption=caption, parse_mode='HTML',
+                                                 reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            if 'file' not in str(e).lower():
+                raise
+            # file_id больше не действителен - загружаем фото заново
+            logger.warning(f"Telegram не принял file_id фото {photo_url}: {e}")
+            await file_cache.forget(photo_url)
     
-    url = car_data.get('url', '').strip()
-    if not url or url == 'https://abw.by/cars' or 'filter' in url.lower():
-        logger.warning(f"Пропущено уведомление: неправильный URL - {url}")
-        return
+    try:
+        async with file_cache.lock(photo_url):
+            # Пока ждали блокировку, фото мог загрузить другой обработчик
+            file_id = await file_cache.get(photo_url)
+            photo = file_id or await _photo_input(photo_url)
+            try:
+                message = await bot_instance.send_photo(user_id, photo, caption=caption,
+                                                        parse_mode='HTML', reply_markup=reply_markup)
+            except TelegramBadRequest as e:
+                error_msg = str(e).lower()
+                if 'chat not found' in error_msg or not any(word in error_msg for word in ('file', 'photo', 'image', 'url')):
+                    raise
+                logger.warning(f"Telegram не смог загрузить фото {photo_url}: {e}, отправляем без фото")
+                return await bot_instance.send_message(user_id, caption, parse_mode='HTML',
+                                                       disable_web_page_preview=False, reply_markup=reply_markup)
+            if file_id is None and message.photo:
+                # Самый крупный размер фото
+                await file_cache.put(photo_url, message.photo[-1].file_id)
+            return message
+    finally:
+        file_cache.release(photo_url)
+
+
+async def send_notification(user_id: int, car_data: Listing, market: Optional[MarketEstimate] = None,
+                            found_car_id: Optional[int] = None,
+                            payload: Optional[NotificationPayload] = None) -> Optional[int]:
+    """
+    Отправить уведомление о найденном автомобиле
     
-    text = f"🚗 <b>Новое объявление!</b>\n\n"
+    Args:
+        market: Положение цены среди похожих объявлений (None - статистики недостаточно)
+        found_car_id: ID объявления в базе (для кнопки "Следить за ценой")
+        payload: Уже подготовленное уведомление (None - подготовить здесь)
     
-    # Используем полный заголовок, если он есть и содержит больше информации, чем просто brand + model
-    brand = car_data.get('brand', '').strip()
-    model = car_data.get('model', '').strip()
+    Returns:
+        ID отправленного сообщения, None (уведомление не отправлено)
+        или UNDELIVERABLE (чат пользователя недоступен)
+    """
+    if payload is None:
+        payload = render_notification(car_data, market)
+        if payload is None:
+            return None
     
-    # Формируем название автомобиля
-    if title and len(title) > len(f"{brand} {model}".strip()):
-        # Если заголовок более информативен, используем его
-        text += f"<b>{title}</b>\n"
-    elif brand or model:
-        # Иначе используем brand + model
-        car_name = f"{brand} {model}".strip()
-        if car_name:
-            text += f"<b>{car_name}</b>\n"
+    reply_markup = get_watch_keyboard(found_car_id) if found_car_id is not None else None
+    try:
+        if payload.photo:
+            message = await _send_photo(user_id, payload.photo, payload.text, reply_markup)
+            logger.info(f"Отправлено уведомление с фото пользователю {user_id}: {payload.title[:50]}")
         else:
-            # Если brand и model пустые, используем заголовок
-            text += f"<b>{title}</b>\n"
-    else:
-        # Если ничего нет, используем заголовок
-        text += f"<b>{title}</b>\n"
+            message = await bot_instance.send_message(user_id, payload.text, parse_mode='HTML',
+                                                      disable_web_page_preview=False, reply_markup=reply_markup)
+            logger.info(f"Отправлено уведомление пользователю {user_id}: {payload.title[:50]}")
+        return message.message_id
+    except Exception as e:
+        # Чат не найден (тестовые аккаунты) или бот заблокирован - уведомление не повторяется
+        if is_permanent_error(e):
+            logger.warning(f"Пропущено уведомление пользователю {user_id}: чат недоступен ({e})")
+            return UNDELIVERABLE
+        logger.error(f"Ошибка при отправке уведомления пользователю {user_id}: {e}", exc_info=True)
+        return None
+
+
+async def _send_album(user_id: int, payloads: List[NotificationPayload]) -> List[Message]:
+    """Отправить объявления с фото одним альбомом (подпись каждого фото - краткое описание)"""
+    file_ids = [await file_cache.get(payload.photo) for payload in payloads]
+    media = [
+        InputMediaPhoto(media=file_id or await _photo_input(payload.photo), caption=payload.summary, parse_mode='HTML')
+        for payload, file_id in zip(payloads, file_ids)
+    ]
+    messages = await bot_instance.send_media_group(user_id, media)
+    for payload, file_id, message in zip(payloads, file_ids, messages):
+        if file_id is None and message.photo:
+            await file_cache.put(payload.photo, message.photo[-1].file_id)
+    return messages
+
+
+async def edit_notification(entry: NotificationOutbox, status_text: str) -> bool:
+    """
+    Дописать к отправленному уведомлению строки об изменениях (цена, снятие с продажи)
     
-    text += "\n"
+    Returns:
+        True - сообщение изменено, False - изменить не удалось (нужно отдельное сообщение)
+    """
+    text = f"{entry.text}\n\n{status_text}"
+    reply_markup = get_watch_keyboard(entry.found_car_id)
+    try:
+        if entry.photo:
+            try:
+                await bot_instance.edit_message_caption(chat_id=entry.user_id, message_id=entry.message_id,
+                                                        caption=text, parse_mode='HTML', reply_markup=reply_markup)
+                return True
+            except TelegramBadRequest as e:
+                # Фото не удалось отправить, и уведомление ушло текстом
+                if 'no caption' not in str(e).lower():
+                    raise
+        await bot_instance.edit_message_text(text, chat_id=entry.user_id, message_id=entry.message_id,
+                                             parse_mode='HTML', disable_web_page_preview=False,
+                                             reply_markup=reply_markup)
+        return True
+    except TelegramBadRequest as e:
+        if 'not modified' in str(e).lower():
+            return True
+        # Сообщение удалено пользователем или текст не помещается в подпись
+        logger.warning(f"Не удалось изменить уведомление {entry.message_id} пользователю {entry.user_id}: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Ошибка при изменении уведомления пользователю {entry.user_id}: {e}", exc_info=True)
+        return False
+
+
+async def send_digest(user_id: int, payloads: List[NotificationPayload]) -> List[Optional[int]]:
+    """
+    Отправить подборку новых объявлений
     
-    # Формируем список характеристик
-    details = []
+    Объявления с фото отправляются альбомами по DIGEST_ALBUM_SIZE, остальные (и альбомы,
+    которые Telegram не принял) - списком в одном сообщении.
     
-    if car_data.get('year'):
-        details.append(f"📅 Год: {car_data['year']}")
-    if car_data.get('mileage'):
-        mileage = car_data['mileage']
-        if isinstance(mileage, (int, float)):
-            # Форматируем пробег с разделителями тысяч (пробелы вместо запятых)
-            mileage_formatted = f"{int(mileage):,}".replace(',', ' ')
-            details.append(f"🛣️ Пробег: {mileage_formatted} км")
-        else:
-            details.append(f"🛣️ Пробег: {mileage} км")
-    if car_data.get('engine_volume'):
-        volume = car_data['engine_volume']
-        if isinstance(volume, (int, float)):
-            details.append(f"⚙️ Объем: {volume} л")
+    Returns:
+        ID сообщения с каждым объявлением в порядке payloads (None - объявление не отправлено,
+        UNDELIVERABLE - чат пользователя недоступен)
+    """
+    message_ids: List[Optional[int]] = [None] * len(payloads)
+    if not payloads:
+        return message_ids
+    with_photo = [index for index, payload in enumerate(payloads) if payload.photo]
+    text_only = [index for index, payload in enumerate(payloads) if not payload.photo]
+    calls = 0
+    try:
+        for start in range(0, len(with_photo), DIGEST_ALBUM_SIZE):
+            album = with_photo[start:start + DIGEST_ALBUM_SIZE]
+            calls += 1
+            if len(album) == 1:
+                payload = payloads[album[0]]
+                message_ids[album[0]] = (await _send_photo(user_id, payload.photo, payload.summary)).message_id
+                continue
+            try:
+                messages = await _send_album(user_id, [payloads[index] for index in album])
+                for index, message in zip(album, messages):
+                    message_ids[index] = message.message_id
+            except TelegramBadRequest as e:
+                if 'chat not found' in str(e).lower():
+                    raise
+                # Одно недоступное фото отклоняет весь альбом
+                logger.warning(f"Альбом не отправлен пользователю {user_id}: {e}, отправляем списком")
+                text_only.extend(album)
+        
+        # Список без фото, разбитый на сообщения в пределах ограничения Telegram
+        header = f"📚 <b>Новые объявления ({len(text_only)})</b>\n\n"
+        text, chunk = header, []
+        for index in text_only + [None]:
+            summary = payloads[index].summary if index is not None else None
+            if chunk and (index is None or len(text) + len(summary) + 2 > 4096):
+                message = await bot_instance.send_message(user_id, text, parse_mode='HTML',
+                                                          disable_web_page_preview=True)
+                calls += 1
+                for sent_index in chunk:
+                    message_ids[sent_index] = message.message_id
+                text, chunk = "", []
+            if index is not None:
+                text += summary + "\n\n"
+                chunk.append(index)
+        logger.info(f"Отправлена подборка из {len(payloads)} объявлений пользователю {user_id} (запросов к Telegram: {calls})")
+    except Exception as e:
+        if is_permanent_error(e):
+            logger.warning(f"Пропущена подборка пользователю {user_id}: чат недоступен ({e})")
+            message_ids = [UNDELIVERABLE if message_id is None else message_id for message_id in message_ids]
         else:
-            details.append(f"⚙️ Объем: {volume}")
-    if car_data.get('city'):
-        details.append(f"📍 Город: {car_data['city']}")
-    if car_data.get('transmission'):
-        details.append(f"🔧 Коробка: {car_data['transmission']}")
-    if car_data.get('engine_type'):
-        details.append(f"⛽ Двигатель: {car_data['engine_type']}")
-    if car_data.get('body_type'):
-        details.append(f"🚙 Тип кузова: {car_data['body_type']}")
-    
-    # Добавляем все характеристики
-    if details:
-        text += "\n".join(details) + "\n"
-    
-    text += "\n"
-    
-    # Цена
-    price_parts = []
-    price_usd = None
-    price_byn = None
-    
-    # Извлекаем цены и нормализуем их
-    if car_data.get('price_usd'):
-        try:
-            price_usd = float(car_data['price_usd'])
-            # Проверка на разумность: если цена больше 1 миллиона USD, вероятно ошибка парсинга
-            if price_usd > 1000000:
-                logger.warning(f"Подозрительно большая цена USD: {price_usd}, пропускаем")
-                price_usd = None
-        except (ValueError, TypeError):
-            pass
-    
-    if car_data.get('price_byn'):
-        try:
-            price_byn = float(car_data['price_byn'])
-            # Проверка на разумность: если цена больше 10 миллионов BYN, вероятно ошибка парсинга
-            if price_byn > 10000000:
-                logger.warning(f"Подозрительно большая цена BYN: {price_byn}, пропускаем")
-                price_byn = None
-        except (ValueError, TypeError):
-            pass
+            logger.error(f"Ошибка при отправке подборки пользователю {user_id}: {e}", exc_info=True)
+    return message_ids
+
+
+def format_price_change(change: PriceChange) -> Optional[str]:
+    """Старая и новая цена с изменением в процентах (None - цены неизвестны)"""
+    old_price, new_price, currency = change.prices
+    if not old_price or not new_price:
+        return None
     
-    # Проверка соответствия цен, если обе есть
-    if price_usd and price_byn:
-        expected_byn = price_usd * 3.3
-        expected_usd = price_byn / 3.3
-        # Если разница больше 15%, вероятно ошибка парсинга
-        usd_diff = abs(price_usd - expected_usd) / max(price_usd, 1)
-        byn_diff = abs(price_byn - expected_byn) / max(expected_byn, 1)
-        
-        if byn_diff > 0.15 or usd_diff > 0.15:
-            logger.warning(f"Несоответствие цен в уведомлении: USD={price_usd}, BYN={price_byn}, ожидалось BYN={expected_byn:.0f}, USD={expected_usd:.0f}")
-            # Исправляем цену, используя более точную
-            if usd_diff < byn_diff:
-                # USD более точная, пересчитываем BYN
-                price_byn = round(price_usd * 3.3, 0)
-                logger.info(f"Исправлена цена BYN: {price_byn} (было {car_data.get('price_byn')})")
-            else:
-                # BYN более точная, пересчитываем USD
-                price_usd = round(price_byn / 3.3, 0)
-                logger.info(f"Исправлена цена USD: {price_usd} (было {car_data.get('price_usd')})")
+    if currency == 'USD':
+        old_text = f"${old_price:,.0f}".replace(',', ' ')
+        new_text = f"${new_price:,.0f}".replace(',', ' ')
+    else:
+        old_text = f"{old_price:,.0f} BYN".replace(',', ' ')
+        new_text = f"{new_price:,.0f} BYN".replace(',', ' ')
+    percent = (new_price - old_price) / old_price * 100
+    return f"{old_text} → <b>{new_text}</b> ({percent:+.1f}%)"
+
+
+async def send_price_change(user_id: int, change: PriceChange):
+    """Отправить уведомление об изменении цены ранее найденного автомобиля"""
+    car_data = change.car
+    prices = format_price_change(change)
+    if prices is None:
+        return
     
-    # Конвертация валют, если одна из цен отсутствует (примерный курс: 1 USD = 3.3 BYN)
-    # Но только если обе цены разумные
-    if price_usd and not price_byn:
-        if price_usd < 1000000:  # Только если цена разумная
-            price_byn = round(price_usd * 3.3, 0)
-    elif price_byn and not price_usd:
-        if price_byn < 10000000:  # Только если цена разумная
-            price_usd = round(price_byn / 3.3, 0)
+    icon = "📉" if change.is_drop else "📈"
+    title = (car_data.title or '').strip() or f"{car_data.brand or ''} {car_data.model or ''}".strip()
     
-    # Форматируем и добавляем цены (используем пробелы как разделители тысяч для читаемости)
-    if price_usd and price_usd < 1000000:
-        price_parts.append(f"<b>${price_usd:,.0f}</b>".replace(',', ' '))
-    if price_byn and price_byn < 10000000:
-        price_parts.append(f"<b>{price_byn:,.0f} BYN</b>".replace(',', ' '))
+    text = (
+        f"{icon} <b>Цена изменилась!</b>\n\n"
+        f"<b>{title}</b>\n"
+        f"💰 {prices}\n\n"
+    )
+    if car_data.url:
+        text += f"🔗 <a href='{car_data.url}'>Открыть объявление</a>"
     
-    if price_parts:
-        # Если обе цены есть, разделяем их для читаемости
-        if len(price_parts) == 2:
-            text += f"💰 {price_parts[0]} / {price_parts[1]}\n\n"
+    try:
+        await bot_instance.send_message(user_id, text, parse_mode='HTML')
+        logger.info(f"Отправлено уведомление об изменении цены пользователю {user_id}: {title[:50]}")
+    except Exception as e:
+        if 'chat not found' in str(e).lower():
+            logger.warning(f"Пропущено уведомление пользователю {user_id}: чат не найден (возможно, тестовый пользователь)")
         else:
-            text += f"💰 {price_parts[0]}\n\n"
-    else:
-        text += "\n"
+            logger.error(f"Ошибка при отправке уведомления пользователю {user_id}: {e}", exc_info=True)
+
+
+async def send_overflow_summary(user_id: int, items: List[Tuple[UserFilter, Listing]]) -> Optional[int]:
+    """
+    Отправить одним сообщением объявления, не уместившиеся в лимиты уведомлений
     
-    # Проверяем и исправляем URL если нужно
-    url = car_data.get('url', '')
-    if url:
-        # Убеждаемся, что URL полный
-        if not url.startswith('http'):
-            # Если относительный путь, добавляем домен в зависимости от источника
-            source = car_data.get('source', '')
-            if 'av.by' in source or 'av.by' in url:
-                url = f"https://av.by{url}" if url.startswith('/') else f"https://av.by/{url}"
-            elif 'kufar' in source or 'kufar' in url:
-                url = f"https://kufar.by{url}" if url.startswith('/') else f"https://kufar.by/{url}"
-            elif 'onliner' in source or 'onliner' in url:
-                url = f"https://ab.onliner.by{url}" if url.startswith('/') else f"https://ab.onliner.by/{url}"
-            elif 'abw' in source or 'abw' in url:
-                url = f"https://abw.by{url}" if url.startswith('/') else f"https://abw.by/{url}"
+    Returns:
+        ID отправленного сообщения, None (сводка не отправлена) или UNDELIVERABLE (чат пользователя недоступен)
+    """
+    if not items:
+        return None
+    counts = {}
+    for user_filter, _ in items:
+        counts[user_filter] = counts.get(user_filter, 0) + 1
     
-    if url:
-        text += f"🔗 <a href='{url}'>Открыть объявление</a>"
-    else:
-        text += "🔗 Ссылка на объявление недоступна"
+    text = f"📦 <b>Еще {len(items)} новых объявлений</b> (лимит уведомлений исчерпан)\n\n"
+    for user_filter, count in counts.items():
+        name = ' '.join(part for part in (user_filter.brand, user_filter.model) if part) or "все марки"
+        text += f"• Фильтр #{user_filter.id} ({name}): {count}\n"
+    text += "\n"
+    for _, car_data in items[:OVERFLOW_SUMMARY_LINKS]:
+        title = (car_data.title or '').strip() or f"{car_data.brand or ''} {car_data.model or ''}".strip()
+        price = f" - ${car_data.price_usd:,.0f}".replace(',', ' ') if car_data.price_usd else ""
+        text += f"🔗 <a href='{car_data.url}'>{title[:60]}</a>{price}\n"
+    if len(items) > OVERFLOW_SUMMARY_LINKS:
+        text += f"\n...и еще {len(items) - OVERFLOW_SUMMARY_LINKS}. Уточните фильтры, чтобы получать меньше объявлений"
     
     try:
-        if car_data.get('image_url'):
-            await bot_instance.send_photo(user_id, car_data['image_url'], caption=text, parse_mode='HTML')
-            logger.info(f"Отправлено уведомление с фото пользователю {user_id}: {title[:50] if title else 'N/A'}")
-        else:
-            await bot_instance.send_message(user_id, text, parse_mode='HTML', disable_web_page_preview=False)
-            logger.info(f"Отправлено уведомление пользователю {user_id}: {title[:50] if title else 'N/A'}")
+        message = await bot_instance.send_message(user_id, text, parse_mode='HTML', disable_web_page_preview=True)
+        logger.info(f"Отправлена сводка из {len(items)} объявлений пользователю {user_id}")
+        return message.message_id
+    except Exception as e:
+        if is_permanent_error(e):
+            logger.warning(f"Пропущена сводка пользователю {user_id}: чат недоступен ({e})")
+            return UNDELIVERABLE
+        logger.error(f"Ошибка при отправке сводки пользователю {user_id}: {e}", exc_info=True)
+        return None
+
+
+async def send_watch_removed(user_id: int, watched_ad: WatchedAd):
+    """Отправить уведомление о снятии с продажи объявления из списка наблюдения"""
+    text = (
+        f"❌ <b>Объявление снято с продажи</b>\n\n"
+        f"<b>{watched_ad.title}</b> ({watched_ad.source})\n\n"
+        f"🔗 <a href='{watched_ad.url}'>Открыть объявление</a>"
+    )
+    try:
+        await bot_instance.send_message(user_id, text, parse_mode='HTML')
+        logger.info(f"Отправлено уведомление о снятии объявления пользователю {user_id}: {watched_ad.title[:50]}")
     except Exception as e:
-        error_msg = str(e)
-        # Игнорируем ошибку "chat not found" для несуществующих пользователей (тестовые аккаунты)
-        if 'chat not found' in error_msg.lower():
+        if 'chat not found' in str(e).lower():
             logger.warning(f"Пропущено уведомление пользователю {user_id}: чат не найден (возможно, тестовый пользователь)")
         else:
             logger.error(f"Ошибка при отправке уведомления пользователю {user_id}: {e}", exc_info=True)
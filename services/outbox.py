@@ -0,0 +1,120 @@
+"""
+Отправка уведомлений из очереди
+
+Уведомление о новом объявлении записывается в очередь в одной транзакции с объявлением.
+Обычно его сразу отправляет конвейер проверки; здесь отправляются остальные записи:
+повторные попытки после ошибки и уведомления, не отправленные до остановки процесса.
+Запись отмечается как отправляемая до обращения к Telegram и как отправленная (с ID
+сообщения) после него, поэтому после перезапуска отправка продолжается с первой
+неотправленной записи. Записи, которые конвейер не довел до результата (упал между
+сохранением и отправкой), забираются отсюда через OUTBOX_LEASE_MINUTES.
+
+Доставка "хотя бы один раз": если процесс остановился между отправкой сообщения и
+записью его ID, после перезапуска уведомление придет повторно.
+"""
+# Стандартная библиотека
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Локальные импорты
+from config import OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_LEASE_MINUTES, NOTIFY_DELAY_SECONDS
+from database import NotificationOutbox
+from db_manager import DBManager
+from utils.rendering import NotificationPayload
+from .notifications import send_notification, send_digest, UNDELIVERABLE
+
+logger = logging.getLogger(__name__)
+
+
+def to_payload(entry: NotificationOutbox) -> NotificationPayload:
+    """Подготовленное уведомление из записи очереди"""
+    return NotificationPayload(entry.text, entry.photo, entry.title, entry.summary)
+
+
+async def finish_outbox(db_manager: DBManager, outbox_ids: List[int], message_ids: List[Optional[int]],
+                        delivery: str = 'single') -> None:
+    """
+    Записать результат отправки записей очереди
+
+    Отправленные записи сохраняются с ID сообщения, остальные возвращаются в очередь
+    на повторную попытку. Записи для недоступных чатов сразу считаются неотправленными:
+    следующие попытки закончатся той же ошибкой.
+    """
+    sent, retry, undeliverable = {}, [], []
+    for outbox_id, message_id in zip(outbox_ids, message_ids):
+        if message_id is None:
+            retry.append(outbox_id)
+        elif message_id == UNDELIVERABLE:
+            undeliverable.append(outbox_id)
+        else:
+            sent[outbox_id] = message_id
+    await db_manager.complete_outbox(sent, delivery)
+    await db_manager.fail_outbox(retry, OUTBOX_MAX_ATTEMPTS)
+    await db_manager.fail_outbox(undeliverable, max_attempts=1)
+
+
+class OutboxWorker:
+    """Отправка неотправленных уведомлений источников процесса"""
+
+    def __init__(self, db_manager: DBManager, sources: List[str]):
+        self.db_manager = db_manager
+        self.sources = sources
+        # Записи до этого ID созданы до запуска процесса: неотправленные из них отправляются здесь
+        self.recover_until_id = 0
+
+    async def load(self) -> None:
+        """Запомнить границу записей, созданных до запуска"""
+        self.recover_until_id = await self.db_manager.get_last_outbox_id()
+
+    async def run(self) -> None:
+        """Отправить все ожидающие записи (партиями по OUTBOX_BATCH_SIZE)"""
+        # Не отправленные в этом запуске записи ждут следующего
+        started = datetime.utcnow()
+        stale_before = started - timedelta(minutes=OUTBOX_LEASE_MINUTES)
+        try:
+            while True:
+                entries = await self.db_manager.claim_outbox(
+                    self.sources, self.recover_until_id, started, stale_before, OUTBOX_BATCH_SIZE
+                )
+                if not entries:
+                    return
+                logger.info(f"Отправка уведомлений из очереди: {len(entries)}")
+                await self._deliver(entries)
+        except Exception as e:
+            logger.error(f"Ошибка при отправке уведомлений из очереди: {e}", exc_info=True)
+
+    async def _deliver(self, entries: List[NotificationOutbox]) -> None:
+        try:
+            digest_users = await self.db_manager.get_digest_user_ids()
+        except Exception as e:
+            # Записи уже отмечены как отправляемые: отправляем их отдельными уведомлениями
+            logger.error(f"Ошибка при загрузке настроек подборки: {e}", exc_info=True)
+            digest_users = set()
+        by_user: Dict[int, List[NotificationOutbox]] = {}
+        for entry in entries:
+            by_user.setdefault(entry.user_id, []).append(entry)
+
+        for user_id, user_entries in by_user.items():
+            if user_id in digest_users and len(user_entries) > 1:
+                message_ids: List[Optional[int]] = [None] * len(user_entries)
+                try:
+                    message_ids = await send_digest(user_id, [to_payload(entry) for entry in user_entries])
+                finally:
+                    # Записи не остаются отправляемыми, даже если отправка прервалась
+                    await self._finish(user_entries, message_ids, 'group')
+                await asyncio.sleep(NOTIFY_DELAY_SECONDS)
+                continue
+            for entry in user_entries:
+                message_id = None
+                try:
+                    message_id = await send_notification(user_id, None, found_car_id=entry.found_car_id,
+                                                         payload=to_payload(entry))
+                finally:
+                    await self._finish([entry], [message_id])
+                await asyncio.sleep(NOTIFY_DELAY_SECONDS)
+
+    async def _finish(self, entries: List[NotificationOutbox], message_ids: List[Optional[int]],
+                      delivery: str = 'single') -> None:
+        await finish_outbox(self.db_manager, [entry.id for entry in entries], message_ids, delivery)
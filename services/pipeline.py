@@ -0,0 +1,630 @@
+"""
+Конвейер проверки объявлений
+
+Цикл проверки разбит на стадии с ограниченными очередями:
+загрузка и разбор -> сопоставление с фильтром -> дедупликация -> [проверка фото] -> сохранение ->
+[подготовка фото] -> уведомление.
+Параллельно загруженные объявления сравниваются с сохраненным состоянием (стадия diff).
+У каждой стадии свое число обработчиков, а заполненная очередь притормаживает
+предыдущую стадию (backpressure), вместо того чтобы останавливать весь цикл.
+"""
+# Стандартная библиотека
+import asyncio
+import logging
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+# Локальные импорты
+from config import (
+    PIPELINE_QUEUE_SIZE, PIPELINE_WORKERS, NOTIFY_DELAY_SECONDS, LIVE_CHECK_LIMIT, DUPLICATE_WINDOW_DAYS,
+    MAX_MATCHES_PER_FILTER_CYCLE
+)
+from database import UserFilter
+from db_manager import DBManager
+from parsers.base_parser import BaseParser
+from parsers.listing import Listing
+from utils.rendering import NotificationPayload, render_notification
+from .duplicates import fingerprint_keys, find_original
+from .image_hash import ImageHasher, ImageHashIndex, to_db
+from .market_stats import MarketStats
+from .notifications import send_notification, send_overflow_summary, send_digest, image_cache
+from .outbox import finish_outbox
+from .price_tracker import PriceChange, PriceTracker
+from .quotas import NotificationQuota
+from .recent_listings import RecentListings
+
+logger = logging.getLogger(__name__)
+
+
+async def take(listings: AsyncIterator[Listing], limit: Optional[int]) -> AsyncIterator[Listing]:
+    """Выдать не более limit объявлений, не запрашивая у источника лишних страниц (None - без ограничения)"""
+    if limit is None:
+        async for car in listings:
+            yield car
+        return
+    if limit <= 0:
+        return
+    count = 0
+    async for car in listings:
+        yield car
+        count += 1
+        if count >= limit:
+            return
+
+
+def filter_to_dict(user_filter: UserFilter) -> Dict:
+    """Преобразовать фильтр пользователя в словарь для парсеров"""
+    filter_dict = {
+        'brand': user_filter.brand,
+        'model': user_filter.model,
+        'year_from': user_filter.year_from,
+        'year_to': user_filter.year_to,
+        'price_from_usd': user_filter.price_from_usd,
+        'price_to_usd': user_filter.price_to_usd,
+        'transmission': user_filter.transmission,
+        'engine_type': user_filter.engine_type,
+        'body_type': user_filter.body_type,
+    }
+    # Удаляем None значения
+    return {k: v for k, v in filter_dict.items() if v is not None}
+
+
+class FilterJob:
+    """Задание на проверку одного источника по одному фильтру"""
+
+    __slots__ = ('user_filter', 'filter_dict', 'source', 'parser', 'limit', 'max_pages', 'published_after')
+
+    def __init__(self, user_filter: UserFilter, filter_dict: Dict, source: str, parser: BaseParser,
+                 limit: Optional[int] = LIVE_CHECK_LIMIT, max_pages: int = 1):
+        """
+        Args:
+            limit: Сколько объявлений проверить (None - без ограничения)
+            max_pages: Сколько страниц истории источника загружать
+        """
+        self.user_filter = user_filter
+        self.filter_dict = filter_dict
+        self.source = source
+        self.parser = parser
+        self.limit = limit
+        self.max_pages = max_pages
+        # Объявления, опубликованные раньше, отсекаются до сопоставления с фильтром
+        max_age_days = user_filter.max_age_days
+        self.published_after: Optional[datetime] = (
+            datetime.utcnow() - timedelta(days=max_age_days) if max_age_days else None
+        )
+
+    @property
+    def key(self) -> Tuple[int, str]:
+        """Ключ задания: (ID фильтра, источник)"""
+        return (self.user_filter.id, self.source)
+
+    def is_stale(self, car: Listing) -> bool:
+        """Объявление старше горизонта фильтра (без времени публикации - не отсекается)"""
+        return (self.published_after is not None and car.published_at is not None
+                and car.published_at < self.published_after)
+
+
+class Candidate:
+    """Объявление, проходящее стадии конвейера"""
+
+    __slots__ = ('job', 'car', 'found_car_id', 'outbox_id', 'image_hash', 'duplicate_of')
+
+    def __init__(self, job: FilterJob, car: Listing):
+        self.job = job
+        self.car = car
+        self.found_car_id: Optional[int] = None
+        # Запись очереди уведомлений (None - уведомление не отправляется)
+        self.outbox_id: Optional[int] = None
+        self.image_hash: Optional[int] = None
+        # Объявление с тем же фото: ID в базе или объявление этого же цикла, которое еще сохраняется
+        self.duplicate_of: Union[int, 'Candidate', None] = None
+
+
+class PipelineStage:
+    """Стадия конвейера: ограниченная очередь и пул обработчиков"""
+
+    def __init__(self, name: str, handler: Callable[[object], Awaitable[None]], workers: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Запустить обработчики стадии"""
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"pipeline-{self.name}-{index}")
+            for index in range(self.workers)
+        ]
+
+    async def put(self, item: object) -> None:
+        """Поставить элемент в очередь (ждет, пока в очереди не появится место)"""
+        await self.queue.put(item)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def join(self) -> None:
+        """Дождаться обработки всех поставленных элементов"""
+        await self.queue.join()
+
+    async def stop(self) -> None:
+        """Остановить обработчики стадии"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def metrics(self) -> Dict[str, int]:
+        """Метрики стадии"""
+        return {
+            'workers': self.workers,
+            'depth': self.queue.qsize(),
+            'max_depth': self.max_depth,
+            'processed': self.processed,
+            'failed': self.failed,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self.queue.get()
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ошибка на стадии {self.name}: {e}", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+
+class CheckPipeline:
+    """Конвейер одного цикла проверки объявлений"""
+
+    def __init__(self, db_manager: DBManager, parsers: Dict[str, BaseParser],
+                 source_locks: Dict[str, asyncio.Semaphore],
+                 recent: Optional[RecentListings] = None, from_recent: bool = False,
+                 claimed: Optional[Set[Tuple[int, str, str]]] = None,
+                 image_index: Optional[ImageHashIndex] = None, image_hasher: Optional[ImageHasher] = None,
+                 price_tracker: Optional[PriceTracker] = None, market_stats: Optional[MarketStats] = None,
+                 quota: Optional[NotificationQuota] = None):
+        """
+        Args:
+            recent: Буфер последних объявлений (пополняется загруженными объявлениями)
+            from_recent: Брать объявления из буфера вместо запросов к сайтам
+            claimed: Общий набор объявлений в работе (для конвейеров, работающих одновременно)
+            image_index: Индекс хешей фото отправленных объявлений (None - проверка фото отключена)
+            image_hasher: Загрузка фото и расчет хешей
+            price_tracker: Состояния объявлений для поиска изменений цены (None - не отслеживать)
+            market_stats: Статистика рыночных цен (пополняется новыми объявлениями)
+            quota: Часовой лимит уведомлений пользователей (общий для всех конвейеров)
+        """
+        self.db_manager = db_manager
+        self.parsers = parsers
+        self.source_locks = source_locks
+        self.recent = recent
+        self.from_recent = from_recent
+        self.image_index = image_index
+        self.image_hasher = image_hasher
+        # Буфер уже хранит проверенные объявления, повторно сравнивать их не нужно
+        self.price_tracker = price_tracker if not from_recent else None
+        self.price_changes: List[PriceChange] = []
+        self.market_stats = market_stats
+        # ID объявлений выдачи каждого успешно выполненного задания (до фильтрации) в порядке выдачи
+        self.job_ids: Dict[Tuple[int, str], List[str]] = {}
+        # Объявления, которые уже проверены и еще не сохранены: (user_id, source, ad_id)
+        self._claimed: Set[Tuple[int, str, str]] = claimed if claimed is not None else set()
+        self.quota = quota
+        # Объявления сверх лимитов уведомлений по пользователям (отправляются сводкой в конце цикла)
+        self.overflow: Dict[int, List[Candidate]] = {}
+        # Сколько уведомлений отправлено по каждому фильтру за цикл
+        self._filter_notified: Dict[int, int] = {}
+        # Пользователи в режиме подборки (загружаются в начале цикла) и их новые объявления
+        self.digest_users: Set[int] = set()
+        self.digest: Dict[int, List[Candidate]] = {}
+        # Уведомления, подготовленные в этом цикле: (источник, ID объявления) -> уведомление
+        self._rendered: Dict[Tuple[str, str], Optional[NotificationPayload]] = {}
+        self.counters: Dict[str, int] = {
+            'received': 0, 'invalid': 0, 'filtered': 0, 'exists': 0, 'duplicates': 0, 'new': 0, 'overflow': 0, 'stale': 0,
+        }
+        # Срок (по часам event loop), после которого новые задания не начинаются
+        self.deadline: Optional[float] = None
+        # Задания цикла: выполненные, перенесенные из-за бюджета и завершившиеся ошибкой загрузки
+        self.completed: List[FilterJob] = []
+        self.deferred: List[FilterJob] = []
+        self.failed_jobs: List[FilterJob] = []
+        # Стоимость и отдача каждого задания: (ID фильтра, источник) -> seconds, received, matched, new
+        self.job_stats: Dict[Tuple[int, str], Dict[str, float]] = {}
+
+        self.fetch = PipelineStage('fetch', self._fetch, PIPELINE_WORKERS['fetch'], PIPELINE_QUEUE_SIZE)
+        self.match = PipelineStage('match', self._match, PIPELINE_WORKERS['match'], PIPELINE_QUEUE_SIZE)
+        self.dedupe = PipelineStage('dedupe', self._dedupe, PIPELINE_WORKERS['dedupe'], PIPELINE_QUEUE_SIZE)
+        self.persist = PipelineStage('persist', self._persist, PIPELINE_WORKERS['persist'], PIPELINE_QUEUE_SIZE)
+        self.notify = PipelineStage('notify', self._notify, PIPELINE_WORKERS['notify'], PIPELINE_QUEUE_SIZE)
+        self.stages = [self.fetch, self.match, self.dedupe, self.persist, self.notify]
+        # Фото загружаются и уменьшаются заранее и параллельно, чтобы не задерживать отправку
+        self.photo: Optional[PipelineStage] = None
+        if image_cache is not None:
+            self.photo = PipelineStage('photo', self._prepare_photo, PIPELINE_WORKERS['photo'], PIPELINE_QUEUE_SIZE)
+            self.stages.insert(-1, self.photo)
+        self.image: Optional[PipelineStage] = None
+        if image_index is not None and image_hasher is not None:
+            self.image = PipelineStage('image', self._check_image, PIPELINE_WORKERS['image'], PIPELINE_QUEUE_SIZE)
+            self.stages.insert(3, self.image)
+        self.diff: Optional[PipelineStage] = None
+        if self.price_tracker is not None:
+            self.diff = PipelineStage('diff', self._diff, 1, PIPELINE_QUEUE_SIZE)
+            self.stages.insert(1, self.diff)
+
+    async def run(self, filters: List[UserFilter], deadline: Optional[float] = None,
+                  last_checked: Optional[Dict[Tuple[int, str], datetime]] = None,
+                  skip: Optional[Set[Tuple[int, str]]] = None,
+                  deprioritized: Optional[Set[Tuple[int, str]]] = None) -> None:
+        """
+        Проверить все фильтры по всем источникам
+
+        Args:
+            filters: Фильтры для проверки
+            deadline: Срок по часам event loop, после которого задания переносятся (None - без ограничения)
+            last_checked: Время последней проверки заданий; давно не проверенные идут первыми
+            skip: Задания (ID фильтра, источник), которые не выполняются в этом цикле
+            deprioritized: Задания, которые выполняются после всех остальных
+        """
+        # Буфер последних объявлений ограничен по размеру, поэтому проверяется целиком
+        limit = None if self.from_recent else LIVE_CHECK_LIMIT
+        jobs = []
+        for user_filter in filters:
+            filter_dict = filter_to_dict(user_filter)
+            for source_name, parser in self.parsers.items():
+                if skip and (user_filter.id, source_name) in skip:
+                    continue
+                jobs.append(FilterJob(user_filter, filter_dict, source_name, parser, limit))
+        if last_checked is not None or deprioritized:
+            # Ни разу не проверенные задания (в т.ч. перенесенные с прошлого цикла) - в начале,
+            # повторные проверки источников без совпадений - в конце
+            last_checked = last_checked or {}
+            deprioritized = deprioritized or set()
+            jobs.sort(key=lambda job: (job.key in deprioritized, last_checked.get(job.key, datetime.min)))
+        await self.run_jobs(jobs, deadline)
+
+    async def run_jobs(self, jobs: List[FilterJob], deadline: Optional[float] = None) -> None:
+        """Выполнить задания в указанном порядке"""
+        self.deadline = deadline
+        try:
+            self.digest_users = await self.db_manager.get_digest_user_ids()
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке настроек подборки: {e}", exc_info=True)
+
+        for stage in self.stages:
+            stage.start()
+        try:
+            for job in jobs:
+                await self.fetch.put(job)
+
+            # Стадии завершаются по порядку: когда опустела очередь стадии,
+            # все ее результаты уже переданы следующей
+            for stage in self.stages:
+                await stage.join()
+        finally:
+            for stage in self.stages:
+                await stage.stop()
+        await self._send_digests()
+        await self._send_overflow()
+        self.log_metrics()
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        """Метрики всех стадий"""
+        return {stage.name: stage.metrics() for stage in self.stages}
+
+    def log_metrics(self) -> None:
+        """Записать в лог итоги цикла и глубину очередей"""
+        stages = ', '.join(
+            f"{name}: {m['processed']} (ошибок {m['failed']}, макс. очередь {m['max_depth']}, обработчиков {m['workers']})"
+            for name, m in self.metrics().items()
+        )
+        logger.info(f"Конвейер: {stages}")
+        c = self.counters
+        logger.info(f"Итоги цикла: получено {c['received']}, невалидных {c['invalid']}, старых {c['stale']}, отфильтровано {c['filtered']}, уже в БД {c['exists']}, дубликатов {c['duplicates']}, новых {c['new']} (в сводке {c['overflow']}), заданий выполнено {len(self.completed)}, с ошибкой {len(self.failed_jobs)}, перенесено {len(self.deferred)}")
+
+    async def _fetch(self, job: FilterJob) -> None:
+        """Загрузка и разбор страниц источника, объявления передаются дальше по мере разбора"""
+        if self.from_recent:
+            await self._fetch_recent(job)
+            return
+
+        received_count = 0
+        ad_ids = []
+        stats = self._job_stats(job)
+        # Запросы к одному источнику не выполняются параллельно (защита от rate limiting)
+        async with self.source_locks[job.source]:
+            if self.deadline is not None and asyncio.get_running_loop().time() >= self.deadline:
+                # Бюджет цикла исчерпан: задание не теряется, а выполняется первым в следующем цикле
+                self.deferred.append(job)
+                return
+            logger.info(f"Проверяю {job.source} для фильтра #{job.user_filter.id}...")
+            if job.filter_dict:
+                logger.debug(f"  Фильтры: {job.filter_dict}")
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            try:
+                # Снятые объявления ищутся по всей выдаче источника: объявление, переставшее
+                # подходить под фильтр, остается в выдаче и снятым не считается
+                async with aclosing(job.parser.stream(job.filter_dict, job.max_pages, ad_ids)) as listings:
+                    async for car in take(listings, job.limit):
+                        received_count += 1
+                        if received_count == 1:
+                            logger.debug(f"  Пример первого объявления: {car.get('title', 'N/A')[:50]}...")
+                        if self.recent is not None:
+                            self.recent.add(car)
+                        if self.diff is not None:
+                            await self.diff.put(car)
+                        # Старое объявление не сопоставляется с фильтром и не проверяется по базе
+                        if job.is_stale(car):
+                            self.counters['stale'] += 1
+                            continue
+                        await self.match.put(Candidate(job, car))
+                self.job_ids[job.key] = ad_ids
+                self.completed.append(job)
+            except Exception as e:
+                self.failed_jobs.append(job)
+                logger.error(f"Ошибка при проверке {job.source}: {e}", exc_info=True)
+            # Время ожидания следующих стадий тоже входит: это стоимость задания для цикла
+            stats['seconds'] += loop.time() - started
+        stats['received'] += received_count
+        self.counters['received'] += received_count
+        logger.info(f"  Найдено объявлений на {job.source} для фильтра #{job.user_filter.id}: {received_count}")
+
+    def _job_stats(self, job: FilterJob) -> Dict[str, float]:
+        """Счетчики задания"""
+        stats = self.job_stats.get(job.key)
+        if stats is None:
+            stats = self.job_stats[job.key] = {'seconds': 0.0, 'received': 0, 'matched': 0, 'new': 0}
+        return stats
+
+    async def _fetch_recent(self, job: FilterJob) -> None:
+        """Сопоставление фильтра с буфером последних объявлений (без запросов к сайту)"""
+        listings = self.recent.latest(job.source) if self.recent is not None else []
+        if job.limit is not None:
+            listings = listings[:job.limit]
+        for car in listings:
+            if job.is_stale(car):
+                self.counters['stale'] += 1
+                continue
+            await self.match.put(Candidate(job, car))
+        self.counters['received'] += len(listings)
+        logger.info(f"  Объявлений {job.source} в буфере для фильтра #{job.user_filter.id}: {len(listings)}")
+
+    async def _diff(self, car: Listing) -> None:
+        """Сравнение объявления с сохраненным состоянием (сравнение хеша, без обращений к базе)"""
+        is_new = (car.source, str(car.ad_id)) not in self.price_tracker
+        change = self.price_tracker.observe(car)
+        if change is not None:
+            self.price_changes.append(change)
+        # Каждое объявление учитывается в статистике цен один раз (и заново при изменении цены)
+        if self.market_stats is not None and (is_new or change is not None):
+            self.market_stats.add(car)
+
+    async def _match(self, candidate: Candidate) -> None:
+        """Проверка валидности объявления и соответствия фильтру"""
+        car = candidate.car
+        title = (car.get('title') or '').strip()
+        url = (car.get('url') or '').strip()
+
+        # Пропускаем объявления без заголовка или с неправильным URL
+        if not title or len(title) < 3 or not url or url == 'https://abw.by/cars' or 'filter' in url.lower():
+            self.counters['invalid'] += 1
+            return
+
+        # Дополнительная проверка фильтров (на случай если парсер не применил их)
+        # Особенно важно для цены - проверяем еще раз перед сохранением
+        job = candidate.job
+        if not job.parser.matches_filters(car, job.filter_dict):
+            self.counters['filtered'] += 1
+            logger.debug(f"  [FILTER #{job.user_filter.id}] Отфильтровано объявление: {title[:50]}... (brand={car.get('brand')}, model={car.get('model')}, year={car.get('year')}, price_usd={car.get('price_usd')})")
+            return
+
+        if job.user_filter.below_market_only and self.market_stats is not None:
+            # Пока похожих объявлений мало, рыночная цена неизвестна и объявление не отсекается
+            estimate = self.market_stats.estimate(car)
+            if estimate is not None and not estimate.below_median:
+                self.counters['filtered'] += 1
+                return
+
+        self._job_stats(job)['matched'] += 1
+        await self.dedupe.put(candidate)
+
+    async def _dedupe(self, candidate: Candidate) -> None:
+        """Пропуск объявлений, которые пользователь уже получал"""
+        car = candidate.car
+        user_id = candidate.job.user_filter.user_id
+        key = (user_id, car.source, car.ad_id)
+
+        # Одно объявление может подойти нескольким фильтрам пользователя одновременно:
+        # пока оно не сохранено, проверка по базе его не видит
+        if key in self._claimed:
+            self.counters['exists'] += 1
+            return
+        self._claimed.add(key)
+
+        try:
+            exists = await self.db_manager.check_car_exists_for_user(car.source, car.ad_id, user_id)
+        except Exception:
+            self._claimed.discard(key)
+            raise
+        if exists:
+            self._claimed.discard(key)
+            self.counters['exists'] += 1
+            return
+
+        await (self.image or self.persist).put(candidate)
+
+    async def _check_image(self, candidate: Candidate) -> None:
+        """Поиск отправленного пользователю объявления с тем же фото (перевыложенное объявление)"""
+        try:
+            candidate.image_hash = await self.image_hasher.hash_url(candidate.car.image_url)
+        except Exception:
+            # Дальше объявление не пойдет - освобождаем его для следующих проверок
+            self._claimed.discard((candidate.job.user_filter.user_id, candidate.car.source, candidate.car.ad_id))
+            raise
+        if candidate.image_hash is not None:
+            user_id = candidate.job.user_filter.user_id
+            candidate.duplicate_of = self.image_index.find(user_id, candidate.image_hash)
+            if candidate.duplicate_of is None:
+                # Фото попадает в индекс сразу: такое же фото в этом же цикле уже будет дубликатом
+                self.image_index.add(user_id, candidate.image_hash, candidate)
+        await self.persist.put(candidate)
+
+    async def _persist(self, candidate: Candidate) -> None:
+        """Сохранение нового объявления (объявление о том же автомобиле с другого сайта - без уведомления)"""
+        car = candidate.car
+        user_id = candidate.job.user_filter.user_id
+        found_car = None
+        try:
+            # Поиск и сохранение идут в одной стадии, чтобы одновременно найденные
+            # на двух сайтах объявления не прошли проверку оба
+            keys = fingerprint_keys(car)
+            duplicate_of_id = candidate.duplicate_of
+            if isinstance(duplicate_of_id, Candidate):
+                # Объявление с тем же фото из этого цикла (None - его сохранить не удалось)
+                duplicate_of_id = duplicate_of_id.found_car_id
+            if duplicate_of_id is not None:
+                logger.info(f"  [REPOST] {car.source} #{car.ad_id} - то же фото, что у объявления #{duplicate_of_id}")
+            else:
+                original = find_original(car, await self.db_manager.get_cars_by_fingerprint(
+                    user_id, keys, datetime.utcnow() - timedelta(days=DUPLICATE_WINDOW_DAYS)
+                ))
+                if original is not None:
+                    duplicate_of_id = original.duplicate_of_id or original.id
+                    logger.info(f"  [DUP] {car.source} #{car.ad_id} - тот же автомобиль, что {original.source} #{original.ad_id}")
+            if duplicate_of_id is not None:
+                # Объявление сохраняется, чтобы не проверять его повторно, и считается уведомленным
+                await self.db_manager.add_found_car(
+                    filter_id=candidate.job.user_filter.id,
+                    duplicate_of_id=duplicate_of_id,
+                    notified=True,
+                    image_hash=to_db(candidate.image_hash),
+                    **car.db_fields()
+                )
+            else:
+                # Уведомление попадает в очередь в той же транзакции, что и объявление
+                payload = self._render(car)
+                found_car = await self.db_manager.add_found_car(
+                    filter_id=candidate.job.user_filter.id,
+                    user_id=user_id,
+                    fingerprints=keys,
+                    notification=payload._asdict() if payload is not None else None,
+                    notified=payload is None,
+                    image_hash=to_db(candidate.image_hash),
+                    **car.db_fields()
+                )
+                if payload is not None:
+                    candidate.outbox_id = found_car.outbox[0].id
+        finally:
+            # После сохранения дубликаты отсекает проверка по базе
+            self._claimed.discard((user_id, car.source, car.ad_id))
+            if self.image_index is not None:
+                if found_car is not None:
+                    self.image_index.rekey(candidate, found_car.id)
+                else:
+                    self.image_index.remove(candidate)
+        if duplicate_of_id is not None:
+            self.counters['duplicates'] += 1
+            return
+        candidate.found_car_id = found_car.id
+        self.counters['new'] += 1
+        self._job_stats(candidate.job)['new'] += 1
+        logger.info(f"  [NEW] Найдено новое объявление: {candidate.car.title[:50]}")
+        await (self.photo or self.notify).put(candidate)
+
+    async def _prepare_photo(self, candidate: Candidate) -> None:
+        """Загрузка и подготовка фото уведомления в локальный кэш"""
+        if candidate.outbox_id is not None and candidate.car.image_url:
+            try:
+                await image_cache.get(candidate.car.image_url)
+            except Exception as e:
+                # Без подготовленного фото уведомление отправится со ссылкой на фото
+                logger.warning(f"Не удалось подготовить фото {candidate.car.image_url}: {e}")
+        await self.notify.put(candidate)
+
+    async def _notify(self, candidate: Candidate) -> None:
+        """Отправка уведомления пользователю (сверх лимитов - в сводку, без паузы между уведомлениями)"""
+        if candidate.outbox_id is None:
+            return
+        user_filter = candidate.job.user_filter
+        sent = self._filter_notified.get(user_filter.id, 0)
+        if (0 < MAX_MATCHES_PER_FILTER_CYCLE <= sent
+                or (self.quota is not None and not self.quota.allow(user_filter.user_id))):
+            self.overflow.setdefault(user_filter.user_id, []).append(candidate)
+            self.counters['overflow'] += 1
+            return
+        self._filter_notified[user_filter.id] = sent + 1
+
+        if user_filter.user_id in self.digest_users:
+            # Режим подборки: объявления цикла отправляются вместе после завершения стадий
+            self.digest.setdefault(user_filter.user_id, []).append(candidate)
+            return
+        message_id = None
+        try:
+            await self.db_manager.start_outbox([candidate.outbox_id])
+            message_id = await send_notification(user_filter.user_id, candidate.car, found_car_id=candidate.found_car_id,
+                                                 payload=self._render(candidate.car))
+        finally:
+            # При любой ошибке запись возвращается в очередь с учтенной попыткой
+            await self._finish_outbox([candidate], [message_id])
+
+        # Небольшая задержка между уведомлениями
+        await asyncio.sleep(NOTIFY_DELAY_SECONDS)
+
+    async def _finish_outbox(self, candidates: List[Candidate], message_ids: List[Optional[int]],
+                             delivery: str = 'single') -> None:
+        """Записать результат отправки: отправленные - с ID сообщения, остальные - на повторную попытку"""
+        await finish_outbox(self.db_manager, [candidate.outbox_id for candidate in candidates], message_ids, delivery)
+
+    def _render(self, car: Listing) -> Optional[NotificationPayload]:
+        """Уведомление об объявлении (готовится один раз за цикл для всех получателей)"""
+        key = (car.source, str(car.ad_id))
+        if key not in self._rendered:
+            market = self.market_stats.estimate(car) if self.market_stats is not None else None
+            self._rendered[key] = render_notification(car, market)
+        return self._rendered[key]
+
+    async def _send_digests(self) -> None:
+        """Отправить пользователям в режиме подборки их новые объявления за цикл"""
+        for user_id, candidates in self.digest.items():
+            try:
+                message_ids: List[Optional[int]] = [None] * len(candidates)
+                delivery = 'single' if len(candidates) == 1 else 'group'
+                try:
+                    await self.db_manager.start_outbox([candidate.outbox_id for candidate in candidates])
+                    if len(candidates) == 1:
+                        # Одно объявление приходит обычным уведомлением (с кнопкой наблюдения)
+                        candidate = candidates[0]
+                        message_ids = [await send_notification(user_id, candidate.car, found_car_id=candidate.found_car_id,
+                                                               payload=self._render(candidate.car))]
+                    else:
+                        message_ids = await send_digest(user_id, [self._render(candidate.car) for candidate in candidates])
+                finally:
+                    await self._finish_outbox(candidates, message_ids, delivery)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке подборки пользователю {user_id}: {e}", exc_info=True)
+            await asyncio.sleep(NOTIFY_DELAY_SECONDS)
+        self.digest = {}
+
+    async def _send_overflow(self) -> None:
+        """Отправить каждому пользователю одну сводку объявлений сверх лимитов"""
+        for user_id, candidates in self.overflow.items():
+            try:
+                message_id = None
+                try:
+                    await self.db_manager.start_outbox([candidate.outbox_id for candidate in candidates])
+                    message_id = await send_overflow_summary(
+                        user_id, [(candidate.job.user_filter, candidate.car) for candidate in candidates]
+                    )
+                finally:
+                    await self._finish_outbox(candidates, [message_id] * len(candidates), 'group')
+            except Exception as e:
+                logger.error(f"Ошибка при отправке сводки пользователю {user_id}: {e}", exc_info=True)
+            await asyncio.sleep(NOTIFY_DELAY_SECONDS)
+        self.overflow = {}
@@ -0,0 +1,186 @@
+"""
+Отслеживание изменений цены объявлений
+
+Для каждого объявления (источник, ID) хранится компактное состояние: цены, хеш ключевых
+полей, время последнего просмотра и время снятия с продажи. Загруженное объявление сравнивается с состоянием в памяти
+по хешу, а в базу записываются только новые и изменившиеся объявления (и раз в
+SNAPSHOT_TOUCH_HOURS - отметка о просмотре), поэтому стоимость цикла зависит от числа изменений.
+"""
+# Стандартная библиотека
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# Локальные импорты
+from config import SNAPSHOT_TOUCH_HOURS, PRICE_CHANGE_MIN_PERCENT
+from database import AdSnapshot
+from parsers.listing import Listing
+
+
+class PriceChange(NamedTuple):
+    """Изменение цены объявления"""
+    car: Listing
+    old_price_usd: Optional[float]
+    old_price_byn: Optional[float]
+
+    @property
+    def prices(self) -> Tuple[Optional[float], Optional[float], str]:
+        """Старая и новая цена в валюте, известной в обоих состояниях: (старая, новая, валюта)"""
+        if self.car.price_usd and self.old_price_usd:
+            return self.old_price_usd, self.car.price_usd, 'USD'
+        return self.old_price_byn, self.car.price_byn, 'BYN'
+
+    @property
+    def is_drop(self) -> bool:
+        """Цена снизилась"""
+        old_price, new_price, _ = self.prices
+        return bool(old_price and new_price and new_price < old_price)
+
+
+class _State:
+    """Состояние объявления в памяти"""
+
+    __slots__ = ('state_hash', 'price_usd', 'price_byn', 'seen_at', 'saved_at', 'removed_at')
+
+    def __init__(self, state_hash: str, price_usd: Optional[float], price_byn: Optional[float],
+                 seen_at: datetime, removed_at: Optional[datetime] = None):
+        self.state_hash = state_hash
+        self.price_usd = price_usd
+        self.price_byn = price_byn
+        self.seen_at = seen_at
+        # Отметка о просмотре, записанная в базу
+        self.saved_at = seen_at
+        self.removed_at = removed_at
+
+
+def state_hash(car: Listing) -> str:
+    """Хеш полей, изменение которых означает, что объявление отредактировано"""
+    key = f"{car.price_usd}|{car.price_byn}|{car.mileage}|{car.year}|{car.title}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _changed(old: Optional[float], new: Optional[float]) -> bool:
+    """Цена изменилась заметно (колебания пересчета по курсу не считаются)"""
+    if not old or not new:
+        return False
+    return abs(new - old) / old * 100 >= PRICE_CHANGE_MIN_PERCENT
+
+
+def find_price_change(car: Listing, old_price_usd: Optional[float],
+                      old_price_byn: Optional[float]) -> Optional[PriceChange]:
+    """Изменение цены объявления относительно известной цены (None - цена не изменилась)"""
+    if _changed(old_price_usd, car.price_usd) or (
+            not (old_price_usd and car.price_usd) and _changed(old_price_byn, car.price_byn)):
+        return PriceChange(car, old_price_usd, old_price_byn)
+    return None
+
+
+class PriceTracker:
+    """Состояния объявлений источников и поиск изменений цены"""
+
+    def __init__(self):
+        self._states: Dict[Tuple[str, str], _State] = {}
+        # Объявления, состояние которых нужно записать в базу
+        self._dirty: Set[Tuple[str, str]] = set()
+
+    def load(self, snapshots: Iterable[AdSnapshot]) -> None:
+        """Загрузить сохраненные состояния"""
+        for snapshot in snapshots:
+            self._states[(snapshot.source, snapshot.ad_id)] = _State(
+                snapshot.state_hash, snapshot.price_usd, snapshot.price_byn, snapshot.last_seen_at,
+                snapshot.removed_at
+            )
+
+    def observe(self, car: Listing, now: Optional[datetime] = None) -> Optional[PriceChange]:
+        """
+        Сравнить объявление с сохраненным состоянием
+
+        Returns:
+            Изменение цены или None (новое объявление, цена не изменилась)
+        """
+        now = now or datetime.utcnow()
+        key = (car.source, str(car.ad_id))
+        current_hash = state_hash(car)
+        state = self._states.get(key)
+        if state is None:
+            self._states[key] = _State(current_hash, car.price_usd, car.price_byn, now)
+            self._dirty.add(key)
+            return None
+
+        state.seen_at = now
+        if state.removed_at is not None:
+            # Объявление снова в выдаче
+            state.removed_at = None
+            self._dirty.add(key)
+
+        if state.state_hash == current_hash:
+            # Без изменений: отметка о просмотре записывается не чаще раза в SNAPSHOT_TOUCH_HOURS
+            if now - state.saved_at >= timedelta(hours=SNAPSHOT_TOUCH_HOURS):
+                self._dirty.add(key)
+            return None
+
+        change = find_price_change(car, state.price_usd, state.price_byn)
+        state.state_hash = current_hash
+        state.price_usd = car.price_usd
+        state.price_byn = car.price_byn
+        self._dirty.add(key)
+        return change
+
+    def mark_removed(self, source: str, ad_ids: Iterable[str], now: Optional[datetime] = None) -> List[str]:
+        """
+        Отметить объявления снятыми с продажи
+
+        Returns:
+            ID объявлений, которые отмечены впервые
+        """
+        now = now or datetime.utcnow()
+        removed = []
+        for ad_id in ad_ids:
+            key = (source, ad_id)
+            state = self._states.get(key)
+            if state is None or state.removed_at is not None:
+                continue
+            state.removed_at = now
+            self._dirty.add(key)
+            removed.append(ad_id)
+        return removed
+
+    def pop_dirty(self) -> List[Dict]:
+        """Состояния для записи в базу (после вызова считаются записанными)"""
+        rows = []
+        for source, ad_id in self._dirty:
+            state = self._states.get((source, ad_id))
+            if state is None:
+                continue
+            rows.append({
+                'source': source,
+                'ad_id': ad_id,
+                'price_usd': state.price_usd,
+                'price_byn': state.price_byn,
+                'state_hash': state.state_hash,
+                'last_seen_at': state.seen_at,
+                'removed_at': state.removed_at,
+            })
+            state.saved_at = state.seen_at
+        self._dirty = set()
+        return rows
+
+    def set_prices(self, source: str, ad_id: str, price_usd: Optional[float], price_byn: Optional[float]) -> None:
+        """Запомнить цену, узнанную не из выдачи (со страницы объявления), чтобы не уведомлять о ней повторно"""
+        state = self._states.get((source, ad_id))
+        if state is None:
+            return
+        state.price_usd = price_usd
+        state.price_byn = price_byn
+        self._dirty.add((source, ad_id))
+
+    def forget_before(self, seen_before: datetime) -> None:
+        """Забыть объявления, которые давно не встречались"""
+        for key in [key for key, state in self._states.items() if state.seen_at < seen_before]:
+            del self._states[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._states
+
+    def __len__(self) -> int:
+        return len(self._states)
@@ -0,0 +1,69 @@
+"""
+Ограничения нагрузки от одного пользователя
+
+Несколько пользователей с десятками широких фильтров не должны занимать весь цикл проверки
+и очередь уведомлений: число проверяемых фильтров пользователя ограничено, а уведомления
+сверх часового лимита и лимита на фильтр за цикл собираются в одну сводку.
+"""
+# Стандартная библиотека
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+# Локальные импорты
+from database import UserFilter
+
+# Окно часового лимита уведомлений (секунды)
+_WINDOW_SECONDS = 3600
+
+
+def limit_active_filters(filters: List[UserFilter], max_per_user: int) -> List[UserFilter]:
+    """
+    Оставить не более max_per_user фильтров каждого пользователя (самые старые, 0 - без ограничения)
+
+    Returns:
+        Фильтры в исходном порядке
+    """
+    if max_per_user <= 0:
+        return filters
+    allowed = set()
+    counts: Dict[int, int] = {}
+    for user_filter in sorted(filters, key=lambda f: f.id):
+        count = counts.get(user_filter.user_id, 0)
+        if count < max_per_user:
+            allowed.add(user_filter.id)
+            counts[user_filter.user_id] = count + 1
+    return [user_filter for user_filter in filters if user_filter.id in allowed]
+
+
+class NotificationQuota:
+    """Часовой лимит уведомлений пользователя (скользящее окно)"""
+
+    def __init__(self, per_hour: int):
+        """
+        Args:
+            per_hour: Сколько уведомлений пользователь получает за час (0 - без ограничения)
+        """
+        self.per_hour = per_hour
+        # ID пользователя -> время отправленных за последний час уведомлений
+        self._sent: Dict[int, Deque[float]] = {}
+
+    def allow(self, user_id: int, now: Optional[float] = None) -> bool:
+        """Можно ли отправить уведомление (если да - оно учитывается в лимите)"""
+        if self.per_hour <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        sent = self._sent.setdefault(user_id, deque())
+        while sent and now - sent[0] >= _WINDOW_SECONDS:
+            sent.popleft()
+        if len(sent) >= self.per_hour:
+            return False
+        sent.append(now)
+        return True
+
+    def forget_idle(self, now: Optional[float] = None) -> None:
+        """Забыть пользователей без уведомлений за последний час"""
+        now = time.monotonic() if now is None else now
+        for user_id in [user_id for user_id, sent in self._sent.items()
+                        if not sent or now - sent[-1] >= _WINDOW_SECONDS]:
+            del self._sent[user_id]
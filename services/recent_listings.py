@@ -0,0 +1,44 @@
+"""
+Кольцевой буфер последних объявлений по источникам
+"""
+# Стандартная библиотека
+from collections import OrderedDict
+from typing import Dict, List
+
+# Локальные импорты
+from parsers.listing import Listing
+
+
+class RecentListings:
+    """
+    Последние N объявлений каждого источника в памяти
+
+    Заполняется при обычных проверках, а новые и измененные фильтры сопоставляются
+    с ним сразу после сохранения, без дополнительных запросов к сайтам.
+    """
+
+    def __init__(self, max_per_source: int):
+        self.max_per_source = max_per_source
+        self._buffers: Dict[str, 'OrderedDict[str, Listing]'] = {}
+
+    def add(self, car: Listing) -> None:
+        """Добавить объявление (повторно увиденное переносится в конец как самое свежее)"""
+        buffer = self._buffers.get(car.source)
+        if buffer is None:
+            buffer = self._buffers[car.source] = OrderedDict()
+        key = str(car.ad_id)
+        if key in buffer:
+            buffer.move_to_end(key)
+        buffer[key] = car
+        if len(buffer) > self.max_per_source:
+            buffer.popitem(last=False)
+
+    def latest(self, source: str) -> List[Listing]:
+        """Объявления источника, начиная с самых свежих"""
+        buffer = self._buffers.get(source)
+        if not buffer:
+            return []
+        return list(reversed(buffer.values()))
+
+    def __len__(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers.values())
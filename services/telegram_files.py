@@ -0,0 +1,81 @@
+"""
+Кэш file_id фото, уже загруженных в Telegram
+
+При отправке фото по ссылке Telegram сам загружает его с сайта объявления - медленно,
+а защищенные от прямых ссылок CDN часто отказывают. После первой отправки Telegram
+возвращает file_id загруженного фото: следующие получатели получают фото по file_id
+без повторной загрузки. Соответствие ссылка -> file_id хранится в базе и в памяти (LRU).
+"""
+# Стандартная библиотека
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Локальные импорты
+from db_manager import DBManager
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramFileCache:
+    """Ссылки на фото -> file_id в Telegram"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._file_ids: 'OrderedDict[str, str]' = OrderedDict()
+        # Блокировки по ссылке: одно фото загружается в Telegram один раз, даже при параллельной отправке
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _remember(self, url: str, file_id: str) -> None:
+        self._file_ids[url] = file_id
+        self._file_ids.move_to_end(url)
+        if len(self._file_ids) > self.max_size:
+            self._file_ids.popitem(last=False)
+
+    def lock(self, url: str) -> asyncio.Lock:
+        """Блокировка на время первой отправки фото"""
+        lock = self._locks.get(url)
+        if lock is None:
+            lock = self._locks[url] = asyncio.Lock()
+        return lock
+
+    def release(self, url: str) -> None:
+        """Удалить блокировку, которую никто не ждет"""
+        lock = self._locks.get(url)
+        if lock is not None and not lock.locked():
+            del self._locks[url]
+
+    async def get(self, url: str) -> Optional[str]:
+        """file_id фото (None - фото еще не загружалось)"""
+        file_id = self._file_ids.get(url)
+        if file_id is not None:
+            self._file_ids.move_to_end(url)
+            return file_id
+        try:
+            file_id = await DBManager.get_telegram_file_id(url)
+        except Exception as e:
+            logger.warning(f"Не удалось получить file_id фото из базы: {e}")
+            return None
+        if file_id is not None:
+            self._remember(url, file_id)
+        return file_id
+
+    async def put(self, url: str, file_id: str) -> None:
+        """Запомнить file_id загруженного фото"""
+        self._remember(url, file_id)
+        try:
+            await DBManager.save_telegram_file_id(url, file_id)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить file_id фото: {e}")
+
+    async def forget(self, url: str) -> None:
+        """Забыть file_id, который Telegram не принял"""
+        self._file_ids.pop(url, None)
+        try:
+            await DBManager.delete_telegram_file(url)
+        except Exception as e:
+            logger.warning(f"Не удалось удалить file_id фото: {e}")
+
+    def __len__(self) -> int:
+        return len(self._file_ids)
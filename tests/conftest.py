@@ -0,0 +1,42 @@
+"""
+Общие настройки тестов
+"""
+# Стандартная библиотека
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Сторонние библиотеки
+import pytest
+
+# Конфигурация требует токен бота при импорте; к Telegram тесты не обращаются
+os.environ.setdefault('BOT_TOKEN', '123456:TEST-TOKEN-FOR-OFFLINE-TESTS')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def run_db(tmp_path, monkeypatch):
+    """
+    Запуск корутины с пустой базой во временном каталоге
+
+    База, сессии и корутина работают в одном event loop, после теста соединения закрываются.
+    """
+    import db_manager
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    # Путь к базе проекта фиксируется при создании engine, поэтому тестам нужен свой engine
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", echo=False)
+    monkeypatch.setattr(db_manager, 'engine', engine)
+    monkeypatch.setattr(db_manager, 'async_session',
+                        async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+
+    def run(test):
+        async def main():
+            await db_manager.init_db()
+            try:
+                return await test()
+            finally:
+                await engine.dispose()
+        return asyncio.run(main())
+    return run
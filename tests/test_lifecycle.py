@@ -0,0 +1,37 @@
+"""
+Тесты поиска снятых с продажи объявлений по выдаче
+"""
+# Локальные импорты
+from services.lifecycle import disappeared
+
+
+def test_first_check_finds_nothing():
+    assert disappeared([], ['a', 'b']) == []
+
+
+def test_unchanged_window():
+    assert disappeared(['a', 'b', 'c'], ['a', 'b', 'c']) == []
+
+
+def test_missing_inside_window_is_removed():
+    assert disappeared(['a', 'b', 'c', 'd'], ['a', 'c', 'd']) == ['b']
+
+
+def test_pushed_out_by_new_listings_is_not_removed():
+    # Два новых объявления сдвинули два последних за пределы окна
+    assert disappeared(['a', 'b', 'c', 'd'], ['x', 'y', 'a', 'b']) == []
+
+
+def test_removed_above_new_listings():
+    # 'b' пропало, а новых объявлений выше одно: 'c' и 'd' остались бы в окне
+    assert disappeared(['a', 'b', 'c', 'd'], ['x', 'a', 'c', 'd']) == ['b']
+
+
+def test_shorter_page_does_not_flag_tail():
+    # Загружено меньше объявлений, чем в прошлый раз: хвост не сравнивается
+    assert disappeared(['a', 'b', 'c', 'd', 'e'], ['a', 'b']) == []
+
+
+def test_several_removed_shift_the_rest_up():
+    # Пропавшие выше объявления освобождают место: 'd' и 'e' должны были остаться в окне
+    assert disappeared(['a', 'b', 'c', 'd', 'e'], ['a', 'c', 'e']) == ['b', 'd']
@@ -0,0 +1,169 @@
+"""
+Тесты очереди уведомлений: выбор записей на отправку и запись результата
+"""
+# Стандартная библиотека
+from datetime import datetime, timedelta
+
+# Сторонние библиотеки
+from sqlalchemy import select, update
+
+# Локальные импорты
+from database import FoundCar, NotificationOutbox
+import db_manager
+from db_manager import DBManager
+from parsers.listing import Listing
+from services.notifications import UNDELIVERABLE
+from services.outbox import finish_outbox
+
+SOURCES = ['kufar.by']
+
+
+async def add_outbox_entry(ad_id: int) -> int:
+    """Объявление с уведомлением в очереди, как его сохраняет конвейер (ID записи очереди)"""
+    user_filter = await DBManager.add_user_filter(1, brand='BMW')
+    car = Listing('kufar.by', str(ad_id), title=f'BMW X{ad_id}', brand='BMW', url=f'https://auto.kufar.by/vi/{ad_id}')
+    found_car = await DBManager.add_found_car(
+        filter_id=user_filter.id, user_id=1, notified=False,
+        notification={'text': 'text', 'photo': None, 'title': car.title, 'summary': 'summary'},
+        **car.db_fields()
+    )
+    return found_car.outbox[0].id
+
+
+async def get_entry(outbox_id: int) -> NotificationOutbox:
+    async with db_manager.async_session() as session:
+        return await session.get(NotificationOutbox, outbox_id)
+
+
+async def set_values(outbox_id: int, **values) -> None:
+    async with db_manager.async_session() as session:
+        await session.execute(update(NotificationOutbox).where(NotificationOutbox.id == outbox_id).values(**values))
+        await session.commit()
+
+
+async def claim(recover_until_id: int = 0, claimed_before: datetime = None, stale_before: datetime = None):
+    """ID записей, которые забирает обработчик очереди"""
+    now = datetime.utcnow()
+    entries = await DBManager.claim_outbox(
+        SOURCES, recover_until_id, claimed_before or now, stale_before or now - timedelta(minutes=30), 50
+    )
+    return [entry.id for entry in entries]
+
+
+def test_fresh_pipeline_entry_is_not_claimed(run_db):
+    async def test():
+        outbox_id = await add_outbox_entry(1)
+        # Запись создана после запуска и еще в работе у конвейера
+        assert await claim() == []
+        entry = await get_entry(outbox_id)
+        assert (entry.status, entry.attempts) == ('pending', 0)
+    run_db(test)
+
+
+def test_stranded_pending_entry_is_claimed_after_lease(run_db):
+    async def test():
+        outbox_id = await add_outbox_entry(1)
+        # Конвейер упал до отправки: attempts=0, ID больше границы запуска
+        await set_values(outbox_id, created_at=datetime.utcnow() - timedelta(hours=1))
+        assert await claim() == [outbox_id]
+        entry = await get_entry(outbox_id)
+        assert entry.status == 'sending'
+        assert entry.claimed_at is not None
+    run_db(test)
+
+
+def test_stranded_sending_entry_is_claimed_after_lease(run_db):
+    async def test():
+        outbox_id = await add_outbox_entry(1)
+        await DBManager.start_outbox([outbox_id])
+        assert await claim() == []
+        await set_values(outbox_id, claimed_at=datetime.utcnow() - timedelta(hours=1))
+        assert await claim() == [outbox_id]
+    run_db(test)
+
+
+def test_entries_before_start_are_recovered(run_db):
+    async def test():
+        pending_id = await add_outbox_entry(1)
+        sending_id = await add_outbox_entry(2)
+        await DBManager.start_outbox([sending_id])
+        recover_until_id = await DBManager.get_last_outbox_id()
+        assert await claim(recover_until_id) == [pending_id, sending_id]
+    run_db(test)
+
+
+def test_claimed_entry_is_not_taken_twice_in_one_run(run_db):
+    async def test():
+        outbox_id = await add_outbox_entry(1)
+        started = datetime.utcnow()
+        assert await claim(outbox_id, claimed_before=started) == [outbox_id]
+        await finish_outbox(DBManager, [outbox_id], [None])
+        # Повторная попытка - только в следующем запуске
+        assert await claim(outbox_id, claimed_before=started) == []
+        assert await claim(outbox_id, claimed_before=datetime.utcnow() + timedelta(seconds=1)) == [outbox_id]
+    run_db(test)
+
+
+def test_sent_entry_is_completed(run_db):
+    async def test():
+        outbox_id = await add_outbox_entry(1)
+        await DBManager.start_outbox([outbox_id])
+        await finish_outbox(DBManager, [outbox_id], [101])
+        entry = await get_entry(outbox_id)
+        assert (entry.status, entry.message_id, entry.delivery) == ('sent', 101, 'single')
+        assert entry.sent_at is not None
+        async with db_manager.async_session() as session:
+            found_car = await session.get(FoundCar, entry.found_car_id)
+        assert found_car.notified
+        # Отправленная запись больше не забирается
+        assert await claim(outbox_id, stale_before=datetime.utcnow() + timedelta(hours=1)) == []
+    run_db(test)
+
+
+def test_failed_entry_is_retried_until_max_attempts(run_db):
+    async def test():
+        outbox_id = await add_outbox_entry(1)
+        await DBManager.start_outbox([outbox_id])
+        await finish_outbox(DBManager, [outbox_id], [None])
+        entry = await get_entry(outbox_id)
+        assert (entry.status, entry.attempts) == ('pending', 1)
+        # Повторная попытка забирается сразу, без ожидания срока
+        assert await claim() == [outbox_id]
+
+        from services.outbox import OUTBOX_MAX_ATTEMPTS
+        for _ in range(OUTBOX_MAX_ATTEMPTS - 1):
+            await finish_outbox(DBManager, [outbox_id], [None])
+        entry = await get_entry(outbox_id)
+        assert (entry.status, entry.attempts) == ('failed', OUTBOX_MAX_ATTEMPTS)
+        assert await claim(stale_before=datetime.utcnow() + timedelta(hours=1)) == []
+    run_db(test)
+
+
+def test_undeliverable_entry_fails_at_once(run_db):
+    async def test():
+        outbox_id = await add_outbox_entry(1)
+        await DBManager.start_outbox([outbox_id])
+        await finish_outbox(DBManager, [outbox_id], [UNDELIVERABLE])
+        entry = await get_entry(outbox_id)
+        assert (entry.status, entry.attempts) == ('failed', 1)
+        assert entry.message_id is None
+    run_db(test)
+
+
+def test_mixed_results_of_one_digest(run_db):
+    async def test():
+        ids = [await add_outbox_entry(ad_id) for ad_id in range(3)]
+        await DBManager.start_outbox(ids)
+        await finish_outbox(DBManager, ids, [201, None, UNDELIVERABLE], 'group')
+        entries = [await get_entry(outbox_id) for outbox_id in ids]
+        assert [(entry.status, entry.attempts) for entry in entries] == [('sent', 0), ('pending', 1), ('failed', 1)]
+        assert entries[0].delivery == 'group'
+    run_db(test)
+
+
+def test_entry_with_message_id_is_not_resent(run_db):
+    async def test():
+        outbox_id = await add_outbox_entry(1)
+        await set_values(outbox_id, status='sending', message_id=301)
+        assert await claim(outbox_id, stale_before=datetime.utcnow() + timedelta(hours=1)) == []
+    run_db(test)
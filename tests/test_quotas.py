@@ -0,0 +1,63 @@
+"""
+Тесты ограничений на пользователя
+"""
+# Стандартная библиотека
+from types import SimpleNamespace
+
+# Локальные импорты
+from services.quotas import NotificationQuota, limit_active_filters
+
+
+def make_filter(filter_id: int, user_id: int) -> SimpleNamespace:
+    return SimpleNamespace(id=filter_id, user_id=user_id)
+
+
+def test_limit_keeps_oldest_filters_in_order():
+    filters = [make_filter(5, 1), make_filter(2, 1), make_filter(3, 2), make_filter(1, 1)]
+    allowed = limit_active_filters(filters, 2)
+    assert [f.id for f in allowed] == [2, 3, 1]
+
+
+def test_zero_limit_keeps_all_filters():
+    filters = [make_filter(filter_id, 1) for filter_id in range(20)]
+    assert limit_active_filters(filters, 0) == filters
+
+
+def test_quota_denies_over_hourly_limit():
+    quota = NotificationQuota(2)
+    assert quota.allow(1, now=0)
+    assert quota.allow(1, now=10)
+    assert not quota.allow(1, now=20)
+    # Лимит у каждого пользователя свой
+    assert quota.allow(2, now=20)
+
+
+def test_quota_window_slides():
+    quota = NotificationQuota(2)
+    assert quota.allow(1, now=0)
+    assert quota.allow(1, now=1800)
+    assert not quota.allow(1, now=3599)
+    # Первое уведомление вышло из окна
+    assert quota.allow(1, now=3600)
+    assert not quota.allow(1, now=3601)
+
+
+def test_denied_notifications_do_not_count():
+    quota = NotificationQuota(1)
+    assert quota.allow(1, now=0)
+    for now in range(1, 100):
+        assert not quota.allow(1, now=now)
+    assert quota.allow(1, now=3600)
+
+
+def test_zero_quota_is_unlimited():
+    quota = NotificationQuota(0)
+    assert all(quota.allow(1, now=0) for _ in range(1000))
+
+
+def test_forget_idle_users():
+    quota = NotificationQuota(5)
+    quota.allow(1, now=0)
+    quota.allow(2, now=3000)
+    quota.forget_idle(now=3600)
+    assert list(quota._sent) == [2]
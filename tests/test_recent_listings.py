@@ -0,0 +1,48 @@
+"""
+Тесты кольцевого буфера последних объявлений
+"""
+# Локальные импорты
+from parsers.listing import Listing
+from services.recent_listings import RecentListings
+
+
+def make_listing(ad_id: int, source: str = 'kufar.by', price_usd: float = 1000) -> Listing:
+    return Listing(source, str(ad_id), title=f'BMW X{ad_id}', price_usd=price_usd)
+
+
+def test_latest_first():
+    recent = RecentListings(5)
+    for ad_id in range(3):
+        recent.add(make_listing(ad_id))
+    assert [car.ad_id for car in recent.latest('kufar.by')] == ['2', '1', '0']
+
+
+def test_wraparound_drops_oldest():
+    recent = RecentListings(3)
+    for ad_id in range(7):
+        recent.add(make_listing(ad_id))
+    assert [car.ad_id for car in recent.latest('kufar.by')] == ['6', '5', '4']
+    assert len(recent) == 3
+
+
+def test_seen_again_becomes_newest():
+    recent = RecentListings(3)
+    for ad_id in range(3):
+        recent.add(make_listing(ad_id))
+    recent.add(make_listing(0, price_usd=900))
+    recent.add(make_listing(3))
+    # Повторно увиденное объявление не вытесняется и хранится в последней версии
+    latest = recent.latest('kufar.by')
+    assert [car.ad_id for car in latest] == ['3', '0', '2']
+    assert latest[1].price_usd == 900
+
+
+def test_sources_have_separate_buffers():
+    recent = RecentListings(2)
+    for ad_id in range(3):
+        recent.add(make_listing(ad_id, source='kufar.by'))
+    recent.add(make_listing(10, source='av.by'))
+    assert [car.ad_id for car in recent.latest('kufar.by')] == ['2', '1']
+    assert [car.ad_id for car in recent.latest('av.by')] == ['10']
+    assert recent.latest('abw.by') == []
+    assert len(recent) == 3
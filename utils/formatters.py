@@ -1,9 +1,20 @@
 """
 Утилиты для форматирования текста
 """
+# Стандартная библиотека
+from datetime import datetime
+from typing import List, Optional
+
 # Локальные импорты
 from config import BODY_TYPES
-from database import UserFilter
+from database import UserFilter, FilterSourceStats, FoundCar, AdSnapshot, WatchedAd
+from utils.source_stats import source_state, SOURCE_ACTIVE, SOURCE_PRUNED, SOURCE_PROBE
+
+SOURCE_STATE_TITLES = {
+    SOURCE_ACTIVE: "✅ проверяется",
+    SOURCE_PRUNED: "⏸ пропускается",
+    SOURCE_PROBE: "🔁 повторная проверка",
+}
 
 
 def format_filter_text(f: UserFilter) -> str:
@@ -54,8 +65,80 @@ def format_filter_text(f: UserFilter) -> str:
     else:
         text += "🚙 Кузов: любой\n"
     
+    # Возраст объявлений
+    if f.max_age_days:
+        text += f"🕒 Не старше {f.max_age_days} дн. с публикации\n"
+    
+    # Режим "только ниже рынка"
+    if f.below_market_only:
+        text += "📊 Только дешевле рыночной медианы\n"
+    
     # Статус
     status = "✅ Активен" if f.is_active else "❌ Неактивен"
     text += f"\n{status}"
     
     return text
+
+
+def format_source_stats_text(f: UserFilter, stats_list: List[FilterSourceStats], now: datetime) -> str:
+    """Форматирование решений по источникам фильтра (для администраторов)"""
+    brand = f.brand or "любая"
+    model = f.model or "любая"
+    text = f"🔍 <b>Фильтр #{f.id}</b> ({brand} {model}, пользователь {f.user_id})\n"
+    if not stats_list:
+        return text + "   нет данных о проверках\n"
+    
+    for stats in sorted(stats_list, key=lambda s: s.source):
+        checks = stats.checks_count or 0
+        avg_seconds = (stats.total_fetch_seconds or 0.0) / checks if checks else 0.0
+        text += (
+            f"• {stats.source}: {SOURCE_STATE_TITLES[source_state(stats, now)]}\n"
+            f"   проверок {checks}, в среднем {avg_seconds:.1f} с, "
+            f"совпадений {stats.matched_total or 0}, новых {stats.new_total or 0}, "
+            f"без совпадений подряд {stats.zero_streak or 0}\n"
+        )
+    return text
+
+
+def format_ad_status_text(car: FoundCar, snapshot: Optional[AdSnapshot]) -> str:
+    """Форматирование состояния объявления (в продаже или снято)"""
+    text = f"🚗 <b>{car.title}</b> ({car.source})\n\n"
+    if snapshot is None:
+        return text + "❔ Объявление давно не встречалось в выдаче, состояние неизвестно"
+    
+    last_seen = snapshot.last_seen_at.strftime('%d.%m.%Y %H:%M')
+    if snapshot.removed_at is not None:
+        text += f"❌ Пропало из выдачи {snapshot.removed_at.strftime('%d.%m.%Y %H:%M')} (UTC), вероятно продано или снято\n"
+    else:
+        text += "✅ Объявление в продаже\n"
+    text += f"👁 Последний раз в выдаче: {last_seen} (UTC)"
+    return text
+
+
+def format_watchlist_text(watched_ads: List[WatchedAd]) -> str:
+    """Форматирование списка наблюдения"""
+    text = f"👁 <b>Список наблюдения</b> ({len(watched_ads)}):\n\n"
+    for number, watched_ad in enumerate(watched_ads, 1):
+        text += f"{number}. <a href='{watched_ad.url}'>{watched_ad.title}</a> ({watched_ad.source})\n"
+        if watched_ad.removed_at is not None:
+            text += f"   ❌ Снято с продажи {watched_ad.removed_at.strftime('%d.%m.%Y')}\n"
+        elif watched_ad.price_usd:
+            text += f"   💰 ${watched_ad.price_usd:,.0f}\n".replace(',', ' ')
+        elif watched_ad.price_byn:
+            text += f"   💰 {watched_ad.price_byn:,.0f} BYN\n".replace(',', ' ')
+    return text
+
+
+def format_digest_mode_text(enabled: bool) -> str:
+    """Описание режима подборки"""
+    if enabled:
+        return (
+            "📚 <b>Режим подборки включен</b>\n\n"
+            "Новые объявления за цикл проверки приходят вместе: фото - альбомами, "
+            "объявления без фото - одним списком."
+        )
+    return (
+        "📨 <b>Режим подборки выключен</b>\n\n"
+        "Каждое новое объявление приходит отдельным сообщением. "
+        "В режиме подборки объявления за цикл проверки приходят вместе - альбомами и списком."
+    )
@@ -0,0 +1,200 @@
+"""
+Подготовка текста уведомлений о найденных объявлениях
+
+Текст уведомления не зависит от получателя, поэтому объявление, подошедшее нескольким
+пользователям, готовится один раз за цикл, а отправка только подставляет получателя и кнопки.
+Модуль не обращается к Telegram и не требует настроек бота (используется в benchmark.py).
+"""
+# Стандартная библиотека
+import logging
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+# Локальные импорты
+from parsers.base_parser import EXCHANGE_RATE
+from parsers.listing import Listing
+
+if TYPE_CHECKING:
+    from services.market_stats import MarketEstimate
+
+logger = logging.getLogger(__name__)
+
+# Адрес сайта для относительных ссылок: (признак источника, домен)
+SOURCE_DOMAINS = (
+    ('av.by', 'https://av.by'),
+    ('kufar', 'https://kufar.by'),
+    ('onliner', 'https://ab.onliner.by'),
+    ('abw', 'https://abw.by'),
+)
+
+
+class NotificationPayload(NamedTuple):
+    """Готовое уведомление, общее для всех получателей"""
+    text: str  # HTML-текст (подпись к фото, если фото есть)
+    photo: Optional[str]  # Ссылка на фото
+    title: str  # Заголовок для логов
+    summary: str  # Краткое описание для подборки (HTML, несколько строк)
+
+
+def _format_price(value: float, currency: str) -> str:
+    if currency == 'USD':
+        return f"<b>${value:,.0f}</b>".replace(',', ' ')
+    return f"<b>{value:,.0f} BYN</b>".replace(',', ' ')
+
+
+def _normalize_prices(car_data: Listing):
+    """Цены объявления для показа: проверка на разумность и пересчет по курсу"""
+    price_usd = None
+    price_byn = None
+    if car_data.price_usd:
+        try:
+            price_usd = float(car_data.price_usd)
+            # Проверка на разумность: если цена больше 1 миллиона USD, вероятно ошибка парсинга
+            if price_usd > 1000000:
+                logger.warning(f"Подозрительно большая цена USD: {price_usd}, пропускаем")
+                price_usd = None
+        except (ValueError, TypeError):
+            pass
+
+    if car_data.price_byn:
+        try:
+            price_byn = float(car_data.price_byn)
+            # Проверка на разумность: если цена больше 10 миллионов BYN, вероятно ошибка парсинга
+            if price_byn > 10000000:
+                logger.warning(f"Подозрительно большая цена BYN: {price_byn}, пропускаем")
+                price_byn = None
+        except (ValueError, TypeError):
+            pass
+
+    # Проверка соответствия цен, если обе есть (курс тот же, что у парсеров)
+    if price_usd and price_byn:
+        expected_byn = price_usd * EXCHANGE_RATE
+        expected_usd = price_byn / EXCHANGE_RATE
+        # Если разница больше 15%, вероятно ошибка парсинга
+        usd_diff = abs(price_usd - expected_usd) / max(price_usd, 1)
+        byn_diff = abs(price_byn - expected_byn) / max(expected_byn, 1)
+
+        if byn_diff > 0.15 or usd_diff > 0.15:
+            logger.warning(f"Несоответствие цен в уведомлении: USD={price_usd}, BYN={price_byn}, ожидалось BYN={expected_byn:.0f}, USD={expected_usd:.0f}")
+            # Исправляем цену, используя более точную
+            if usd_diff < byn_diff:
+                price_byn = round(price_usd * EXCHANGE_RATE, 0)
+            else:
+                price_usd = round(price_byn / EXCHANGE_RATE, 0)
+
+    # Конвертация валют, если одна из цен отсутствует
+    if price_usd and not price_byn:
+        price_byn = round(price_usd * EXCHANGE_RATE, 0)
+    elif price_byn and not price_usd:
+        price_usd = round(price_byn / EXCHANGE_RATE, 0)
+    return price_usd, price_byn
+
+
+def _full_url(url: str, source: str) -> str:
+    """Полный URL объявления (относительный путь дополняется доменом источника)"""
+    if not url or url.startswith('http'):
+        return url
+    for marker, domain in SOURCE_DOMAINS:
+        if marker in source or marker in url:
+            return f"{domain}{url}" if url.startswith('/') else f"{domain}/{url}"
+    return url
+
+
+def render_notification(car_data: Listing, market: Optional['MarketEstimate'] = None) -> Optional[NotificationPayload]:
+    """
+    Подготовить уведомление о найденном автомобиле
+
+    Args:
+        market: Положение цены среди похожих объявлений (None - статистики недостаточно)
+
+    Returns:
+        Уведомление или None (у объявления нет заголовка или правильной ссылки)
+    """
+    logger.debug(f"Подготовка уведомления: title={car_data.title}, year={car_data.year}, mileage={car_data.mileage}, engine_volume={car_data.engine_volume}, city={car_data.city}, transmission={car_data.transmission}, engine_type={car_data.engine_type}, body_type={car_data.body_type}, source={car_data.source}")
+
+    # Проверяем, что есть минимальные данные для отправки
+    title = (car_data.title or '').strip()
+    if not title or len(title) < 3:
+        logger.warning(f"Пропущено уведомление: нет заголовка или заголовок слишком короткий (title: '{title}')")
+        return None
+
+    url = (car_data.url or '').strip()
+    if not url or url == 'https://abw.by/cars' or 'filter' in url.lower():
+        logger.warning(f"Пропущено уведомление: неправильный URL - {url}")
+        return None
+
+    text = "🚗 <b>Новое объявление!</b>\n\n"
+
+    # Используем полный заголовок, если он информативнее, чем марка + модель
+    car_name = f"{(car_data.brand or '').strip()} {(car_data.model or '').strip()}".strip()
+    if len(title) > len(car_name) or not car_name:
+        text += f"<b>{title}</b>\n\n"
+    else:
+        text += f"<b>{car_name}</b>\n\n"
+
+    # Формируем список характеристик
+    details = []
+    if car_data.year:
+        details.append(f"📅 Год: {car_data.year}")
+    if car_data.mileage:
+        mileage = car_data.mileage
+        if isinstance(mileage, (int, float)):
+            # Форматируем пробег с разделителями тысяч (пробелы вместо запятых)
+            details.append(f"🛣️ Пробег: {int(mileage):,} км".replace(',', ' '))
+        else:
+            details.append(f"🛣️ Пробег: {mileage} км")
+    if car_data.engine_volume:
+        volume = car_data.engine_volume
+        if isinstance(volume, (int, float)):
+            details.append(f"⚙️ Объем: {volume} л")
+        else:
+            details.append(f"⚙️ Объем: {volume}")
+    if car_data.city:
+        details.append(f"📍 Город: {car_data.city}")
+    if car_data.transmission:
+        details.append(f"🔧 Коробка: {car_data.transmission}")
+    if car_data.engine_type:
+        details.append(f"⛽ Двигатель: {car_data.engine_type}")
+    if car_data.body_type:
+        details.append(f"🚙 Тип кузова: {car_data.body_type}")
+    if details:
+        text += "\n".join(details) + "\n"
+    text += "\n"
+
+    # Цена (пробелы как разделители тысяч для читаемости)
+    price_usd, price_byn = _normalize_prices(car_data)
+    price_parts = []
+    if price_usd and price_usd < 1000000:
+        price_parts.append(_format_price(price_usd, 'USD'))
+    if price_byn and price_byn < 10000000:
+        price_parts.append(_format_price(price_byn, 'BYN'))
+    if price_parts:
+        text += f"💰 {' / '.join(price_parts)}\n\n"
+    else:
+        text += "\n"
+
+    # Оценка цены относительно похожих объявлений (марка, модель, близкие годы)
+    if market is not None:
+        median = f"${market.median:,.0f}".replace(',', ' ')
+        if market.below_median:
+            text += f"🔥 Дешевле, чем {100 - market.percentile:.0f}% похожих объявлений (медиана {median})\n\n"
+        else:
+            text += f"📊 Дороже, чем {market.percentile:.0f}% похожих объявлений (медиана {median})\n\n"
+
+    full_url = _full_url(url, car_data.source or '')
+    text += f"🔗 <a href='{full_url}'>Открыть объявление</a>"
+
+    # Краткое описание для подборки: заголовок, год, пробег, цена и ссылка
+    short_details = []
+    if car_data.year:
+        short_details.append(str(car_data.year))
+    if isinstance(car_data.mileage, (int, float)) and car_data.mileage:
+        short_details.append(f"{int(car_data.mileage):,} км".replace(',', ' '))
+    if price_parts:
+        short_details.append(' / '.join(price_parts))
+    summary = f"🚗 <b>{title[:80]}</b>\n"
+    if short_details:
+        summary += " · ".join(short_details) + "\n"
+    if market is not None and market.below_median:
+        summary += f"🔥 Дешевле {100 - market.percentile:.0f}% похожих\n"
+    summary += f"🔗 <a href='{full_url}'>Открыть объявление</a>"
+    return NotificationPayload(text, car_data.image_url or None, title, summary)
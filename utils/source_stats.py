@@ -0,0 +1,29 @@
+"""
+Решения об отключении источников по статистике их отдачи
+"""
+# Стандартная библиотека
+from datetime import datetime, timedelta
+from typing import Optional
+
+# Локальные импорты
+from config import SOURCE_PRUNE_ZERO_STREAK, SOURCE_REPROBE_HOURS
+from database import FilterSourceStats
+
+SOURCE_ACTIVE = 'active'
+SOURCE_PRUNED = 'pruned'
+SOURCE_PROBE = 'probe'
+
+
+def source_state(stats: Optional[FilterSourceStats], now: datetime) -> str:
+    """
+    Состояние пары (фильтр, источник)
+    
+    active - проверяется в каждом цикле,
+    pruned - долго не давала совпадений и пропускается,
+    probe - пропускается, но пора проверить ее повторно
+    """
+    if stats is None or (stats.zero_streak or 0) < SOURCE_PRUNE_ZERO_STREAK:
+        return SOURCE_ACTIVE
+    if stats.last_checked_at is None or now - stats.last_checked_at >= timedelta(hours=SOURCE_REPROBE_HOURS):
+        return SOURCE_PROBE
+    return SOURCE_PRUNED